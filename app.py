@@ -1,244 +1,275 @@
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import json
+import functools
+import os
+import sqlite3
 
-# Page configuration
-st.set_page_config(
-    page_title="Marketing ROI Dashboard - ERP POS System",
-    page_icon="📊",
-    layout="wide",
-    initial_sidebar_state="expanded"
+from roi_model import (
+    ALLOCATION_STRATEGIES,
+    COHORT_DEFAULTS,
+    COHORT_HORIZON_MONTHS,
+    UNCERTAINTY_DEFAULTS,
+    CohortSimulator,
+    IncrementalROIModel,
+    MarketingROIDashboard,
+    MonteCarloSimulator,
+    ScenarioCache,
+    build_detail_table,
+    format_currency,
+    format_currency_column,
+    format_fixed_column,
+    roi_sensitivity,
+    tornado_rows,
 )
+from roi_model.cohort import projection
+from roi_model.downsample import downsample_xy
+from roi_model.goalseek import GOAL_METRICS, GOAL_SEEK_CACHE_SIZE, GoalSeeker
+from roi_model.pacing import BudgetPacer
+from roi_model.store import open_store
+from roi_model.export import (
+    EXPORT_FORMATS,
+    available_formats,
+    build_report,
+    bundle_file,
+    bundle_extension,
+    iter_reports,
+    report_bytes,
+)
+from roi_model.timing import METRICS, StageTimer, current_timer, log_timings, start_metrics_server
 
-# Custom CSS for professional styling
-st.markdown("""
-<style>
-    .main-header {
-        font-size: 2.5rem;
-        font-weight: bold;
-        color: #1f77b4;
-        text-align: center;
-        margin-bottom: 2rem;
-    }
-    .metric-container {
-        background-color: #f0f2f6;
-        padding: 1rem;
-        border-radius: 10px;
-        border-left: 5px solid #1f77b4;
-    }
-    .segment-header {
-        background: linear-gradient(90deg, #1f77b4, #ff7f0e);
-        color: white;
-        padding: 10px;
-        border-radius: 5px;
-        margin: 10px 0;
-    }
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 24px;
-    }
-    .stTabs [data-baseweb="tab"] {
-        height: 50px;
-        padding-left: 20px;
-        padding-right: 20px;
-    }
-</style>
-""", unsafe_allow_html=True)
+def configure_page():
+    """Page config and custom CSS; must run before any other Streamlit call"""
+    # Page configuration
+    st.set_page_config(
+        page_title="Marketing ROI Dashboard - ERP POS System",
+        page_icon="📊",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
 
-class MarketingROIDashboard:
-    def __init__(self):
-        # Market data for Indonesian F&B segments
-        self.market_data = {
-            "Coffee Shops": {
-                "market_size": 45000,
-                "avg_deal_value": 15000000,  # Rp 15jt
-                "channels": {
-                    "Word of Mouth": {"conversion_rate": 0.25, "cost_per_lead": 50000},
-                    "Instagram Ads": {"conversion_rate": 0.12, "cost_per_lead": 75000},
-                    "Google Ads": {"conversion_rate": 0.08, "cost_per_lead": 125000},
-                    "Partnership": {"conversion_rate": 0.22, "cost_per_lead": 85000}
-                }
-            },
-            "Casual Dining": {
-                "market_size": 25000,
-                "avg_deal_value": 35000000,  # Rp 35jt
-                "channels": {
-                    "Word of Mouth": {"conversion_rate": 0.20, "cost_per_lead": 75000},
-                    "Instagram Ads": {"conversion_rate": 0.10, "cost_per_lead": 100000},
-                    "Google Ads": {"conversion_rate": 0.15, "cost_per_lead": 150000},
-                    "Partnership": {"conversion_rate": 0.25, "cost_per_lead": 120000}
-                }
-            },
-            "Warung/Street Food": {
-                "market_size": 180000,
-                "avg_deal_value": 8000000,  # Rp 8jt
-                "channels": {
-                    "Word of Mouth": {"conversion_rate": 0.30, "cost_per_lead": 25000},
-                    "Instagram Ads": {"conversion_rate": 0.08, "cost_per_lead": 40000},
-                    "Google Ads": {"conversion_rate": 0.05, "cost_per_lead": 60000},
-                    "Partnership": {"conversion_rate": 0.18, "cost_per_lead": 45000}
-                }
-            },
-            "Food Courts": {
-                "market_size": 8000,
-                "avg_deal_value": 75000000,  # Rp 75jt
-                "channels": {
-                    "Word of Mouth": {"conversion_rate": 0.15, "cost_per_lead": 150000},
-                    "Instagram Ads": {"conversion_rate": 0.08, "cost_per_lead": 200000},
-                    "Google Ads": {"conversion_rate": 0.12, "cost_per_lead": 250000},
-                    "Partnership": {"conversion_rate": 0.28, "cost_per_lead": 180000}
-                }
-            },
-            "Cloud Kitchen": {
-                "market_size": 12000,
-                "avg_deal_value": 25000000,  # Rp 25jt
-                "channels": {
-                    "Word of Mouth": {"conversion_rate": 0.18, "cost_per_lead": 80000},
-                    "Instagram Ads": {"conversion_rate": 0.15, "cost_per_lead": 90000},
-                    "Google Ads": {"conversion_rate": 0.20, "cost_per_lead": 110000},
-                    "Partnership": {"conversion_rate": 0.22, "cost_per_lead": 100000}
-                }
-            }
+    # Custom CSS for professional styling
+    st.markdown("""
+    <style>
+        .main-header {
+            font-size: 2.5rem;
+            font-weight: bold;
+            color: #1f77b4;
+            text-align: center;
+            margin-bottom: 2rem;
         }
-    
-    def calculate_channel_efficiency(self, segment, channel):
-        """Calculate channel efficiency (conversion rate / cost per lead)"""
-        channel_data = self.market_data[segment]["channels"][channel]
-        return channel_data["conversion_rate"] / (channel_data["cost_per_lead"] / 1000000)
-    
-    def simulate_diminishing_returns(self, base_conversion, budget_allocated, optimal_budget):
-        """Simulate diminishing returns effect"""
-        if budget_allocated <= optimal_budget:
-            return base_conversion
-        else:
-            excess_factor = (budget_allocated - optimal_budget) / optimal_budget
-            diminishing_factor = 1 / (1 + 0.5 * excess_factor)
-            return base_conversion * diminishing_factor
-    
-    def optimize_budget_allocation(self, total_budget, selected_segments):
-        """Smart budget allocation based on channel efficiency"""
-        allocations = {}
-        
-        # Calculate efficiency scores for all channels in selected segments
-        efficiency_scores = []
-        for segment in selected_segments:
-            for channel in self.market_data[segment]["channels"]:
-                efficiency = self.calculate_channel_efficiency(segment, channel)
-                efficiency_scores.append({
-                    'segment': segment,
-                    'channel': channel,
-                    'efficiency': efficiency,
-                    'market_size': self.market_data[segment]["market_size"],
-                    'avg_deal': self.market_data[segment]["avg_deal_value"]
-                })
-        
-        # Sort by efficiency and allocate budget
-        efficiency_scores.sort(key=lambda x: x['efficiency'], reverse=True)
-        
-        remaining_budget = total_budget
-        for item in efficiency_scores:
-            if remaining_budget <= 0:
-                break
-            
-            # Allocate budget based on efficiency and market potential
-            market_weight = min(item['market_size'] / 50000, 1.0)  # Normalize market size
-            suggested_allocation = min(
-                remaining_budget * 0.3,  # Max 30% per channel
-                total_budget * market_weight * 0.15  # Market-weighted allocation
-            )
-            
-            key = f"{item['segment']} - {item['channel']}"
-            allocations[key] = {
-                'budget': suggested_allocation,
-                'efficiency': item['efficiency'],
-                'segment': item['segment'],
-                'channel': item['channel']
-            }
-            remaining_budget -= suggested_allocation
-        
-        return allocations
-    
-    def calculate_roi_metrics(self, budget_allocation, timeline_months=12):
-        """Calculate comprehensive ROI metrics"""
-        total_leads = 0
-        total_conversions = 0
-        total_revenue = 0
-        total_cost = sum(allocation['budget'] for allocation in budget_allocation.values())
-        
-        channel_performance = []
-        
-        for key, allocation in budget_allocation.items():
-            segment = allocation['segment']
-            channel = allocation['channel']
-            budget = allocation['budget']
-            
-            if budget > 0:
-                # Get channel data
-                channel_data = self.market_data[segment]["channels"][channel]
-                cost_per_lead = channel_data["cost_per_lead"]
-                base_conversion_rate = channel_data["conversion_rate"]
-                avg_deal_value = self.market_data[segment]["avg_deal_value"]
-                
-                # Calculate leads and conversions
-                leads = budget / cost_per_lead
-                
-                # Apply diminishing returns
-                optimal_budget = self.market_data[segment]["market_size"] * cost_per_lead * 0.05
-                adjusted_conversion_rate = self.simulate_diminishing_returns(
-                    base_conversion_rate, budget, optimal_budget
-                )
-                
-                conversions = leads * adjusted_conversion_rate
-                revenue = conversions * avg_deal_value * timeline_months
-                
-                total_leads += leads
-                total_conversions += conversions
-                total_revenue += revenue
-                
-                channel_performance.append({
-                    'segment': segment,
-                    'channel': channel,
-                    'budget': budget,
-                    'leads': leads,
-                    'conversions': conversions,
-                    'revenue': revenue,
-                    'roi': (revenue - budget) / budget * 100 if budget > 0 else 0,
-                    'efficiency': allocation['efficiency']
-                })
-        
-        # Calculate overall metrics
-        overall_roi = (total_revenue - total_cost) / total_cost * 100 if total_cost > 0 else 0
-        market_penetration = (total_conversions / sum(data["market_size"] for data in self.market_data.values())) * 100
-        
-        return {
-            'total_leads': total_leads,
-            'total_conversions': total_conversions,
-            'total_revenue': total_revenue,
-            'total_cost': total_cost,
-            'overall_roi': overall_roi,
-            'market_penetration': market_penetration,
-            'channel_performance': channel_performance
+        .metric-container {
+            background-color: #f0f2f6;
+            padding: 1rem;
+            border-radius: 10px;
+            border-left: 5px solid #1f77b4;
         }
+        .segment-header {
+            background: linear-gradient(90deg, #1f77b4, #ff7f0e);
+            color: white;
+            padding: 10px;
+            border-radius: 5px;
+            margin: 10px 0;
+        }
+        .stTabs [data-baseweb="tab-list"] {
+            gap: 24px;
+        }
+        .stTabs [data-baseweb="tab"] {
+            height: 50px;
+            padding-left: 20px;
+            padding-right: 20px;
+        }
+    </style>
+    """, unsafe_allow_html=True)
 
-def format_currency(amount):
-    """Format currency in Indonesian Rupiah"""
-    return f"Rp {amount:,.0f}"
+# Scenario results kept in memory before least-recently-used ones are evicted
+SCENARIO_CACHE_SIZE = 256
+# Derived analyses (curves, cohorts, sensitivity, frontier, pacing, Monte Carlo, goal seek)
+ANALYSIS_CACHE_SIZE = 256
+# Figures and tables, bounded by their serialized size
+PAYLOAD_CACHE_BYTES = 128 << 20
+PAYLOAD_CACHE_ENTRIES = 4096
+# Sidebar total budget range (Rp); the frontier spans the same range
+BUDGET_MIN, BUDGET_MAX, BUDGET_STEP = 100000, 100000000, 500000
+# Total budgets evaluated along the budget-ROI frontier, spaced geometrically
+FRONTIER_POINTS = 400
+# Goal seek: metric -> (default target, input step, display format)
+GOAL_INPUTS = {
+    "total_conversions": (50.0, 5.0, lambda value: f"{value:.0f} clients"),
+    "total_revenue": (1000000000.0, 10000000.0, format_currency),
+    "market_penetration": (0.1, 0.01, lambda value: f"{value:.2f}% penetration"),
+    "overall_roi": (150.0, 10.0, lambda value: f"{value:.1f}% ROI")
+}
+# Segments drawn separately in the pacing chart; the rest are stacked as "Other"
+PACING_MAX_SEGMENTS = 12
+# Budget levels evaluated per diminishing-returns curve in the optimization tab
+CURVE_POINTS = 1000
+# Timelines compared in the cohort projection table, all read off one simulated matrix
+PROJECTION_TIMELINES = [3, 6, 12, 24, 36, 48, 60]
+# Largest scenario bundle served by the download button; Streamlit holds downloads in
+# memory, so larger exports go through `python -m roi_model.export`, which streams to disk
+BUNDLE_MAX_BYTES = 64 << 20
+# Assumptions shown in the ROI sensitivity tornado chart
+TORNADO_BARS = 15
+# Payload caps per chart: points per line figure (and per trace), bars, pie slices
+CHART_MAX_POINTS = 3000
+TRACE_MAX_POINTS = 300
+TRACE_MIN_POINTS = 50
+CHART_MAX_BARS = 40
+CHART_MAX_SLICES = 12
+# Line figures with more points than this are drawn with WebGL
+WEBGL_MIN_POINTS = 1500
 
-def format_number(number):
-    """Format large numbers with K, M suffixes"""
-    if number >= 1000000:
-        return f"{number/1000000:.1f}M"
-    elif number >= 1000:
-        return f"{number/1000:.1f}K"
-    else:
-        return f"{number:.0f}"
+# Dashboard tabs, in display order; the selected label is kept in st.session_state["active_tab"]
+TAB_LABELS = ["📊 Overview", "📈 Performance Analysis", "🎯 Channel Optimization", "📋 Detailed Report"]
+
+@st.cache_resource
+def get_dashboard():
+    """Model instance shared by every session on this server"""
+    return MarketingROIDashboard()
+
+@st.cache_resource
+def get_goal_cache():
+    """Scenario evaluations memoized for goal seek, apart from the scenario cache so
+    bisection steps never evict scenarios the sessions are viewing"""
+    return ScenarioCache(max_entries=GOAL_SEEK_CACHE_SIZE)
+
+@st.cache_resource
+def get_scenario_cache():
+    """Scenario results shared by every session on this server"""
+    return ScenarioCache(max_entries=SCENARIO_CACHE_SIZE)
+
+@st.cache_resource
+def get_analysis_cache():
+    """Analyses derived from a scenario, apart from the scenario cache so opening
+    tabs never evicts the scenarios themselves"""
+    return ScenarioCache(max_entries=ANALYSIS_CACHE_SIZE)
+
+def payload_size(value):
+    """Approximate bytes sent to the browser for a cached figure or table"""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if hasattr(value, 'to_plotly_json'):
+        return len(value.to_json())
+    if hasattr(value, 'memory_usage'):
+        return int(value.memory_usage(deep=True).sum())
+    raise TypeError(f"No payload size for {type(value).__name__}")
+
+@st.cache_resource
+def get_payload_cache():
+    """Rendered figures and tables, bounded by PAYLOAD_CACHE_BYTES"""
+    return ScenarioCache(max_entries=PAYLOAD_CACHE_ENTRIES, max_bytes=PAYLOAD_CACHE_BYTES, size_of=payload_size)
+
+@st.cache_resource
+def get_result_store():
+    """On-disk results shared with other server processes and kept across restarts;
+    None when ROI_RESULT_STORE disables it or the store cannot be opened"""
+    try:
+        return open_store(market_version=get_dashboard().market_table.version)
+    except (OSError, sqlite3.Error):
+        # A read-only or unavailable cache location only costs recomputation
+        return None
+
+def persisted(key, compute):
+    """compute() through the on-disk result store, for results worth keeping across restarts"""
+    store = get_result_store()
+    return compute() if store is None else store.get_or_compute(key, compute)
+
+def get_incremental_model(dashboard):
+    """This session's incremental model, which follows its sidebar changes row by row"""
+    model = st.session_state.get("incremental_model")
+    if model is None or model.dashboard is not dashboard:
+        model = st.session_state["incremental_model"] = IncrementalROIModel(dashboard)
+    return model
+
+@st.cache_resource
+def start_metrics_endpoint():
+    """Prometheus /metrics endpoint, started once per server when ROI_METRICS_PORT is set"""
+    port = os.environ.get("ROI_METRICS_PORT")
+    return start_metrics_server(int(port)) if port else None
+
+def cached_figure(timer, name, key, build):
+    """Plotly figure built once per key and shared by every rerun and session
+    
+    The figure must not be modified after it is cached.
+    """
+    with timer.stage(f"figure.{name}"):
+        return get_payload_cache().get_or_compute(('figure', name) + tuple(key), build)
+
+def show_chart(fig, timer, name):
+    """Render a plotly figure, timing its serialization as its own stage"""
+    with timer.stage(f"chart.{name}"):
+        st.plotly_chart(fig, use_container_width=True)
+
+def tab_fragment(name):
+    """Render a tab as an st.fragment timed as stage `name`
+    
+    Widgets inside the tab rerun only the fragment. On a full rerun the fragment
+    records into the page's timer; on a fragment-only rerun it gets a timer of its
+    own that feeds the metrics registry and structured log.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def run(*args, **kwargs):
+            timer = current_timer()
+            if timer is not None:
+                with timer.stage(name):
+                    return function(timer, *args, **kwargs)
+            timer = StageTimer(f"fragment.{name}")
+            with timer.activate(), timer.stage(name):
+                result = function(timer, *args, **kwargs)
+            METRICS.record(timer)
+            log_timings(timer)
+            return result
+        return st.fragment(run)
+    return decorator
+
+def show_performance_panel(timer):
+    """Optional sidebar table of this rerun's stage timings"""
+    with st.sidebar.expander("⏱️ Performance Debug"):
+        if not st.checkbox("Show stage timings", value=False):
+            return
+        st.caption(f"Total rerun: {timer.total_ms:.1f} ms")
+        rows = [
+            {'Stage': '\u2003' * path.count('/') + path.rsplit('/', 1)[-1], 'ms': round(elapsed, 2)}
+            for path, elapsed in timer.summary().items()
+        ]
+        st.dataframe(rows, use_container_width=True, hide_index=True)
 
 def main():
-    dashboard = MarketingROIDashboard()
+    configure_page()
+    start_metrics_endpoint()
+    timer = StageTimer()
+    with timer.activate():
+        render_dashboard(timer)
+    METRICS.record(timer)
+    log_timings(timer)
+    show_performance_panel(timer)
+
+def solve_goal_budget(timer, dashboard, metric, target, selected_segments, timeline, strategy):
+    """Sidebar goal seek: the solved total budget, with the outcome shown under the inputs"""
+    goal_key = ('goal', metric, target, tuple(selected_segments), timeline, strategy, dashboard.market_table.version)
+    with timer.stage("goal_seek"):
+        goal = get_analysis_cache().get_or_compute(goal_key, lambda: persisted(goal_key, lambda: GoalSeeker(
+            dashboard, selected_segments, timeline, strategy,
+            budget_range=(BUDGET_MIN, BUDGET_MAX), cache=get_goal_cache()
+        ).seek(metric, target)))
+    
+    achieved = GOAL_INPUTS[metric][2](goal['achieved'])
+    if not goal['feasible']:
+        st.sidebar.warning(f"Target not reachable between {format_currency(BUDGET_MIN)} and "
+                           f"{format_currency(BUDGET_MAX)}; showing {format_currency(goal['total_budget'])} "
+                           f"({achieved})")
+    elif metric == "overall_roi":
+        st.sidebar.success(f"Largest budget keeping the target ROI: {format_currency(goal['total_budget'])} ({achieved})")
+    else:
+        st.sidebar.success(f"Minimum budget: {format_currency(goal['total_budget'])} ({achieved})")
+    return goal['total_budget']
+
+def render_dashboard(timer):
+    with timer.stage("setup"):
+        dashboard = get_dashboard()
+        scenario_cache = get_scenario_cache()
     
     # Header
     st.markdown('<h1 class="main-header">🚀 Marketing ROI Dashboard - ERP POS System</h1>', unsafe_allow_html=True)
@@ -247,20 +278,22 @@ def main():
     # Sidebar controls
     st.sidebar.header("🎯 Campaign Configuration")
     
-    # Budget slider
+    # Budget slider; in goal seek mode the budget is solved instead
+    goal_mode = st.session_state.get("goal_seek", False)
     total_budget = st.sidebar.slider(
         "Total Marketing Budget (Rp)",
-        min_value=100000,
-        max_value=100000000,
+        min_value=BUDGET_MIN,
+        max_value=BUDGET_MAX,
         value=10000000,
-        step=500000,
-        format="%d"
+        step=BUDGET_STEP,
+        format="%d",
+        disabled=goal_mode
     )
     
     # Segment selection
     st.sidebar.subheader("Target Segments")
     selected_segments = []
-    for segment in dashboard.market_data.keys():
+    for segment in dashboard.market_table.segments:
         if st.sidebar.checkbox(segment, value=True):
             selected_segments.append(segment)
     
@@ -272,110 +305,271 @@ def main():
         format_func=lambda x: f"{x} months"
     )
     
+    # Allocation strategy
+    strategy = st.sidebar.selectbox(
+        "Allocation Strategy",
+        list(ALLOCATION_STRATEGIES.keys()),
+        format_func=ALLOCATION_STRATEGIES.get
+    )
+    
+    # Goal seek: the budget that reaches a target for the segments, timeline and strategy above
+    with st.sidebar.expander("🎯 Goal Seek", expanded=goal_mode):
+        st.checkbox("Solve the budget for a target", key="goal_seek")
+        goal_metric = st.selectbox("Target", list(GOAL_METRICS), format_func=lambda metric: GOAL_METRICS[metric][0])
+        default_target, target_step, _ = GOAL_INPUTS[goal_metric]
+        goal_target = st.number_input(
+            "Minimum ROI (%)" if goal_metric == "overall_roi" else "At least",
+            value=default_target, step=target_step, key=f"goal_target_{goal_metric}"
+        )
+    
+    # Monte Carlo uncertainty settings
+    with st.sidebar.expander("🎲 Uncertainty Simulation"):
+        run_monte_carlo = st.checkbox("Simulate ROI uncertainty", value=False)
+        monte_carlo_draws = st.selectbox("Simulation draws", [10000, 50000, 100000, 250000], index=2,
+                                         format_func=lambda x: f"{x:,}")
+        uncertainty = {
+            name: {**setting, 'spread': st.slider(f"{label} variability (CV %)", 0, 100,
+                                                  int(setting['spread'] * 100), step=5) / 100}
+            for (name, setting), label in zip(UNCERTAINTY_DEFAULTS.items(),
+                                              ["Conversion rate", "Cost per lead", "Deal value"])
+        }
+    
     if not selected_segments:
         st.error("Please select at least one target segment!")
         return
     
-    # Calculate optimal budget allocation
-    budget_allocation = dashboard.optimize_budget_allocation(total_budget, selected_segments)
-    roi_metrics = dashboard.calculate_roi_metrics(budget_allocation, timeline)
+    if goal_mode:
+        total_budget = solve_goal_budget(timer, dashboard, goal_metric, goal_target, selected_segments, timeline, strategy)
     
-    # Main dashboard tabs
-    tab1, tab2, tab3, tab4 = st.tabs(["📊 Overview", "📈 Performance Analysis", "🎯 Channel Optimization", "📋 Detailed Report"])
+    # Calculate optimal budget allocation (reused across reruns and sessions); a new
+    # scenario is derived from this session's previous one, touching only changed rows
+    scenario_key = dashboard.scenario_key(total_budget, selected_segments, timeline, strategy)
+    with timer.stage("scenario"):
+        model = get_incremental_model(dashboard)
+        budget_allocation, roi_metrics = scenario_cache.get_or_compute(
+            scenario_key,
+            lambda: persisted(scenario_key, lambda: model.evaluate(total_budget, selected_segments, timeline, strategy))
+        )
+    
+    cache_stats = scenario_cache.stats()
+    st.sidebar.caption(
+        f"Scenario cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+        f"({cache_stats['size']}/{cache_stats['max_entries']} entries)"
+    )
+    payload_stats = get_payload_cache().stats()
+    st.sidebar.caption(
+        f"Chart cache: {payload_stats['size']} payloads, "
+        f"{payload_stats['bytes'] / (1 << 20):.1f} of {payload_stats['max_bytes'] / (1 << 20):.0f} MB"
+    )
+    result_store = get_result_store()
+    if result_store is not None:
+        store_stats = result_store.stats()
+        st.sidebar.caption(
+            f"Result store: {store_stats['hits']} hits / {store_stats['misses']} misses "
+            f"({store_stats['entries']:,} results, {store_stats['bytes'] / (1 << 20):.1f} MB on disk)"
+        )
+    
+    scenario = {
+        'key': scenario_key,
+        'allocation_key': dashboard.allocation_key(total_budget, selected_segments, strategy),
+        'total_budget': total_budget,
+        'selected_segments': selected_segments,
+        'timeline': timeline,
+        'strategy': strategy,
+        'budget_allocation': budget_allocation,
+        'roi_metrics': roi_metrics
+    }
+    
+    # Main dashboard tabs; only the open tab is rendered, and switching tabs reruns
+    # against the cached scenario
+    tab1, tab2, tab3, tab4 = st.tabs(TAB_LABELS, key="active_tab", on_change="rerun")
     
     with tab1:
-        # Key metrics
-        col1, col2, col3, col4 = st.columns(4)
+        if tab1.open is not False:
+            render_overview(scenario, run_monte_carlo, monte_carlo_draws, uncertainty)
+    
+    with tab2:
+        if tab2.open is not False:
+            render_performance(scenario)
+    
+    with tab3:
+        if tab3.open is not False:
+            render_optimization(scenario)
+    
+    with tab4:
+        if tab4.open is not False:
+            render_report(scenario)
+
+@tab_fragment("overview")
+def render_overview(timer, scenario, run_monte_carlo, monte_carlo_draws, uncertainty):
+    import pandas as pd
+    import plotly.express as px
+    
+    dashboard = get_dashboard()
+    total_budget = scenario['total_budget']
+    timeline = scenario['timeline']
+    budget_allocation = scenario['budget_allocation']
+    roi_metrics = scenario['roi_metrics']
+    
+    # Key metrics
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric(
+            "Overall ROI",
+            f"{roi_metrics['overall_roi']:.1f}%",
+            delta=f"{roi_metrics['overall_roi'] - 150:.1f}%" if roi_metrics['overall_roi'] > 150 else None
+        )
+    
+    with col2:
+        st.metric(
+            "Expected Clients",
+            f"{roi_metrics['total_conversions']:.0f}",
+            delta=f"{roi_metrics['total_conversions'] - 50:.0f}" if roi_metrics['total_conversions'] > 50 else None
+        )
+    
+    with col3:
+        st.metric(
+            "Projected Revenue",
+            format_currency(roi_metrics['total_revenue']),
+            delta=format_currency(roi_metrics['total_revenue'] - total_budget)
+        )
+    
+    with col4:
+        st.metric(
+            "Market Penetration",
+            f"{roi_metrics['market_penetration']:.2f}%",
+            delta=f"{roi_metrics['market_penetration'] - 0.1:.2f}%" if roi_metrics['market_penetration'] > 0.1 else None
+        )
+    
+    # Uncertainty bands around the point estimate
+    if run_monte_carlo:
+        simulation_key = (
+            'monte_carlo',
+            scenario['key'],
+            monte_carlo_draws,
+            tuple(setting['spread'] for setting in uncertainty.values())
+        )
+        simulation = get_analysis_cache().get_or_compute(
+            simulation_key,
+            lambda: persisted(simulation_key, lambda: MonteCarloSimulator(dashboard, uncertainty).run(
+                budget_allocation, timeline, monte_carlo_draws
+            ))
+        )
+        
+        st.subheader(f"🎲 Uncertainty Range ({simulation['draws']:,} simulations)")
+        col1, col2, col3 = st.columns(3)
         
         with col1:
-            st.metric(
-                "Overall ROI",
-                f"{roi_metrics['overall_roi']:.1f}%",
-                delta=f"{roi_metrics['overall_roi'] - 150:.1f}%" if roi_metrics['overall_roi'] > 150 else None
-            )
+            st.metric("ROI (P50)", f"{simulation['roi']['p50']:.1f}%")
+            st.caption(f"P5 {simulation['roi']['p5']:.1f}% · P95 {simulation['roi']['p95']:.1f}%")
         
         with col2:
-            st.metric(
-                "Expected Clients",
-                f"{roi_metrics['total_conversions']:.0f}",
-                delta=f"{roi_metrics['total_conversions'] - 50:.0f}" if roi_metrics['total_conversions'] > 50 else None
-            )
+            st.metric("Revenue (P50)", format_currency(simulation['revenue']['p50']))
+            st.caption(f"P5 {format_currency(simulation['revenue']['p5'])} · "
+                       f"P95 {format_currency(simulation['revenue']['p95'])}")
         
         with col3:
-            st.metric(
-                "Projected Revenue",
-                format_currency(roi_metrics['total_revenue']),
-                delta=format_currency(roi_metrics['total_revenue'] - total_budget)
-            )
+            st.metric("Break-even Probability", f"{simulation['break_even_probability'] * 100:.1f}%")
+    
+    # Budget allocation pie chart
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        # Budget allocation; past CHART_MAX_SLICES the smallest channels share one slice
+        funded = sorted(
+            ((key, allocation['budget']) for key, allocation in budget_allocation.items() if allocation['budget'] > 0),
+            key=lambda item: -item[1]
+        )
         
-        with col4:
-            st.metric(
-                "Market Penetration",
-                f"{roi_metrics['market_penetration']:.2f}%",
-                delta=f"{roi_metrics['market_penetration'] - 0.1:.2f}%" if roi_metrics['market_penetration'] > 0.1 else None
+        def build_pie():
+            names, budgets = [name for name, _ in funded], [budget for _, budget in funded]
+            if len(funded) > CHART_MAX_SLICES:
+                kept = CHART_MAX_SLICES - 1
+                names = names[:kept] + [f"Other ({len(funded) - kept} channels)"]
+                budgets = budgets[:kept] + [sum(budgets[kept:])]
+            fig_pie = px.pie(
+                pd.DataFrame({'Channel': names, 'Budget': budgets}),
+                values='Budget',
+                names='Channel',
+                title="Budget Allocation by Channel",
+                color_discrete_sequence=px.colors.qualitative.Set3
             )
+            fig_pie.update_traces(textposition='inside', textinfo='percent+label')
+            return fig_pie
         
-        # Budget allocation pie chart
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            # Budget allocation
-            allocation_data = []
-            for key, allocation in budget_allocation.items():
-                if allocation['budget'] > 0:
-                    allocation_data.append({
-                        'Channel': key,
-                        'Budget': allocation['budget'],
-                        'Percentage': allocation['budget'] / total_budget * 100
-                    })
-            
-            if allocation_data:
-                df_allocation = pd.DataFrame(allocation_data)
-                fig_pie = px.pie(
-                    df_allocation, 
-                    values='Budget', 
-                    names='Channel',
-                    title="Budget Allocation by Channel",
-                    color_discrete_sequence=px.colors.qualitative.Set3
-                )
-                fig_pie.update_traces(textposition='inside', textinfo='percent+label')
-                st.plotly_chart(fig_pie, use_container_width=True)
-        
-        with col2:
-            # Channel performance bar chart
-            if roi_metrics['channel_performance']:
-                df_performance = pd.DataFrame(roi_metrics['channel_performance'])
-                df_performance['Channel_Segment'] = df_performance['segment'] + ' - ' + df_performance['channel']
-                
-                fig_bar = px.bar(
-                    df_performance,
-                    x='Channel_Segment',
-                    y='roi',
-                    title="ROI by Channel",
-                    color='roi',
-                    color_continuous_scale='RdYlGn'
-                )
-                fig_bar.update_xaxes(tickangle=45)
-                fig_bar.update_layout(xaxis_title="Channel", yaxis_title="ROI (%)")
-                st.plotly_chart(fig_bar, use_container_width=True)
+        if funded:
+            show_chart(cached_figure(timer, "pie", scenario['allocation_key'], build_pie), timer, "pie")
     
-    with tab2:
-        st.subheader("📈 Performance Analysis")
-        
-        # Revenue projection timeline
-        months = list(range(1, timeline + 1))
-        cumulative_revenue = []
-        monthly_revenue = roi_metrics['total_revenue'] / timeline
+    with col2:
+        # Channel performance bar chart
+        channel_performance = roi_metrics['channel_performance']
         
-        for month in months:
-            # Simulate growth curve
-            growth_factor = 1 - np.exp(-month / (timeline * 0.3))
-            cumulative_revenue.append(monthly_revenue * month * growth_factor)
+        def build_bar():
+            # Only the largest budgets get a bar when many channels are funded
+            df_performance = channel_performance.frame()
+            if len(df_performance) > CHART_MAX_BARS:
+                df_performance = df_performance.nlargest(CHART_MAX_BARS, 'budget')
+            fig_bar = px.bar(
+                df_performance,
+                x='label',
+                y='roi',
+                title="ROI by Channel",
+                color='roi',
+                color_continuous_scale='RdYlGn'
+            )
+            fig_bar.update_xaxes(tickangle=45)
+            fig_bar.update_layout(xaxis_title="Channel", yaxis_title="ROI (%)")
+            return fig_bar
         
+        if channel_performance:
+            show_chart(cached_figure(timer, "bar", scenario['key'], build_bar), timer, "bar")
+            if len(channel_performance) > CHART_MAX_BARS:
+                st.caption(f"Showing the {CHART_MAX_BARS} largest of {len(channel_performance)} funded channels")
+
+@tab_fragment("performance")
+def render_performance(timer, scenario):
+    import pandas as pd
+    import plotly.express as px
+    import plotly.graph_objects as go
+    
+    dashboard = get_dashboard()
+    total_budget = scenario['total_budget']
+    timeline = scenario['timeline']
+    budget_allocation = scenario['budget_allocation']
+    roi_metrics = scenario['roi_metrics']
+    
+    st.subheader("📈 Performance Analysis")
+    
+    # Revenue projection from lead cohorts; one simulated matrix serves every timeline
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        conversion_lag = st.slider("Conversion lag (months)", 0.0, 6.0,
+                                   float(COHORT_DEFAULTS['conversion_lag_months']), step=0.5)
+    with col2:
+        monthly_churn = st.slider("Monthly churn (%)", 0.0, 20.0,
+                                  float(COHORT_DEFAULTS['monthly_churn'] * 100), step=0.5) / 100
+    with col3:
+        campaign_months = st.slider("Campaign length (months)", 1, 12, int(COHORT_DEFAULTS['campaign_months']))
+    
+    horizon = max(COHORT_HORIZON_MONTHS, timeline)
+    cohort_key = ('cohorts', scenario['allocation_key'], conversion_lag, monthly_churn, campaign_months, horizon)
+    cohorts = get_analysis_cache().get_or_compute(
+        cohort_key,
+        lambda: CohortSimulator(
+            dashboard, horizon, conversion_lag_months=conversion_lag,
+            monthly_churn=monthly_churn, campaign_months=campaign_months
+        ).run(budget_allocation)
+    )
+    
+    show_horizon = st.checkbox(f"Show full {horizon}-month horizon", value=False)
+    months = np.arange(1, (horizon if show_horizon else timeline) + 1)
+    
+    def build_timeline():
         fig_timeline = go.Figure()
         fig_timeline.add_trace(go.Scatter(
             x=months,
-            y=cumulative_revenue,
+            y=cohorts['cumulative_revenue'][:len(months)],
             mode='lines+markers',
             name='Projected Revenue',
             line=dict(color='#1f77b4', width=3)
@@ -392,219 +586,458 @@ def main():
         ))
         
         fig_timeline.update_layout(
-            title=f"Revenue Projection - {timeline} Month Timeline",
+            title=f"Revenue Projection - {len(months)} Month Timeline",
             xaxis_title="Month",
             yaxis_title="Revenue (Rp)",
             hovermode='x unified'
         )
-        st.plotly_chart(fig_timeline, use_container_width=True)
-        
-        # Channel efficiency ranking
-        st.subheader("🏆 Channel Efficiency Ranking")
-        if roi_metrics['channel_performance']:
-            df_efficiency = pd.DataFrame(roi_metrics['channel_performance'])
-            df_efficiency = df_efficiency.sort_values('efficiency', ascending=False)
-            
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                fig_efficiency = px.bar(
-                    df_efficiency.head(10),
-                    x='efficiency',
-                    y=[f"{row['segment']} - {row['channel']}" for _, row in df_efficiency.head(10).iterrows()],
-                    orientation='h',
-                    title="Top 10 Most Efficient Channels",
-                    color='efficiency',
-                    color_continuous_scale='Viridis'
-                )
-                st.plotly_chart(fig_efficiency, use_container_width=True)
-            
-            with col2:
-                # Performance metrics table
-                st.subheader("Channel Performance Summary")
-                summary_df = df_efficiency[['segment', 'channel', 'conversions', 'revenue', 'roi']].head(10)
-                summary_df['revenue'] = summary_df['revenue'].apply(format_currency)
-                summary_df['roi'] = summary_df['roi'].apply(lambda x: f"{x:.1f}%")
-                summary_df.columns = ['Segment', 'Channel', 'Conversions', 'Revenue', 'ROI']
-                st.dataframe(summary_df, use_container_width=True)
+        return fig_timeline
     
-    with tab3:
-        st.subheader("🎯 Channel Optimization")
-        
-        # Diminishing returns simulation
-        st.subheader("Diminishing Returns Analysis")
+    show_chart(cached_figure(timer, "timeline", cohort_key + (len(months),), build_timeline), timer, "timeline")
+    
+    timeline_rows = []
+    for months_ahead in sorted(set(PROJECTION_TIMELINES + [timeline])):
+        if months_ahead > horizon:
+            continue
+        projected = projection(cohorts, months_ahead)
+        timeline_rows.append({
+            'Timeline': f"{months_ahead} months",
+            'Revenue': format_currency(projected['total_revenue']),
+            'ROI': f"{projected['overall_roi']:.1f}%"
+        })
+    st.dataframe(timeline_rows, use_container_width=True, hide_index=True)
+    st.caption("Leads convert after the conversion lag and clients pay the deal value monthly until they churn. "
+               "With no lag and no churn this matches the Overview projection.")
+    
+    # Channel efficiency ranking
+    st.subheader("🏆 Channel Efficiency Ranking")
+    if roi_metrics['channel_performance']:
+        with timer.stage("dataframe.efficiency"):
+            df_efficiency = roi_metrics['channel_performance'].frame()
+        top_efficiency = df_efficiency.nlargest(10, 'efficiency')
         
-        selected_segment = st.selectbox("Select Segment for Analysis", selected_segments)
-        selected_channel = st.selectbox(
-            "Select Channel", 
-            list(dashboard.market_data[selected_segment]["channels"].keys())
-        )
+        col1, col2 = st.columns(2)
         
-        # Simulate different budget levels
-        base_budget = budget_allocation.get(f"{selected_segment} - {selected_channel}", {}).get('budget', 1000000)
-        budget_range = np.linspace(base_budget * 0.1, base_budget * 3, 50)
+        with col1:
+            fig_efficiency = cached_figure(timer, "efficiency", scenario['key'], lambda: px.bar(
+                top_efficiency,
+                x='efficiency',
+                y='label',
+                labels={'label': 'Channel'},
+                orientation='h',
+                title="Top 10 Most Efficient Channels",
+                color='efficiency',
+                color_continuous_scale='Viridis'
+            ))
+            show_chart(fig_efficiency, timer, "efficiency")
         
-        roi_curve = []
-        conversion_curve = []
+        with col2:
+            # Performance metrics table
+            st.subheader("Channel Performance Summary")
+            summary_df = pd.DataFrame({
+                'Segment': top_efficiency['segment'],
+                'Channel': top_efficiency['channel'],
+                'Conversions': top_efficiency['conversions'],
+                'Revenue': format_currency_column(top_efficiency['revenue']),
+                'ROI': format_fixed_column(top_efficiency['roi'], 1, "%")
+            })
+            st.dataframe(summary_df, use_container_width=True)
+    
+    # Which assumptions move ROI the most (analytic derivatives, no reruns)
+    st.subheader("🌪️ ROI Sensitivity")
+    if roi_metrics['channel_performance']:
+        relative_change = st.slider("Assumption change (±%)", 1, 50, 10) / 100
+        sensitivity = get_analysis_cache().get_or_compute(
+            ('sensitivity', scenario['key']),
+            lambda: roi_sensitivity(dashboard, budget_allocation, timeline)
+        )
         
-        for test_budget in budget_range:
-            # Simulate single channel performance
-            test_allocation = {f"{selected_segment} - {selected_channel}": {
-                'budget': test_budget,
-                'segment': selected_segment,
-                'channel': selected_channel,
-                'efficiency': dashboard.calculate_channel_efficiency(selected_segment, selected_channel)
-            }}
+        def build_tornado():
+            bars = tornado_rows(sensitivity, relative_change, top=TORNADO_BARS)
+            labels = [bar['label'] for bar in bars]
             
-            test_metrics = dashboard.calculate_roi_metrics(test_allocation, timeline)
-            roi_curve.append(test_metrics['overall_roi'])
-            conversion_curve.append(test_metrics['total_conversions'])
+            fig_tornado = go.Figure()
+            fig_tornado.add_trace(go.Bar(
+                x=[bar['low'] for bar in bars], y=labels, orientation='h',
+                name=f"-{relative_change * 100:.0f}%", marker_color='#d62728'
+            ))
+            fig_tornado.add_trace(go.Bar(
+                x=[bar['high'] for bar in bars], y=labels, orientation='h',
+                name=f"+{relative_change * 100:.0f}%", marker_color='#2ca02c'
+            ))
+            fig_tornado.update_layout(
+                title=f"ROI Drivers - Change in Overall ROI for ±{relative_change * 100:.0f}% per Assumption",
+                barmode='overlay',
+                xaxis_title="ROI change (% points)",
+                yaxis=dict(autorange='reversed'),
+                height=max(400, 28 * len(bars))
+            )
+            return fig_tornado
         
-        # Plot diminishing returns
+        show_chart(cached_figure(timer, "tornado", scenario['key'] + (relative_change,), build_tornado), timer, "tornado")
+        st.caption("Linear estimate from exact derivatives of the ROI formula, with the budget allocation held fixed; "
+                   "market size and deal value apply to every channel of the segment.")
+
+@tab_fragment("optimization")
+def render_optimization(timer, scenario):
+    import plotly.express as px
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+    
+    dashboard = get_dashboard()
+    selected_segments = scenario['selected_segments']
+    timeline = scenario['timeline']
+    budget_allocation = scenario['budget_allocation']
+    
+    st.subheader("🎯 Channel Optimization")
+    
+    # Diminishing returns simulation
+    st.subheader("Diminishing Returns Analysis")
+    
+    selected_segment = st.selectbox("Select Segment for Analysis", selected_segments)
+    selected_channel = st.selectbox(
+        "Select Channel",
+        dashboard.market_table.channels_for(selected_segment)
+    )
+    
+    compare_all = st.checkbox("Compare all channels in this segment")
+    channels = [selected_channel]
+    if compare_all:
+        channels = dashboard.market_table.channels_for(selected_segment)
+    pairs = [(selected_segment, channel) for channel in channels]
+    
+    # Evaluate every budget level for every channel in one batched call, once per
+    # scenario and channel selection
+    def compute_curves():
+        base_budgets = np.array([
+            budget_allocation.get(f"{segment} - {channel}", {}).get('budget', 1000000)
+            for segment, channel in pairs
+        ])
+        budget_grid = base_budgets[:, None] * np.linspace(0.1, 3, CURVE_POINTS)
+        return dashboard.diminishing_returns_curves(pairs, budget_grid, timeline)
+    
+    curves = get_analysis_cache().get_or_compute(('curves', scenario['key'], tuple(pairs), CURVE_POINTS),
+                                                 compute_curves)
+    
+    current_budget = budget_allocation.get(f"{selected_segment} - {selected_channel}", {}).get('budget', 0)
+    
+    # Plot diminishing returns; curves are downsampled to the chart's point budget
+    # and many traces switch to WebGL
+    def build_returns():
         fig_returns = make_subplots(
             rows=1, cols=2,
             subplot_titles=('ROI vs Budget', 'Conversions vs Budget')
         )
         
-        fig_returns.add_trace(
-            go.Scatter(x=budget_range, y=roi_curve, name='ROI %', line=dict(color='blue')),
-            row=1, col=1
-        )
+        points = int(np.clip(CHART_MAX_POINTS // (2 * len(pairs)), TRACE_MIN_POINTS, TRACE_MAX_POINTS))
+        roi_budget, roi = downsample_xy(curves['budget'], curves['roi'], points)
+        conversion_budget, conversions = downsample_xy(curves['budget'], curves['conversions'], points)
+        trace = go.Scattergl if roi.size + conversions.size > WEBGL_MIN_POINTS else go.Scatter
         
-        fig_returns.add_trace(
-            go.Scatter(x=budget_range, y=conversion_curve, name='Conversions', line=dict(color='green')),
-            row=1, col=2
-        )
+        for i, (segment, channel) in enumerate(pairs):
+            if compare_all:
+                roi_style = conversion_style = dict(color=px.colors.qualitative.Plotly[i % len(px.colors.qualitative.Plotly)])
+                roi_name = conversion_name = channel
+            else:
+                roi_style, conversion_style = dict(color='blue'), dict(color='green')
+                roi_name, conversion_name = 'ROI %', 'Conversions'
+            
+            fig_returns.add_trace(
+                trace(x=roi_budget[i], y=roi[i], name=roi_name,
+                      legendgroup=roi_name, line=roi_style),
+                row=1, col=1
+            )
+            
+            fig_returns.add_trace(
+                trace(x=conversion_budget[i], y=conversions[i], name=conversion_name,
+                      legendgroup=conversion_name, showlegend=not compare_all, line=conversion_style),
+                row=1, col=2
+            )
         
         # Add current budget marker
-        current_budget = budget_allocation.get(f"{selected_segment} - {selected_channel}", {}).get('budget', 0)
         if current_budget > 0:
-            current_idx = np.argmin(np.abs(budget_range - current_budget))
-            fig_returns.add_vline(x=current_budget, line_dash="dash", line_color="red", 
+            fig_returns.add_vline(x=current_budget, line_dash="dash", line_color="red",
                                  annotation_text="Current Budget", row=1, col=1)
-            fig_returns.add_vline(x=current_budget, line_dash="dash", line_color="red", 
+            fig_returns.add_vline(x=current_budget, line_dash="dash", line_color="red",
                                  annotation_text="Current Budget", row=1, col=2)
         
         fig_returns.update_layout(title=f"Diminishing Returns Analysis - {selected_segment} {selected_channel}")
-        st.plotly_chart(fig_returns, use_container_width=True)
-        
-        # Optimization recommendations
-        st.subheader("💡 Optimization Recommendations")
-        
-        optimal_idx = np.argmax(roi_curve)
-        optimal_budget = budget_range[optimal_idx]
-        optimal_roi = roi_curve[optimal_idx]
-        
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            st.metric("Current Budget", format_currency(current_budget))
-            
-        with col2:
-            st.metric("Optimal Budget", format_currency(optimal_budget))
-            
-        with col3:
-            budget_change = optimal_budget - current_budget
-            st.metric("Recommended Change", format_currency(abs(budget_change)), 
-                     delta=f"{'Increase' if budget_change > 0 else 'Decrease'}")
+        return fig_returns
     
-    with tab4:
-        st.subheader("📋 Detailed Report")
-        
-        # Export functionality
-        col1, col2 = st.columns([3, 1])
-        
-        with col2:
-            if st.button("📥 Export Report", type="primary"):
-                # Create comprehensive report data
-                report_data = {
-                    'campaign_config': {
-                        'total_budget': total_budget,
-                        'selected_segments': selected_segments,
-                        'timeline_months': timeline
-                    },
-                    'roi_metrics': roi_metrics,
-                    'budget_allocation': budget_allocation,
-                    'generated_at': datetime.now().isoformat()
-                }
-                
-                # Convert to JSON for download
-                report_json = json.dumps(report_data, indent=2, default=str)
-                st.download_button(
-                    label="Download JSON Report",
-                    data=report_json,
-                    file_name=f"marketing_roi_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-                    mime="application/json"
-                )
-        
-        # Detailed performance table
-        if roi_metrics['channel_performance']:
-            st.subheader("Channel Performance Details")
-            df_detailed = pd.DataFrame(roi_metrics['channel_performance'])
-            
-            # Format currency columns
-            df_detailed['budget_formatted'] = df_detailed['budget'].apply(format_currency)
-            df_detailed['revenue_formatted'] = df_detailed['revenue'].apply(format_currency)
-            df_detailed['roi_formatted'] = df_detailed['roi'].apply(lambda x: f"{x:.1f}%")
-            df_detailed['leads_formatted'] = df_detailed['leads'].apply(lambda x: f"{x:.0f}")
-            df_detailed['conversions_formatted'] = df_detailed['conversions'].apply(lambda x: f"{x:.0f}")
-            
-            # Display formatted table
-            display_df = df_detailed[['segment', 'channel', 'budget_formatted', 'leads_formatted', 
-                                    'conversions_formatted', 'revenue_formatted', 'roi_formatted']]
-            display_df.columns = ['Segment', 'Channel', 'Budget', 'Leads', 'Conversions', 'Revenue', 'ROI']
-            
-            st.dataframe(display_df, use_container_width=True)
-        
-        # Market insights
-        st.subheader("📊 Market Insights & Recommendations")
-        
-        insights = []
+    returns_key = scenario['key'] + (tuple(pairs), selected_channel, CURVE_POINTS)
+    show_chart(cached_figure(timer, "returns", returns_key, build_returns), timer, "returns")
+    
+    # Optimization recommendations
+    st.subheader("💡 Optimization Recommendations")
+    
+    optimum = dashboard.optimal_channel_budgets([(selected_segment, selected_channel)], timeline)
+    optimal_budget = float(optimum['roi_budget'][0])
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.metric("Current Budget", format_currency(current_budget))
+    
+    with col2:
+        st.metric("Optimal Budget", format_currency(optimal_budget),
+                  help="Largest budget that still earns the peak ROI before diminishing returns set in")
+    
+    with col3:
+        budget_change = optimal_budget - current_budget
+        st.metric("Recommended Change", format_currency(abs(budget_change)),
+                 delta=f"{'Increase' if budget_change > 0 else 'Decrease'}")
+    
+    st.caption(
+        f"Peak ROI {optimum['peak_roi'][0]:.1f}% · profit-maximising budget "
+        f"{format_currency(optimum['profit_budget'][0])}"
+    )
+    
+    # Revenue-optimal ROI for every total budget in the sidebar range, from one sweep
+    st.subheader("📉 Budget–ROI Frontier")
+    frontier_key = ('frontier', tuple(selected_segments), timeline, dashboard.market_table.version, FRONTIER_POINTS)
+    frontier = get_analysis_cache().get_or_compute(
+        frontier_key,
+        lambda: dashboard.budget_frontier(
+            selected_segments, np.geomspace(BUDGET_MIN, BUDGET_MAX, FRONTIER_POINTS), timeline
+        )
+    )
+    
+    def build_frontier():
+        fig_frontier = go.Figure()
+        fig_frontier.add_trace(go.Scatter(
+            x=frontier['total_budget'],
+            y=frontier['overall_roi'],
+            customdata=np.column_stack([
+                frontier['total_revenue'], frontier['total_conversions'],
+                frontier['marginal_roi'], frontier['channels_funded']
+            ]),
+            hovertemplate=(
+                "Budget Rp %{x:,.0f}<br>ROI %{y:,.1f}%<br>Revenue Rp %{customdata[0]:,.0f}<br>"
+                "Clients %{customdata[1]:,.0f}<br>Next Rupiah ROI %{customdata[2]:,.1f}%<br>"
+                "Channels %{customdata[3]}<extra></extra>"
+            ),
+            mode='lines',
+            name='Optimal allocation',
+            line=dict(color='#1f77b4', width=3)
+        ))
+        fig_frontier.add_trace(go.Scatter(
+            x=[scenario['total_budget']],
+            y=[scenario['roi_metrics']['overall_roi']],
+            mode='markers',
+            name=f"Current ({ALLOCATION_STRATEGIES[scenario['strategy']]})",
+            marker=dict(color='red', size=12, symbol='diamond')
+        ))
+        fig_frontier.update_layout(
+            title=f"Overall ROI vs Total Budget - {timeline} Month Timeline",
+            xaxis=dict(title="Total budget (Rp)", type='log'),
+            yaxis_title="Overall ROI (%)",
+            hovermode='closest'
+        )
+        return fig_frontier
+    
+    show_chart(
+        cached_figure(timer, "frontier", frontier_key + (scenario['total_budget'], scenario['strategy']), build_frontier),
+        timer, "frontier"
+    )
+    st.caption("Every budget uses the revenue-optimal (Marginal Return) allocation of the selected segments; "
+               "hover for revenue, clients and the ROI of the next Rupiah.")
+    
+    # Month-by-month spend plan of the same budget under an optional monthly cap
+    st.subheader("🗓️ Budget Pacing")
+    monthly_cap = st.number_input("Monthly spend cap (Rp, 0 = no cap)", min_value=0, value=0,
+                                  step=BUDGET_STEP, format="%d", key="pacing_cap")
+    pacing_key = ('pacing', scenario['key'], monthly_cap)
+    with timer.stage("pacing"):
+        plan = get_analysis_cache().get_or_compute(
+            pacing_key,
+            lambda: BudgetPacer(dashboard, selected_segments, timeline).plan(
+                scenario['total_budget'], monthly_cap or None, scenario['strategy']
+            )
+        )
+    lump_sum = plan['lump_sum']
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Paced ROI", f"{plan['overall_roi']:.1f}%",
+                  delta=f"{plan['overall_roi'] - lump_sum['overall_roi']:+.1f} pp vs lump sum")
+    with col2:
+        st.metric("Paced Revenue", format_currency(plan['total_revenue']),
+                  delta=format_currency(plan['total_revenue'] - lump_sum['total_revenue']))
+    with col3:
+        st.metric("Paced Clients", f"{plan['total_conversions']:.0f}",
+                  delta=f"{plan['total_conversions'] - lump_sum['total_conversions']:+.0f}")
+    with col4:
+        st.metric("Unspent Budget", format_currency(plan['unspent']),
+                  help="Budget left over when the monthly caps add up to less than the total budget")
+    
+    def build_pacing():
+        # Spend per month summed by segment; small segments are stacked together
+        segments, segment_index = np.unique([segment for segment, _ in plan['pairs']], return_inverse=True)
+        membership = np.zeros((len(segment_index), len(segments)))
+        membership[np.arange(len(segment_index)), segment_index] = 1
+        spend = plan['spend'] @ membership
+        order = np.argsort(-spend.sum(axis=0), kind='stable')
+        names = segments[order].tolist()
+        spend = spend[:, order]
+        if len(names) > PACING_MAX_SEGMENTS:
+            kept = PACING_MAX_SEGMENTS - 1
+            names = names[:kept] + [f"Other ({len(names) - kept} segments)"]
+            spend = np.column_stack([spend[:, :kept], spend[:, kept:].sum(axis=1)])
         
-        # ROI insights
-        if roi_metrics['overall_roi'] > 200:
-            insights.append("🎯 **Excellent ROI**: Your campaign is projected to deliver exceptional returns. Consider scaling up investment.")
-        elif roi_metrics['overall_roi'] > 100:
-            insights.append("✅ **Good ROI**: Solid returns expected. Look for optimization opportunities in underperforming channels.")
-        else:
-            insights.append("⚠️ **Low ROI**: Consider reallocating budget to higher-performing channels or segments.")
+        fig_pacing = make_subplots(specs=[[{"secondary_y": True}]])
+        for i, name in enumerate(names):
+            fig_pacing.add_trace(go.Bar(x=plan['months'], y=spend[:, i], name=name), secondary_y=False)
+        fig_pacing.add_trace(
+            go.Scatter(x=plan['months'], y=plan['marginal_roi_by_month'], name='Next Rupiah ROI',
+                       mode='lines+markers', line=dict(color='black', dash='dot')),
+            secondary_y=True
+        )
+        fig_pacing.update_layout(barmode='stack', title=f"Monthly Spend Plan - {timeline} Month Timeline",
+                                 xaxis_title="Month")
+        fig_pacing.update_yaxes(title_text="Spend (Rp)", secondary_y=False)
+        fig_pacing.update_yaxes(title_text="ROI of the next Rupiah (%)", secondary_y=True)
+        return fig_pacing
+    
+    if plan['total_cost'] > 0:
+        show_chart(cached_figure(timer, "pacing", pacing_key, build_pacing), timer, "pacing")
+        with st.expander("Monthly plan"):
+            st.dataframe({
+                'Month': plan['months'],
+                'Spend': format_currency_column(plan['spend_by_month']),
+                'Clients': format_fixed_column(plan['conversions_by_month'], 1),
+                'Revenue': format_currency_column(plan['revenue_by_month']),
+                'Next Rupiah ROI': format_fixed_column(plan['marginal_roi_by_month'], 1, "%")
+            }, hide_index=True, use_container_width=True)
+    st.caption(
+        "Each month has its own diminishing returns and clients won in a month pay until the end of the timeline, "
+        "so spend is front-loaded until saturation. Compared with the lump-sum "
+        f"{ALLOCATION_STRATEGIES[scenario['strategy']]} allocation of the same budget."
+    )
+
+@tab_fragment("report")
+def render_report(timer, scenario):
+    total_budget = scenario['total_budget']
+    selected_segments = scenario['selected_segments']
+    timeline = scenario['timeline']
+    budget_allocation = scenario['budget_allocation']
+    roi_metrics = scenario['roi_metrics']
+    
+    st.subheader("📋 Detailed Report")
+    
+    # Export functionality
+    col1, col2 = st.columns([3, 1])
+    
+    with col2:
+        export_format = st.selectbox(
+            "Export format", available_formats(), format_func=lambda name: EXPORT_FORMATS[name][0], key="export_format"
+        )
+        _, extension, mime, _ = EXPORT_FORMATS[export_format]
+        dashboard = get_dashboard()
         
-        # Market penetration insights
-        if roi_metrics['market_penetration'] < 0.1:
-            insights.append("📈 **Low Market Penetration**: Significant growth opportunity available. Consider expanding reach.")
-        elif roi_metrics['market_penetration'] > 1.0:
-            insights.append("🏆 **High Market Penetration**: Market saturation risk. Focus on customer retention and premium segments.")
+        # Files are encoded when the download is served (clicking does not rerun), so
+        # generated_at and the file name stamp are current, not the first session's
+        def export_report():
+            report = build_report(total_budget, selected_segments, timeline, scenario['strategy'],
+                                  budget_allocation, roi_metrics, dashboard.market_table.version)
+            return report_bytes(report, export_format)
         
-        # Channel-specific insights
-        if roi_metrics['channel_performance']:
-            best_channel = max(roi_metrics['channel_performance'], key=lambda x: x['roi'])
-            insights.append(f"🥇 **Top Performer**: {best_channel['segment']} - {best_channel['channel']} with {best_channel['roi']:.1f}% ROI")
-            
-            worst_channel = min(roi_metrics['channel_performance'], key=lambda x: x['roi'])
-            if worst_channel['roi'] < 50:
-                insights.append(f"🔴 **Underperformer**: {worst_channel['segment']} - {worst_channel['channel']} needs attention or budget reallocation")
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        st.download_button(
+            label="📥 Export Report",
+            data=export_report,
+            file_name=f"marketing_roi_report_{stamp}{extension}",
+            mime=mime,
+            type="primary",
+            on_click="ignore"
+        )
         
-        for insight in insights:
-            st.markdown(insight)
+        # Every strategy x projection timeline for these segments and budget, streamed
+        # to a temporary file on click; scenarios come from the result store when kept.
+        # Streamlit serves downloads from memory, so the finished file is read in only
+        # up to BUNDLE_MAX_BYTES
+        bundle_tasks = [
+            (name, total_budget, tuple(selected_segments), PROJECTION_TIMELINES) for name in ALLOCATION_STRATEGIES
+        ]
         
-        # Action items
-        st.subheader("🎯 Recommended Actions")
-        st.markdown("""
-        1. **Immediate Actions** (Next 30 days):
-           - Implement budget allocation as recommended above
-           - Set up tracking for key performance metrics
-           - Launch campaigns in top-performing channels first
+        def export_bundle():
+            with bundle_file(iter_reports(dashboard, bundle_tasks, get_result_store()), export_format) as f:
+                size = os.fstat(f.fileno()).st_size
+                if size > BUNDLE_MAX_BYTES:
+                    raise ValueError(f"Bundle is {size / (1 << 20):.0f} MB, over the {BUNDLE_MAX_BYTES >> 20} MB "
+                                     "download limit; use python -m roi_model.export")
+                return f.read()
         
-        2. **Short-term Optimizations** (Next 90 days):
-           - A/B test creative variations in high-ROI channels
-           - Refine targeting based on initial performance data
-           - Scale successful campaigns gradually
+        st.download_button(
+            label="📦 Scenario Bundle",
+            data=export_bundle,
+            file_name=f"marketing_roi_scenarios_{stamp}{bundle_extension(export_format)}",
+            mime="application/zip" if bundle_extension(export_format) == ".zip" else mime,
+            help=f"All allocation strategies × {len(PROJECTION_TIMELINES)} timelines, up to "
+                 f"{BUNDLE_MAX_BYTES >> 20} MB (larger exports: python -m roi_model.export)",
+            on_click="ignore"
+        )
+    
+    # Detailed performance table
+    if roi_metrics['channel_performance']:
+        st.subheader("Channel Performance Details")
+        with timer.stage("dataframe.report"):
+            display_df = get_payload_cache().get_or_compute(
+                ('report_table', scenario['key']),
+                lambda: build_detail_table(roi_metrics['channel_performance'])
+            )
+        st.dataframe(display_df, use_container_width=True)
+    
+    # Market insights
+    st.subheader("📊 Market Insights & Recommendations")
+    
+    insights = []
+    
+    # ROI insights
+    if roi_metrics['overall_roi'] > 200:
+        insights.append("🎯 **Excellent ROI**: Your campaign is projected to deliver exceptional returns. Consider scaling up investment.")
+    elif roi_metrics['overall_roi'] > 100:
+        insights.append("✅ **Good ROI**: Solid returns expected. Look for optimization opportunities in underperforming channels.")
+    else:
+        insights.append("⚠️ **Low ROI**: Consider reallocating budget to higher-performing channels or segments.")
+    
+    # Market penetration insights
+    if roi_metrics['market_penetration'] < 0.1:
+        insights.append("📈 **Low Market Penetration**: Significant growth opportunity available. Consider expanding reach.")
+    elif roi_metrics['market_penetration'] > 1.0:
+        insights.append("🏆 **High Market Penetration**: Market saturation risk. Focus on customer retention and premium segments.")
+    
+    # Channel-specific insights
+    if roi_metrics['channel_performance']:
+        channel_performance = roi_metrics['channel_performance']
+        labels, channel_roi = channel_performance.labels(), channel_performance['roi']
+        best = int(np.argmax(channel_roi))
+        insights.append(f"🥇 **Top Performer**: {labels[best]} with {channel_roi[best]:.1f}% ROI")
         
-        3. **Long-term Strategy** (6+ months):
-           - Develop channel-specific content strategies
-           - Build partnerships with high-performing channels
-           - Expand to additional market segments based on success
-        """)
+        worst = int(np.argmin(channel_roi))
+        if channel_roi[worst] < 50:
+            insights.append(f"🔴 **Underperformer**: {labels[worst]} needs attention or budget reallocation")
+    
+    for insight in insights:
+        st.markdown(insight)
+    
+    # Action items
+    st.subheader("🎯 Recommended Actions")
+    st.markdown("""
+    1. **Immediate Actions** (Next 30 days):
+       - Implement budget allocation as recommended above
+       - Set up tracking for key performance metrics
+       - Launch campaigns in top-performing channels first
+    
+    2. **Short-term Optimizations** (Next 90 days):
+       - A/B test creative variations in high-ROI channels
+       - Refine targeting based on initial performance data
+       - Scale successful campaigns gradually
+    
+    3. **Long-term Strategy** (6+ months):
+       - Develop channel-specific content strategies
+       - Build partnerships with high-performing channels
+       - Expand to additional market segments based on success
+    """)
 
 if __name__ == "__main__":
     main()
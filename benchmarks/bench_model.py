@@ -0,0 +1,210 @@
+"""Benchmarks for the ROI model hot paths on synthetic market tables
+
+Scales the built-in 20-pair table up to 100k (segment, channel) pairs and times
+allocation, goal seek, budget pacing, ROI metrics, diminishing returns, the
+Channel Optimization curves, response-curve fitting and the report-table
+formatting. Results are written as JSON; pass --compare to check a run against
+an earlier one and fail on regressions.
+
+    python benchmarks/bench_model.py --output bench.json
+    python benchmarks/bench_model.py --sizes 20 2000 --compare bench.json --threshold 1.3
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from roi_model import (  # noqa: E402
+    CohortSimulator,
+    IncrementalROIModel,
+    MarketTable,
+    MarketingROIDashboard,
+    build_detail_table,
+    goal_seek,
+    pace_budget,
+    roi_sensitivity,
+)
+from roi_model.fit import fit_response_curves  # noqa: E402
+
+DEFAULT_SIZES = [20, 200, 2000, 20000, 100000]
+CHANNELS = ["Word of Mouth", "Instagram Ads", "Google Ads", "Partnership"]
+# Total budget used for allocation cases, scaled with the table so spend per pair stays comparable
+BUDGET_PER_PAIR = 2500000
+# Minimum measured time per case before repeats stop
+MIN_CASE_SECONDS = 0.2
+MAX_REPEATS = 50
+
+def synthetic_market_table(n_pairs, seed=0):
+    """Market table with n_pairs rows drawn around the ranges of the built-in data"""
+    rng = np.random.default_rng(seed)
+    n_segments = max(1, n_pairs // len(CHANNELS))
+    segment_codes = np.repeat(np.arange(n_segments, dtype=np.int32), len(CHANNELS))[:n_pairs]
+    channel_codes = np.tile(np.arange(len(CHANNELS), dtype=np.int32), n_segments)[:n_pairs]
+    market_size = rng.integers(5000, 200000, n_segments).astype(float)
+    avg_deal_value = rng.integers(5, 80, n_segments) * 1000000.0
+    columns = {
+        "market_size": market_size[segment_codes],
+        "avg_deal_value": avg_deal_value[segment_codes],
+        "conversion_rate": rng.uniform(0.05, 0.30, n_pairs),
+        "cost_per_lead": rng.integers(5, 50, n_pairs) * 5000.0
+    }
+    segments = [f"Segment {i:06d}" for i in range(n_segments)]
+    return MarketTable(segment_codes, channel_codes, segments, CHANNELS, columns)
+
+def time_case(function):
+    """Run function until MIN_CASE_SECONDS or MAX_REPEATS; return timings in ms"""
+    function()  # warm-up
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < MAX_REPEATS and (time.perf_counter() - started < MIN_CASE_SECONDS or len(timings) < 3):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def build_cases(dashboard):
+    """Benchmark cases as (name, callable) for one dashboard"""
+    table = dashboard.market_table
+    segments = table.segments
+    total_budget = BUDGET_PER_PAIR * len(table)
+    allocation = dashboard.optimize_budget_allocation(total_budget, segments)
+    heuristic_allocation = dashboard.optimize_budget_allocation(total_budget, segments, "heuristic")
+    metrics = dashboard.calculate_roi_metrics(allocation)
+
+    rows = np.arange(len(table))
+    budgets = np.full(len(table), float(BUDGET_PER_PAIR))
+    first_segment_pairs = [(segments[0], channel) for channel in table.channels_for(segments[0])]
+    all_pairs = list(table.index)
+    curve_grid = np.linspace(0.1, 3, 50) * BUDGET_PER_PAIR
+
+    # Toggle one segment off and on again against an incremental model
+    incremental = IncrementalROIModel(dashboard)
+    incremental.update(total_budget, segments)
+    toggled_segments = segments[1:]
+
+    def toggle_segment():
+        incremental.update(total_budget, toggled_segments)
+        incremental.update(total_budget, segments)
+
+    # Two years of monthly spend / conversions per pair around its saturation budget
+    rng = np.random.default_rng(0)
+    observed_rows = np.repeat(rows, 24)
+    observed_spend = table.optimal_budget[observed_rows] * rng.uniform(0.2, 3.0, len(observed_rows))
+    _, observed_conversions, _ = dashboard.project_channels(observed_rows, observed_spend)
+
+    cases = [
+        ("optimize_budget_allocation[marginal]",
+         lambda: dashboard.optimize_budget_allocation(total_budget, segments)),
+        ("optimize_budget_allocation[heuristic]",
+         lambda: dashboard.optimize_budget_allocation(total_budget, segments, "heuristic")),
+        ("budget_frontier[400 budgets]",
+         lambda: dashboard.budget_frontier(segments, np.geomspace(1e5, 1e8, 400))),
+        ("goal_seek[clients, cold cache]",
+         lambda: goal_seek(dashboard, "total_conversions", metrics['total_conversions'], segments,
+                           budget_range=(total_budget / 100, total_budget * 10))),
+        ("budget_pacing[24 months]",
+         lambda: pace_budget(dashboard, total_budget * 3, segments, timeline_months=24)),
+        ("calculate_roi_metrics", lambda: dashboard.calculate_roi_metrics(allocation)),
+        ("incremental_update[toggle segment x2]", toggle_segment),
+        ("roi_sensitivity", lambda: roi_sensitivity(dashboard, allocation)),
+        ("cohort_simulation[60 months]",
+         lambda: CohortSimulator(dashboard, monthly_churn=0.03, campaign_months=3).run(heuristic_allocation)),
+        ("calculate_roi_metrics[heuristic]", lambda: dashboard.calculate_roi_metrics(heuristic_allocation)),
+        ("simulate_diminishing_returns[vector]",
+         lambda: dashboard.simulate_diminishing_returns(
+             table.conversion_rate[rows], budgets, table.optimal_budget[rows], table.decay[rows]
+         )),
+        ("tab3_curves[one segment x 1000 points]",
+         lambda: dashboard.diminishing_returns_curves(first_segment_pairs, np.linspace(1e5, 3e7, 1000))),
+        ("tab3_curves[all pairs x 50 points]",
+         lambda: dashboard.diminishing_returns_curves(all_pairs, curve_grid)),
+        ("fit_response_curves[24 months]",
+         lambda: fit_response_curves(observed_rows, observed_spend, observed_conversions, len(table))),
+    ]
+
+    if metrics['channel_performance']:
+        cases.append(("tab4_report_table", lambda: build_detail_table(metrics['channel_performance'])))
+    return cases
+
+def run(sizes, seed=0, pattern=None):
+    results = []
+    for n_pairs in sizes:
+        dashboard = MarketingROIDashboard(synthetic_market_table(n_pairs, seed))
+        for name, function in build_cases(dashboard):
+            if pattern and pattern not in name:
+                continue
+            timings = time_case(function)
+            results.append({
+                "case": name,
+                "pairs": n_pairs,
+                "repeats": len(timings),
+                "min_ms": min(timings),
+                "median_ms": statistics.median(timings),
+                "mean_ms": statistics.fmean(timings)
+            })
+            print(f"{name:<45} {n_pairs:>7} pairs  median {results[-1]['median_ms']:>10.3f} ms"
+                  f"  min {results[-1]['min_ms']:>10.3f} ms  ({len(timings)} runs)")
+    return results
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count()
+    }
+
+def compare(results, baseline_path, threshold):
+    """Print median ratios against a baseline run; return the regressed cases"""
+    with open(baseline_path) as f:
+        baseline = {(r["case"], r["pairs"]): r for r in json.load(f)["results"]}
+    regressions = []
+    print(f"\nComparison with {baseline_path} (threshold x{threshold:.2f})")
+    for result in results:
+        previous = baseline.get((result["case"], result["pairs"]))
+        if previous is None:
+            continue
+        ratio = result["median_ms"] / previous["median_ms"]
+        flag = "REGRESSION" if ratio > threshold else ""
+        print(f"{result['case']:<45} {result['pairs']:>7} pairs  x{ratio:6.2f}  {flag}")
+        if ratio > threshold:
+            regressions.append(result)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ROI model hot paths")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="market table sizes in pairs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--case", help="only run cases whose name contains this text")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="allowed median slowdown ratio")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.seed, args.case)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"environment": environment(), "seed": args.seed, "results": results}, f, indent=2)
+    if args.compare and compare(results, args.compare, args.threshold):
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""Measure how long `import roi_model` takes in a fresh interpreter
+
+Fails (exit code 1) when the median import time is over the target or when the
+core pulls in a UI library.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --target-ms 150 --runs 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Median wall time budget for importing the computation core
+IMPORT_TIME_TARGET_MS = 300
+# Libraries the core must not import
+UI_MODULES = ("streamlit", "plotly", "pandas")
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import roi_model
+elapsed = time.perf_counter() - start
+loaded = [name for name in {ui_modules!r} if name in sys.modules]
+print(elapsed * 1000, ",".join(loaded))
+"""
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def measure(runs):
+    """Import times in ms plus any UI modules that were loaded"""
+    timings, loaded = [], set()
+    probe = PROBE.format(ui_modules=UI_MODULES)
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", probe], cwd=REPO_ROOT, check=True, capture_output=True, text=True
+        ).stdout.split()
+        timings.append(float(output[0]))
+        if len(output) > 1:
+            loaded.update(output[1].split(","))
+    return timings, sorted(loaded)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--target-ms", type=float, default=IMPORT_TIME_TARGET_MS)
+    args = parser.parse_args(argv)
+
+    timings, loaded = measure(args.runs)
+    median = statistics.median(timings)
+    print(f"import roi_model: median {median:.1f} ms, min {min(timings):.1f} ms "
+          f"over {args.runs} runs (target {args.target_ms:.0f} ms)")
+    if loaded:
+        print(f"FAIL: core imported UI modules: {', '.join(loaded)}")
+        return 1
+    if median > args.target_ms:
+        print("FAIL: import time over target")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+"""Load test for the ROI JSON API (roi_model.server)
+
+Keeps --connections keep-alive connections busy with a mix of /roi, /allocation
+and /curves requests drawn from --distinct payloads (repeats exercise the response
+cache and request coalescing), plus an occasional /scenarios batch. Reports
+throughput, latency percentiles and the server's cache counters; exits 1 if any
+request failed or throughput is below --min-rps.
+
+    python -m roi_model.server --port 8600 &
+    python benchmarks/load_test.py --url http://127.0.0.1:8600 --requests 20000
+    python benchmarks/load_test.py --spawn --requests 5000 --distinct 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from roi_model import ALLOCATION_STRATEGIES, MarketingROIDashboard  # noqa: E402
+
+# Share of /scenarios batches among the requests, and scenarios per batch
+BATCH_SHARE = 0.01
+BATCH_SCENARIOS = 100
+
+def build_payloads(distinct, seed=0):
+    """distinct (path, body) requests around the dashboard's sidebar ranges"""
+    rng = random.Random(seed)
+    table = MarketingROIDashboard().market_table
+    segments, pairs = table.segments, list(table.index)
+
+    def scenario():
+        return {
+            "total_budget": rng.randrange(100000, 100000001, 500000),
+            "segments": rng.sample(segments, rng.randint(1, len(segments))),
+            "timeline_months": rng.choice([3, 6, 12, 24]),
+            "strategy": rng.choice(list(ALLOCATION_STRATEGIES))
+        }
+
+    payloads = []
+    for _ in range(distinct):
+        kind = rng.random()
+        if kind < BATCH_SHARE:
+            body = {"scenarios": [scenario() for _ in range(BATCH_SCENARIOS)]}
+            path = "/scenarios"
+        elif kind < 0.6:
+            body, path = scenario(), "/roi"
+        elif kind < 0.85:
+            body, path = scenario(), "/allocation"
+            del body["timeline_months"]
+        else:
+            body = {
+                "pairs": [list(pair) for pair in rng.sample(pairs, rng.randint(1, 5))],
+                "budgets": [rng.randrange(100000, 30000001, 100000) for _ in range(50)],
+                "timeline_months": 12
+            }
+            path = "/curves"
+        payloads.append((path, json.dumps(body).encode()))
+    return payloads
+
+async def request(reader, writer, host, method, path, body=b""):
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+async def run_load(host, port, payloads, total, connections, seed=0):
+    rng = random.Random(seed)
+    schedule = [rng.choice(payloads) for _ in range(total)]
+    latencies, statuses = [], {}
+    position = 0
+
+    async def client():
+        nonlocal position
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            while position < len(schedule):
+                path, body = schedule[position]
+                position += 1
+                started = time.perf_counter()
+                status, _ = await request(reader, writer, host, "POST", path, body)
+                latencies.append((time.perf_counter() - started) * 1000)
+                statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(connections)))
+    return time.perf_counter() - started, latencies, statuses
+
+async def fetch_json(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        _, body = await request(reader, writer, host, "GET", path)
+        return json.loads(body)
+    finally:
+        writer.close()
+
+async def wait_ready(host, port, timeout=30):
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            return await fetch_json(host, port, "/health")
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument('--url', default="http://127.0.0.1:8600")
+    parser.add_argument('--spawn', action='store_true', help="start a server on the --url port for the run")
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--connections', type=int, default=32)
+    parser.add_argument('--distinct', type=int, default=500, help="distinct request payloads")
+    parser.add_argument('--min-rps', type=float, default=0.0, help="fail below this throughput")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write the results as JSON")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+    server = None
+    if args.spawn:
+        server = subprocess.Popen([sys.executable, "-m", "roi_model.server", "--host", host, "--port", str(port)],
+                                  cwd=REPO_ROOT)
+    try:
+        asyncio.run(wait_ready(host, port))
+        payloads = build_payloads(args.distinct, args.seed)
+        elapsed, latencies, statuses = asyncio.run(
+            run_load(host, port, payloads, args.requests, args.connections, args.seed)
+        )
+        health = asyncio.run(fetch_json(host, port, "/health"))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    results = {
+        "requests": len(latencies),
+        "connections": args.connections,
+        "distinct_payloads": args.distinct,
+        "seconds": elapsed,
+        "requests_per_second": len(latencies) / elapsed,
+        "latency_ms": {
+            "p50": statistics.median(latencies),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": max(latencies)
+        },
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "server": {"coalesced": health["coalesced"], "cache": health["cache"]}
+    }
+    latency = results["latency_ms"]
+    print(f"{results['requests']:,} requests in {elapsed:.2f} s: {results['requests_per_second']:,.0f} req/s "
+          f"over {args.connections} connections")
+    print(f"latency ms  p50 {latency['p50']:.2f}  p95 {latency['p95']:.2f}  p99 {latency['p99']:.2f}  "
+          f"max {latency['max']:.2f}")
+    print(f"statuses {results['statuses']}  coalesced {health['coalesced']}  "
+          f"cache hit rate {health['cache']['hit_rate']:.1%}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    failed = sum(count for status, count in statuses.items() if status != 200)
+    return 1 if failed or results["requests_per_second"] < args.min_rps else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""Computation core of the Marketing ROI dashboard
+
+Importable without Streamlit or plotting libraries, so batch jobs, tests and
+services can use the ROI math directly.
+"""
+from .cache import ScenarioCache
+from .cohort import COHORT_DEFAULTS, COHORT_HORIZON_MONTHS, CohortSimulator
+from .formatting import build_detail_table, format_currency, format_currency_column, format_fixed_column, format_number
+from .goalseek import GOAL_METRICS, GoalSeeker, goal_seek
+from .incremental import IncrementalROIModel
+from .market_data import (
+    DIMINISHING_DECAY,
+    OPTIMAL_BUDGET_SHARE,
+    MarketTable,
+    load_market_table,
+)
+from .model import ALLOCATION_STRATEGIES, MODEL_VERSION, BudgetFrontier, MarginalAllocator, MarketingROIDashboard
+from .montecarlo import UNCERTAINTY_DEFAULTS, MonteCarloSimulator
+from .pacing import BudgetPacer, pace_budget
+from .results import ChannelPerformance
+from .sensitivity import SENSITIVITY_PARAMETERS, roi_sensitivity, tornado_rows
+from .store import ResultStore, open_store
+
+__all__ = [
+    "ALLOCATION_STRATEGIES",
+    "COHORT_DEFAULTS",
+    "COHORT_HORIZON_MONTHS",
+    "DIMINISHING_DECAY",
+    "GOAL_METRICS",
+    "MODEL_VERSION",
+    "OPTIMAL_BUDGET_SHARE",
+    "SENSITIVITY_PARAMETERS",
+    "UNCERTAINTY_DEFAULTS",
+    "BudgetFrontier",
+    "BudgetPacer",
+    "ChannelPerformance",
+    "CohortSimulator",
+    "GoalSeeker",
+    "IncrementalROIModel",
+    "MarginalAllocator",
+    "MarketTable",
+    "MarketingROIDashboard",
+    "MonteCarloSimulator",
+    "ResultStore",
+    "ScenarioCache",
+    "build_detail_table",
+    "format_currency",
+    "format_currency_column",
+    "format_fixed_column",
+    "format_number",
+    "goal_seek",
+    "load_market_table",
+    "open_store",
+    "pace_budget",
+    "roi_sensitivity",
+    "tornado_rows",
+]
@@ -0,0 +1,88 @@
+"""In-memory scenario result cache"""
+import threading
+from collections import OrderedDict
+
+class ScenarioCache:
+    """Thread-safe LRU cache of scenario results with hit/miss counters
+    
+    Bounded by entry count, and by the total of size_of(value) when max_bytes is
+    set (for payloads such as figures and export files, whose sizes vary widely).
+    """
+    
+    def __init__(self, max_entries=256, max_bytes=None, size_of=None):
+        if max_bytes is not None and size_of is None:
+            raise ValueError("A byte-bounded cache needs size_of")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_of = size_of
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def lookup(self, key):
+        """(True, value) if key is cached, else (False, None); counts a hit or miss"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key]
+            self.misses += 1
+            return False, None
+    
+    def store(self, key, value):
+        """Cache value under key, evicting the least recently used entries
+        
+        A value larger than max_bytes on its own is not cached.
+        """
+        size = self.size_of(value) if self.size_of is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            self.bytes += size - self._sizes.get(key, 0)
+            self._entries[key] = value
+            self._sizes[key] = size
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries or (self.max_bytes is not None and self.bytes > self.max_bytes):
+                evicted, _ = self._entries.popitem(last=False)
+                self.bytes -= self._sizes.pop(evicted)
+                self.evictions += 1
+    
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, computing and storing it on a miss"""
+        found, value = self.lookup(key)
+        if found:
+            return value
+        
+        # Compute outside the lock so one slow scenario doesn't block other sessions
+        value = compute()
+        self.store(key, value)
+        return value
+    
+    def clear(self):
+        """Drop every cached scenario (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.bytes = 0
+    
+    def stats(self):
+        """Counters for monitoring the cache hit rate"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,260 @@
+"""Report export in JSON, CSV, Parquet and Excel, for one scenario or a bundle of many
+
+Reports are written straight to a binary file object. Bundles stream channel rows
+scenario by scenario and keep only the one-row summaries until the end, so
+exporting thousands of scenarios runs in constant memory.
+
+    python -m roi_model.export --output reports.zip --format parquet --budgets 10000000 50000000 --timelines 6 12
+"""
+import argparse
+import contextlib
+import csv
+import importlib.util
+import io
+import json
+import os
+import sys
+import tempfile
+import zipfile
+from datetime import datetime
+
+from .model import ALLOCATION_STRATEGIES, MarketingROIDashboard
+from .results import CHANNEL_FIELDS, json_default
+from .store import open_store
+from .sweep import COLUMNS as SUMMARY_COLUMNS, DEFAULT_TIMELINES, evaluate_task, summary_row
+
+CHANNEL_COLUMNS = ['scenario_id', *CHANNEL_FIELDS]
+# Format -> (label, file extension, MIME type, module it needs or None)
+EXPORT_FORMATS = {
+    "json": ("JSON", ".json", "application/json", None),
+    "csv": ("CSV", ".csv", "text/csv", None),
+    "parquet": ("Parquet", ".parquet", "application/vnd.apache.parquet", "pyarrow"),
+    "xlsx": ("Excel", ".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "openpyxl")
+}
+# Columns written as text / integers; every other column is a float
+TEXT_COLUMNS = {'scenario_id', 'strategy', 'segments', 'market_version', 'segment', 'channel'}
+INTEGER_COLUMNS = {'segment_count', 'timeline_months', 'channels_funded'}
+
+def available_formats():
+    """EXPORT_FORMATS keys whose optional dependency is installed"""
+    return [
+        name for name, (_, _, _, module) in EXPORT_FORMATS.items()
+        if module is None or importlib.util.find_spec(module) is not None
+    ]
+
+def build_report(total_budget, selected_segments, timeline_months, strategy, budget_allocation, roi_metrics,
+                 market_version, generated_at=None):
+    """Report dictionary for one scenario, as written by the JSON export"""
+    return {
+        'campaign_config': {
+            'total_budget': total_budget,
+            'selected_segments': list(selected_segments),
+            'timeline_months': timeline_months,
+            'strategy': strategy
+        },
+        'roi_metrics': roi_metrics,
+        'budget_allocation': budget_allocation,
+        'market_version': market_version,
+        'generated_at': (generated_at or datetime.now()).isoformat()
+    }
+
+def iter_reports(dashboard, tasks, store=None):
+    """Reports for sweep-style tasks of (strategy, total_budget, segments, timelines)
+
+    Each allocation is computed once and shared by its timelines, unless its
+    scenarios are already in the result store; reports are produced one at a time
+    so a bundle writer never holds more than one.
+    """
+    version = dashboard.market_table.version
+    for task in tasks:
+        strategy, total_budget, segments, _ = task
+        for timeline, budget_allocation, roi_metrics in evaluate_task(dashboard, task, store):
+            yield build_report(total_budget, segments, timeline, strategy, budget_allocation, roi_metrics, version)
+
+def report_rows(report):
+    """(summary row, channel rows) of one report"""
+    config = report['campaign_config']
+    summary = summary_row(
+        config['strategy'], config['total_budget'], config['selected_segments'], config['timeline_months'],
+        report['roi_metrics'], report['market_version']
+    )
+    channels = [
+        {'scenario_id': summary['scenario_id'], **channel}
+        for channel in report['roi_metrics']['channel_performance'].records()
+    ]
+    return summary, channels
+
+class _CSVTable:
+    def __init__(self, f, columns):
+        self._text = io.TextIOWrapper(f, encoding="utf-8", newline="")
+        self._writer = csv.DictWriter(self._text, fieldnames=columns)
+        self._writer.writeheader()
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        # Leave the underlying binary file open for the caller
+        self._text.flush()
+        self._text.detach()
+
+class _ParquetTable:
+    def __init__(self, f, columns, metadata=None):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        types = {name: pa.string() if name in TEXT_COLUMNS else pa.int64() if name in INTEGER_COLUMNS else pa.float64()
+                 for name in columns}
+        self._pa = pa
+        self._schema = pa.schema(list(types.items()), metadata=metadata)
+        self._writer = pq.ParquetWriter(f, self._schema)
+
+    def write(self, rows):
+        if rows:
+            self._writer.write_table(self._pa.Table.from_pylist(rows, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+class _ExcelSheet:
+    def __init__(self, workbook, title, columns):
+        self._sheet = workbook.create_sheet(title)
+        self._columns = columns
+        self._sheet.append(columns)
+
+    def write(self, rows):
+        for row in rows:
+            self._sheet.append([row[name] for name in self._columns])
+
+def write_report(report, fmt, f):
+    """Write one scenario report in fmt (a key of EXPORT_FORMATS) to a binary file
+
+    CSV holds the channel rows; Parquet holds them with the summary row in the
+    file metadata; Excel has a Summary and a Channels sheet.
+    """
+    if fmt == "json":
+        f.write(json.dumps(report, separators=(',', ':'), default=json_default).encode())
+    elif fmt == "csv":
+        table = _CSVTable(f, CHANNEL_COLUMNS)
+        table.write(report_rows(report)[1])
+        table.close()
+    elif fmt == "parquet":
+        summary, channels = report_rows(report)
+        table = _ParquetTable(f, CHANNEL_COLUMNS, metadata={b"roi_summary": json.dumps(summary).encode()})
+        table.write(channels)
+        table.close()
+    elif fmt == "xlsx":
+        write_bundle([report], fmt, f)
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+def write_bundle(reports, fmt, f):
+    """Stream many reports into one file: a zip, or a single workbook for Excel
+
+    The zip holds summary + channels tables in fmt, or reports.jsonl with one JSON
+    report per line. Returns the number of reports written.
+    """
+    if fmt == "xlsx":
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        summary_sheet = _ExcelSheet(workbook, "Summary", SUMMARY_COLUMNS)
+        channel_sheet = _ExcelSheet(workbook, "Channels", CHANNEL_COLUMNS)
+        count = 0
+        for report in reports:
+            summary, channels = report_rows(report)
+            summary_sheet.write([summary])
+            channel_sheet.write(channels)
+            count += 1
+        workbook.save(f)
+        return count
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    extension = EXPORT_FORMATS[fmt][1]
+    count = 0
+    with zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as bundle:
+        if fmt == "json":
+            with bundle.open("reports.jsonl", "w") as entry:
+                for report in reports:
+                    entry.write(json.dumps(report, separators=(',', ':'), default=json_default).encode() + b"\n")
+                    count += 1
+            return count
+
+        # Only one zip entry can be open at a time, so summaries wait for the channel table
+        summaries = []
+        with bundle.open(f"channels{extension}", "w") as entry:
+            table = _CSVTable(entry, CHANNEL_COLUMNS) if fmt == "csv" else _ParquetTable(entry, CHANNEL_COLUMNS)
+            for report in reports:
+                summary, channels = report_rows(report)
+                summaries.append(summary)
+                table.write(channels)
+            table.close()
+        with bundle.open(f"summary{extension}", "w") as entry:
+            table = _CSVTable(entry, SUMMARY_COLUMNS) if fmt == "csv" else _ParquetTable(entry, SUMMARY_COLUMNS)
+            table.write(summaries)
+            table.close()
+    return len(summaries)
+
+def report_bytes(report, fmt):
+    """One report encoded in fmt, for download buttons and HTTP responses"""
+    buffer = io.BytesIO()
+    write_report(report, fmt, buffer)
+    return buffer.getvalue()
+
+def bundle_file(reports, fmt):
+    """Bundle streamed into an anonymous temporary file, rewound for reading
+
+    Download buttons and HTTP responses read it from disk, so the zip is never
+    assembled in memory.
+    """
+    f = tempfile.TemporaryFile()
+    try:
+        write_bundle(reports, fmt, f)
+    except BaseException:
+        f.close()
+        raise
+    f.seek(0)
+    return f
+
+def bundle_extension(fmt):
+    return EXPORT_FORMATS[fmt][1] if fmt == "xlsx" else ".zip"
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Export scenario reports as one bundle")
+    parser.add_argument('--output', required=True, help="bundle file to write (.zip, or .xlsx for --format xlsx)")
+    parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='csv')
+    parser.add_argument('--budgets', type=int, nargs='+', required=True)
+    parser.add_argument('--timelines', type=int, nargs='+', default=DEFAULT_TIMELINES)
+    parser.add_argument('--segments', nargs='+', help="segments to fund (default: all)")
+    parser.add_argument('--strategy', nargs='+', choices=list(ALLOCATION_STRATEGIES), default=['marginal'])
+    parser.add_argument('--no-store', action='store_true', help="compute every scenario without the result store")
+    parser.add_argument('--quiet', action='store_true')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    dashboard = MarketingROIDashboard()
+    segments = tuple(args.segments or dashboard.market_table.segments)
+    unknown = set(segments) - set(dashboard.market_table.segments)
+    if unknown:
+        print(f"Unknown segments: {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 2
+    tasks = [(strategy, budget, segments, args.timelines) for strategy in args.strategy for budget in args.budgets]
+
+    store = None if args.no_store else open_store(market_version=dashboard.market_table.version)
+
+    # Written beside the target and renamed, so an interrupted export leaves no torn file
+    try:
+        with open(args.output + ".tmp", "wb") as f, store.deferred() if store is not None else contextlib.nullcontext():
+            count = write_bundle(iter_reports(dashboard, tasks, store), args.format, f)
+    finally:
+        if store is not None:
+            store.close()
+    os.replace(args.output + ".tmp", args.output)
+    if not args.quiet:
+        print(f"{count} scenario reports written to {args.output}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
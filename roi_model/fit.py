@@ -0,0 +1,205 @@
+"""Fit per-pair diminishing-returns curves from observed spend and conversions
+
+Observations are (segment, channel, spend, conversions) rows, typically one per
+pair per month. The response model is the one the dashboard projects with,
+
+    conversions = spend * rate / (1 + decay * excess),   excess = max(spend - saturation, 0) / saturation
+
+with rate = conversion_rate / cost_per_lead. For a fixed saturation budget,
+multiplying through by the denominator makes it linear in (1 / rate, decay / rate):
+
+    spend = conversions * (a + c * excess)
+
+so every pair is solved at once from 2x2 normal equations built with
+np.add.reduceat. Saturation is found by a grid search over each pair's observed
+spend range, refined once around the best point, keeping the candidate with the
+lowest squared error in conversions. All work is array arithmetic over the
+observations, one pass per candidate, so thousands of pairs fit in about a second.
+
+    python -m roi_model.fit monthly_results.csv --output fitted_market.csv
+    ROI_MARKET_DATA=fitted_market.csv streamlit run app.py
+"""
+import argparse
+import csv
+import os
+import sys
+
+import numpy as np
+
+from .ingest import write_market_csv
+from .market_data import CURVE_COLUMNS, load_market_table
+
+OBSERVATION_COLUMNS = ("segment", "channel", "spend", "conversions")
+# Saturation candidates per pair in the coarse grid and in the refinement around its best point
+FIT_GRID_POINTS = 48
+# Pairs need this many observations to be fitted, and this many past saturation to fit the curve
+MIN_OBSERVATIONS = 6
+MIN_SATURATED = 2
+# Decay is kept inside (0, 1) so marginal revenue stays positive just past saturation
+MAX_DECAY = 0.99
+MIN_DECAY = 1e-3
+
+def read_observations(path):
+    """(segments, channels, spend, conversions) arrays from a CSV or Parquet file"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".parquet", ".pq"):
+        import pyarrow.parquet as pq
+
+        data = pq.read_table(path, columns=list(OBSERVATION_COLUMNS)).to_pydict()
+    elif extension == ".csv":
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+        data = {name: [row[name] for row in rows] for name in OBSERVATION_COLUMNS}
+    else:
+        raise ValueError(f"Unsupported observation file: {path}")
+    return (
+        data["segment"], data["channel"],
+        np.asarray(data["spend"], dtype=float), np.asarray(data["conversions"], dtype=float)
+    )
+
+def _solve(spend, conversions, starts, saturation):
+    """Least-squares rate and decay per pair for one saturation budget per pair
+
+    Observations are grouped by pair (starts are the group boundaries) and
+    saturation is already repeated per observation. Returns (sse, a, decay,
+    saturated), with a = 1 / rate and saturated counting observations past
+    saturation.
+    """
+    excess = np.maximum(spend - saturation, 0) / saturation
+    weighted = conversions * excess
+    s_yy = np.add.reduceat(conversions * conversions, starts)
+    s_yye = np.add.reduceat(conversions * weighted, starts)
+    s_yyee = np.add.reduceat(weighted * weighted, starts)
+    s_by = np.add.reduceat(spend * conversions, starts)
+    s_bye = np.add.reduceat(spend * weighted, starts)
+
+    determinant = s_yy * s_yyee - s_yye ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a = (s_by * s_yyee - s_bye * s_yye) / determinant
+        c = (s_yy * s_bye - s_yye * s_by) / determinant
+        decay = np.where(determinant > 1e-12 * s_yy * s_yyee, c / a, 0.0)
+    decay = np.clip(np.nan_to_num(decay), 0.0, MAX_DECAY)
+
+    # Refit the scale with decay fixed; equals the joint solution when decay was not clipped
+    counts = np.diff(np.append(starts, len(spend)))
+    decay_per_observation = np.repeat(decay, counts)
+    scaled = conversions * (1 + decay_per_observation * excess)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a = np.add.reduceat(spend * scaled, starts) / np.add.reduceat(scaled * scaled, starts)
+        predicted = spend / (np.repeat(a, counts) * (1 + decay_per_observation * excess))
+    sse = np.add.reduceat((conversions - predicted) ** 2, starts)
+    saturated = np.add.reduceat((excess > 0).astype(float), starts)
+    return np.where(np.isfinite(sse) & (a > 0), sse, np.inf), a, decay, saturated
+
+def fit_response_curves(pair_codes, spend, conversions, n_pairs, grid_points=FIT_GRID_POINTS):
+    """Fitted response curve per pair code in range(n_pairs)
+
+    pair_codes, spend and conversions are aligned observation arrays. Returns arrays
+    of length n_pairs: observations, rate (conversions per Rupiah below
+    saturation), saturation_budget, decay, saturated (observations past the fitted
+    saturation) and rmse. Pairs without observations get NaN.
+    """
+    pair_codes = np.asarray(pair_codes, dtype=np.intp)
+    order = np.argsort(pair_codes, kind='stable')
+    pair_codes, spend, conversions = pair_codes[order], np.asarray(spend, dtype=float)[order], np.asarray(conversions, dtype=float)[order]
+    valid = spend > 0
+    pair_codes, spend, conversions = pair_codes[valid], spend[valid], conversions[valid]
+    starts = np.flatnonzero(np.r_[True, pair_codes[1:] != pair_codes[:-1]]) if len(pair_codes) else np.empty(0, dtype=np.intp)
+    counts = np.diff(np.append(starts, len(spend)))
+    low = np.minimum.reduceat(spend, starts) if len(starts) else np.empty(0)
+    high = np.maximum.reduceat(spend, starts) if len(starts) else np.empty(0)
+
+    # Geometric grid from the lowest to the highest observed spend; the top point is "never saturates"
+    log_low, log_span = np.log(low), np.log(high) - np.log(low)
+    steps = np.linspace(0.0, 1.0, grid_points)
+    best = (np.full(len(starts), np.inf), np.zeros(len(starts)), np.zeros(len(starts)), np.zeros(len(starts)), high)
+    for refine in (False, True):
+        if refine:
+            # Second pass between the neighbours of the best coarse point
+            position = (np.log(best[4]) - log_low) / np.where(log_span > 0, log_span, 1.0)
+            width = 1.0 / (grid_points - 1)
+            candidates = np.clip(position[None, :] + width * (2 * steps[:, None] - 1), 0.0, 1.0)
+        else:
+            candidates = np.broadcast_to(steps[:, None], (grid_points, len(starts)))
+        for step in candidates:
+            saturation = np.exp(log_low + step * log_span)
+            sse, a, decay, saturated = _solve(spend, conversions, starts, np.repeat(saturation, counts))
+            better = sse < best[0]
+            best = tuple(np.where(better, new, old) for new, old in zip((sse, a, decay, saturated, saturation), best))
+
+    sse, a, decay, saturated, saturation = best
+    result = {name: np.full(n_pairs, np.nan) for name in ("rate", "saturation_budget", "decay", "saturated", "rmse")}
+    result['observations'] = np.bincount(pair_codes, minlength=n_pairs)
+    # Pairs without a single conversion have no finite fit and stay NaN
+    fitted = np.isfinite(sse)
+    codes = pair_codes[starts][fitted]
+    result['rate'][codes] = 1 / a[fitted]
+    result['saturation_budget'][codes] = saturation[fitted]
+    result['decay'][codes] = decay[fitted]
+    result['saturated'][codes] = saturated[fitted]
+    result['rmse'][codes] = np.sqrt(sse[fitted] / counts[fitted])
+    return result
+
+def fitted_records(base_table, segments, channels, spend, conversions,
+                   min_observations=MIN_OBSERVATIONS, grid_points=FIT_GRID_POINTS):
+    """Market table records with fitted curves for every pair with enough observations
+
+    The fitted rate replaces conversion_rate (cost_per_lead is kept). The curve
+    columns are only filled where at least MIN_SATURATED observations lie past the
+    fitted saturation and the decay is measurable; other pairs keep the default
+    curve. Observations of pairs missing from the base table are ignored.
+    """
+    index = base_table.index
+    pair_codes = np.fromiter((index.get(pair, -1) for pair in zip(segments, channels)), dtype=np.intp, count=len(spend))
+    known = pair_codes >= 0
+    fit = fit_response_curves(pair_codes[known], spend[known], conversions[known], len(base_table), grid_points)
+
+    rate_fitted = (fit['observations'] >= min_observations) & np.isfinite(fit['rate'])
+    curve_fitted = rate_fitted & (fit['saturated'] >= MIN_SATURATED) & (fit['decay'] >= MIN_DECAY)
+    conversion_rate = np.where(rate_fitted, fit['rate'] * base_table.cost_per_lead, base_table.conversion_rate)
+    curves = {
+        "saturation_budget": np.where(curve_fitted, fit['saturation_budget'], base_table.curve_columns["saturation_budget"]),
+        "decay": np.where(curve_fitted, fit['decay'], base_table.curve_columns["decay"])
+    }
+    records = [
+        {
+            "segment": base_table.segment[row],
+            "channel": base_table.channel[row],
+            "market_size": float(base_table.market_size[row]),
+            "avg_deal_value": float(base_table.avg_deal_value[row]),
+            "conversion_rate": float(conversion_rate[row]),
+            "cost_per_lead": float(base_table.cost_per_lead[row]),
+            **{name: float(curves[name][row]) for name in CURVE_COLUMNS}
+        }
+        for row in range(len(base_table))
+    ]
+    return records, fit, rate_fitted, curve_fitted
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fit diminishing-returns curves from observed spend and conversions")
+    parser.add_argument('observations', help="CSV or Parquet file with segment, channel, spend, conversions rows")
+    parser.add_argument('--output', required=True, help="market data CSV to write, including the fitted curves")
+    parser.add_argument('--base', help="market data to calibrate (default: the dashboard's market data)")
+    parser.add_argument('--min-observations', type=int, default=MIN_OBSERVATIONS)
+    parser.add_argument('--grid-points', type=int, default=FIT_GRID_POINTS)
+    parser.add_argument('--quiet', action='store_true')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    base_table = load_market_table(args.base)
+    segments, channels, spend, conversions = read_observations(args.observations)
+    records, fit, rate_fitted, curve_fitted = fitted_records(
+        base_table, segments, channels, spend, conversions, args.min_observations, args.grid_points
+    )
+    write_market_csv(records, args.output)
+    if not args.quiet:
+        rmse = fit['rmse'][rate_fitted]
+        print(f"{int(rate_fitted.sum())} of {len(base_table)} pairs fitted, "
+              f"{int(curve_fitted.sum())} with a saturation curve"
+              + (f", median RMSE {np.median(rmse):.2f} conversions" if len(rmse) else ""), file=sys.stderr)
+        print(f"Written to {args.output}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
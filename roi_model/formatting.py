@@ -0,0 +1,38 @@
+"""Display formatting helpers"""
+import numpy as np
+
+def format_currency(amount):
+    """Format currency in Indonesian Rupiah"""
+    return f"Rp {amount:,.0f}"
+
+def format_number(number):
+    """Format large numbers with K, M suffixes"""
+    if number >= 1000000:
+        return f"{number/1000000:.1f}M"
+    elif number >= 1000:
+        return f"{number/1000:.1f}K"
+    else:
+        return f"{number:.0f}"
+
+def format_currency_column(amounts):
+    """format_currency over a whole column (array or Series)"""
+    return [f"Rp {amount:,.0f}" for amount in np.asarray(amounts, dtype=float).tolist()]
+
+def format_fixed_column(values, decimals=0, suffix=""):
+    """Fixed-point text for a whole column, e.g. ROI percentages with suffix="%" """
+    return [f"{value:.{decimals}f}{suffix}" for value in np.asarray(values, dtype=float).tolist()]
+
+def build_detail_table(channel_performance):
+    """Formatted Channel Performance Details table (a pandas DataFrame) for the report tab"""
+    import pandas as pd
+
+    # Columns are formatted whole, straight from the result arrays
+    return pd.DataFrame({
+        'Segment': channel_performance['segment'],
+        'Channel': channel_performance['channel'],
+        'Budget': format_currency_column(channel_performance['budget']),
+        'Leads': format_fixed_column(channel_performance['leads']),
+        'Conversions': format_fixed_column(channel_performance['conversions']),
+        'Revenue': format_currency_column(channel_performance['revenue']),
+        'ROI': format_fixed_column(channel_performance['roi'], 1, "%")
+    })
@@ -0,0 +1,127 @@
+"""Goal seek: the total budget that reaches a target client count, revenue, penetration or ROI
+
+Both allocation strategies fund every channel more as the total budget grows,
+so expected clients, revenue and market penetration never fall with budget,
+while overall ROI never rises (each channel's revenue is concave from zero).
+The answer is therefore found by bisection on a grid of `resolution` Rupiah:
+the minimum budget reaching a client, revenue or penetration target, and the
+maximum budget that still keeps an ROI target. With the marginal strategy each
+step reads the metrics off one BudgetFrontier (no allocation per step); the
+heuristic strategy runs evaluate_scenario per step. Step values are memoized,
+and full scenarios are kept in a ScenarioCache under the dashboard's
+scenario_key, so repeated and neighbouring searches reuse earlier results.
+
+    seeker = GoalSeeker(MarketingROIDashboard(), ["Coffee Shops"], timeline_months=12)
+    result = seeker.seek("total_conversions", 50)
+"""
+import math
+
+from .cache import ScenarioCache
+from .model import BudgetFrontier
+
+# Metric of calculate_roi_metrics -> (label, whether it grows with the total budget)
+GOAL_METRICS = {
+    "total_conversions": ("Expected Clients", True),
+    "total_revenue": ("Projected Revenue (Rp)", True),
+    "market_penetration": ("Market Penetration (%)", True),
+    "overall_roi": ("Overall ROI (%)", False)
+}
+# Budgets are searched in steps of this many Rupiah
+DEFAULT_RESOLUTION = 10000
+DEFAULT_BUDGET_RANGE = (100000, 100000000)
+GOAL_SEEK_CACHE_SIZE = 1024
+
+class GoalSeeker:
+    """Inverse solve of one scenario configuration (segments, timeline, strategy)"""
+
+    def __init__(self, dashboard, selected_segments, timeline_months=12, strategy="marginal",
+                 budget_range=DEFAULT_BUDGET_RANGE, resolution=DEFAULT_RESOLUTION, cache=None):
+        self.dashboard = dashboard
+        self.selected_segments = list(selected_segments)
+        self.timeline_months = timeline_months
+        self.strategy = strategy
+        self.resolution = resolution
+        # Search positions are integer steps of resolution inside the budget range
+        self.low = math.ceil(budget_range[0] / resolution)
+        self.high = math.floor(budget_range[1] / resolution)
+        if self.low > self.high:
+            raise ValueError("The budget range holds no multiple of the resolution")
+        self.cache = cache if cache is not None else ScenarioCache(max_entries=GOAL_SEEK_CACHE_SIZE)
+        self.evaluations = 0
+        self._frontier = None
+        # Search step -> metrics read at that budget
+        self._values = {}
+
+    def evaluate(self, total_budget):
+        """(budget_allocation, roi_metrics) for one total budget, memoized"""
+        def compute():
+            self.evaluations += 1
+            return self.dashboard.evaluate_scenario(
+                total_budget, self.selected_segments, self.timeline_months, self.strategy
+            )
+
+        key = self.dashboard.scenario_key(total_budget, self.selected_segments, self.timeline_months, self.strategy)
+        return self.cache.get_or_compute(key, compute)
+
+    def _value(self, metric, step):
+        values = self._values.get(step)
+        if values is None:
+            total_budget = step * self.resolution
+            if self.strategy == "marginal":
+                if self._frontier is None:
+                    self._frontier = BudgetFrontier(self.dashboard.market_table, self.selected_segments)
+                self.evaluations += 1
+                frontier = self._frontier.evaluate([total_budget], self.timeline_months)
+                values = {name: float(frontier[name][0]) for name in GOAL_METRICS}
+            else:
+                values = self.evaluate(total_budget)[1]
+            self._values[step] = values
+        return values[metric]
+
+    def seek(self, metric, target):
+        """Budget on the resolution grid that meets `target` for `metric`
+
+        Growing metrics give the minimum budget with metric >= target; overall_roi
+        gives the maximum budget with ROI >= target. Returns a dict with
+        total_budget, achieved (the metric there), feasible, budget_allocation,
+        roi_metrics and evaluations (budgets this search had to compute). An
+        unreachable target returns feasible=False at the closest end of the range.
+        """
+        if metric not in GOAL_METRICS:
+            raise ValueError(f"Unknown goal metric: {metric}")
+        grows = GOAL_METRICS[metric][1]
+        evaluations = self.evaluations
+
+        def meets(step):
+            return self._value(metric, step) >= target
+
+        # Bisection keeps `inner` failing the target (or just outside the range) and `outer` meeting it
+        if grows:
+            inner, outer = self.low - 1, self.high
+        else:
+            inner, outer = self.high + 1, self.low
+        feasible = meets(outer)
+        if feasible:
+            while abs(outer - inner) > 1:
+                middle = (inner + outer) // 2
+                if meets(middle):
+                    outer = middle
+                else:
+                    inner = middle
+
+        total_budget = outer * self.resolution
+        budget_allocation, roi_metrics = self.evaluate(total_budget)
+        return {
+            "metric": metric,
+            "target": target,
+            "feasible": feasible,
+            "total_budget": total_budget,
+            "achieved": roi_metrics[metric],
+            "budget_allocation": budget_allocation,
+            "roi_metrics": roi_metrics,
+            "evaluations": self.evaluations - evaluations
+        }
+
+def goal_seek(dashboard, metric, target, selected_segments, timeline_months=12, strategy="marginal", **options):
+    """One-off GoalSeeker(...).seek(metric, target); options are GoalSeeker keyword arguments"""
+    return GoalSeeker(dashboard, selected_segments, timeline_months, strategy, **options).seek(metric, target)
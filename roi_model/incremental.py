@@ -0,0 +1,322 @@
+"""Incremental scenario evaluation that recomputes only the rows an input change touches
+
+IncrementalROIModel keeps budgets and projections for every (segment, channel) row
+of the market table and updates them from the difference between two sidebar
+configurations. The dependency graph it maintains is:
+
+    selected segments -> active allocation events -> marginal level --+
+    total budget ------------------------------------------------------+-> row budgets
+    row budgets -> row leads / conversions / monthly revenue -> totals
+    timeline -> revenue and overall ROI (scales the totals, no row work)
+
+Toggling one segment flips the events of its channels in a Fenwick tree over the
+globally pre-sorted events, so the marginal level is re-solved in O(log n) without
+rebuilding or re-sorting anything. Only rows whose budget actually changed are
+re-projected. Totals are summed from the row arrays in the order
+calculate_roi_metrics uses, so results equal evaluate_scenario's whatever path
+led to them (running deltas would drift, and results are shared under the same
+cache keys).
+"""
+import math
+
+import numpy as np
+
+from .model import ALLOCATION_STRATEGIES, allocation_events
+from .results import ChannelPerformance
+from .timing import timed
+
+class _FenwickTree:
+    """Prefix sums over a fixed-length array with O(log n) point updates"""
+
+    def __init__(self, values):
+        self.size = len(values)
+        cumulative = np.concatenate([[0.0], np.cumsum(values)])
+        index = np.arange(1, self.size + 1)
+        # Node i holds the sum of the lowbit(i) values ending at position i - 1
+        self.tree = [0.0] + (cumulative[index] - cumulative[index - (index & -index)]).tolist()
+
+    def add(self, position, delta):
+        tree, i = self.tree, position + 1
+        while i <= self.size:
+            tree[i] += delta
+            i += i & -i
+
+class IncrementalROIModel:
+    """Scenario results for one dashboard, updated in place as the inputs change
+
+    Not thread-safe: keep one instance per session (or per worker) and call
+    evaluate() with each new configuration. Results match
+    MarketingROIDashboard.evaluate_scenario for segments selected in table order;
+    ties in the channel ranking are broken by table order.
+    """
+
+    def __init__(self, dashboard):
+        self.dashboard = dashboard
+        self._build(dashboard.market_table)
+
+    def _build(self, table):
+        self.table = table
+        n_rows = len(table)
+        self.revenue_yield = np.asarray(table.conversion_rate / table.cost_per_lead * table.avg_deal_value, dtype=float)
+        self.saturation_budget = np.asarray(table.optimal_budget, dtype=float)
+        self.decay = np.asarray(table.decay, dtype=float)
+        self.efficiency = np.asarray(table.conversion_rate / (table.cost_per_lead / 1000000), dtype=float)
+
+        # Marginal strategy: every row's events in their final order, built once
+        (self.event_level, self.event_row, self.event_is_entry,
+         self.event_offset, self.event_scale) = allocation_events(self.revenue_yield, self.saturation_budget, self.decay)
+        self._event_level = self.event_level.tolist()
+        n_events = len(self.event_level)
+        self.entry_event = np.full(n_rows, n_events)
+        self.curve_event = np.full(n_rows, n_events)
+        positions = np.arange(n_events)
+        self.entry_event[self.event_row[self.event_is_entry]] = positions[self.event_is_entry]
+        self.curve_event[self.event_row[~self.event_is_entry]] = positions[~self.event_is_entry]
+        # Output order of the marginal allocation: highest yield first
+        self.yield_order = np.argsort(-self.revenue_yield, kind='stable')
+
+        # Heuristic strategy: global efficiency ranking
+        self.efficiency_order = np.argsort(-self.efficiency, kind='stable')
+        self.efficiency_rank = np.empty(n_rows, dtype=np.intp)
+        self.efficiency_rank[self.efficiency_order] = np.arange(n_rows)
+        self.market_weight = np.minimum(np.asarray(table.market_size, dtype=float) / 50000, 1.0)
+        self.remaining_before = np.zeros(n_rows)
+
+        self.selected_segments = []
+        self._selected_set = set()
+        self.selected = np.zeros(n_rows, dtype=bool)
+        self.active_event = np.zeros(n_events, dtype=bool)
+        self._offset_tree = _FenwickTree(np.zeros(n_events))
+        self._scale_tree = _FenwickTree(np.zeros(n_events))
+        self.total_budget = 0
+        self.strategy = None
+        self.timeline_months = 12
+        self._solution = (0, 0.0, 0.0)
+        self.curved_rows = np.empty(0, dtype=np.intp)
+
+        # Row state; revenue is kept per month of timeline
+        self.budget = np.zeros(n_rows)
+        self.allocated = np.zeros(n_rows, dtype=bool)
+        self.leads = np.zeros(n_rows)
+        self.conversions = np.zeros(n_rows)
+        self.monthly_revenue = np.zeros(n_rows)
+        self.last_changed_rows = np.empty(0, dtype=np.intp)
+
+    @timed("incremental_update")
+    def update(self, total_budget, selected_segments, timeline_months=12, strategy="marginal"):
+        """Move to a new configuration; returns the rows whose budget changed"""
+        if strategy not in ALLOCATION_STRATEGIES:
+            raise ValueError(f"Unknown allocation strategy: {strategy}")
+        if self.table is not self.dashboard.market_table:
+            # New market data invalidates every row
+            self._build(self.dashboard.market_table)
+
+        table = self.table
+        current = set(selected_segments)
+        added = table.rows_for_segments(list(current - self._selected_set))
+        removed = table.rows_for_segments(list(self._selected_set - current))
+        toggled = np.concatenate([added, removed])
+        self.selected[added] = True
+        self.selected[removed] = False
+        self.selected_segments = list(selected_segments)
+        self._selected_set = current
+        self._toggle_events(added, removed)
+
+        budget_changed = total_budget != self.total_budget
+        strategy_changed = strategy != self.strategy
+        self.total_budget = total_budget
+        self.timeline_months = timeline_months
+        if strategy == "marginal":
+            update = self._update_marginal(toggled, full=strategy_changed)
+        else:
+            update = self._update_heuristic(toggled, full=budget_changed or strategy_changed)
+        self.strategy = strategy
+        self.last_changed_rows = self._apply_budgets(*update)
+        return self.last_changed_rows
+
+    def _toggle_events(self, added, removed):
+        """Activate the allocation events of added rows and deactivate removed ones"""
+        for rows, sign in ((added, 1.0), (removed, -1.0)):
+            events = np.concatenate([self.entry_event[rows], self.curve_event[rows]])
+            events = events[events < len(self.event_level)]
+            self.active_event[events] = sign > 0
+            if len(events) > len(self.event_level) // 8:
+                # Large changes: rebuilding the trees is cheaper than point updates
+                self._offset_tree = _FenwickTree(np.where(self.active_event, self.event_offset, 0.0))
+                self._scale_tree = _FenwickTree(np.where(self.active_event, self.event_scale, 0.0))
+                continue
+            for event in events.tolist():
+                self._offset_tree.add(event, sign * self.event_offset[event])
+                self._scale_tree.add(event, sign * self.event_scale[event])
+
+    def _solve_marginal(self, total_budget):
+        """Events processed, marginal level and partial top-up over the active events"""
+        n_events = len(self._event_level)
+        if total_budget <= 0 or not n_events:
+            return 0, math.inf, 0.0
+        offset_tree, scale_tree, level = self._offset_tree.tree, self._scale_tree.tree, self._event_level
+        # Descend the trees to the first event at which total spend reaches the budget
+        position, offset, scale = 0, 0.0, 0.0
+        step = 1 << (n_events.bit_length() - 1)
+        while step:
+            candidate = position + step
+            if candidate <= n_events:
+                next_offset, next_scale = offset + offset_tree[candidate], scale + scale_tree[candidate]
+                if next_offset + next_scale / math.sqrt(level[candidate - 1]) < total_budget:
+                    position, offset, scale = candidate, next_offset, next_scale
+            step >>= 1
+
+        if position < n_events and self.active_event[position] and self.event_is_entry[position]:
+            spend_before = offset + scale / math.sqrt(level[position])
+            if spend_before < total_budget:
+                # Budget runs out inside a pair's linear stretch: fund it partially
+                return position, level[position], total_budget - spend_before
+        if scale <= 0 or total_budget <= offset:
+            return position, math.inf, 0.0
+        return position, (scale / (total_budget - offset)) ** 2, 0.0
+
+    def _update_marginal(self, toggled, full=False):
+        """Re-solve the marginal level; returns (rows, budgets, allocated) for rows that may have changed"""
+        old_k, _, _ = self._solution
+        self._solution = k, _, _ = self._solve_marginal(self.total_budget)
+        if full:
+            candidates = np.flatnonzero(self.selected | self.allocated)
+        else:
+            # Events between the old and new level changed state; curved rows move with the level
+            low, high = sorted((old_k, k))
+            high = min(high + 1, len(self.event_level))
+            flipped = self.event_row[low + np.flatnonzero(self.active_event[low:high])]
+            candidates = np.unique(np.concatenate([toggled, flipped, self.curved_rows]))
+        curved = self.selected[candidates] & (self.curve_event[candidates] < k)
+        self.curved_rows = candidates[curved]
+        return (candidates,) + self._marginal_budgets(candidates)
+
+    def _marginal_budgets(self, rows):
+        k, level, top_up = self._solution
+        selected = self.selected[rows]
+        entered = selected & (self.entry_event[rows] < k)
+        curved = selected & (self.curve_event[rows] < k)
+        budgets = np.where(entered, self.saturation_budget[rows], 0.0)
+        if curved.any():
+            curved_rows = rows[curved]
+            retained = 1 - self.decay[curved_rows]
+            budgets[curved] = self.saturation_budget[curved_rows] * (
+                np.sqrt(self.revenue_yield[curved_rows] * retained / level) - retained
+            ) / self.decay[curved_rows]
+        if top_up > 0:
+            budgets[selected & (self.entry_event[rows] == k)] = top_up
+        return budgets, budgets > 0
+
+    def _update_heuristic(self, toggled, full=False):
+        """Re-run the efficiency ranking from the first row whose inputs changed"""
+        self.curved_rows = np.empty(0, dtype=np.intp)
+        if not full and not len(toggled):
+            return np.empty(0, dtype=np.intp), np.zeros(0), np.zeros(0, dtype=bool)
+        start = 0 if full else int(self.efficiency_rank[toggled].min())
+
+        # Remaining budget carried into the first recomputed rank
+        remaining = self.total_budget
+        earlier = np.flatnonzero(self.selected[self.efficiency_order[:start]])
+        if len(earlier):
+            previous_row = self.efficiency_order[earlier[-1]]
+            # An unallocated earlier row means the budget ran out before it
+            remaining = self.remaining_before[previous_row] - self.budget[previous_row] if self.allocated[previous_row] else 0
+
+        suffix = self.efficiency_order[start:]
+        suffix_rows = suffix[self.selected[suffix] | self.allocated[suffix]]
+        budgets = np.zeros(len(suffix_rows))
+        allocated = np.zeros(len(suffix_rows), dtype=bool)
+        for i, (row, selected, market_weight) in enumerate(zip(
+            suffix_rows.tolist(), self.selected[suffix_rows].tolist(), self.market_weight[suffix_rows].tolist()
+        )):
+            if not selected:
+                continue
+            if remaining <= 0:
+                break
+            suggested_allocation = min(
+                remaining * 0.3,  # Max 30% per channel
+                self.total_budget * market_weight * 0.15  # Market-weighted allocation
+            )
+            self.remaining_before[row] = remaining
+            budgets[i] = suggested_allocation
+            allocated[i] = True
+            remaining -= suggested_allocation
+        return suffix_rows, budgets, allocated
+
+    def _apply_budgets(self, candidates, budgets, allocated):
+        """Write new budgets for candidate rows and re-project the changed ones"""
+        self.allocated[candidates] = allocated
+        is_changed = budgets != self.budget[candidates]
+        changed = candidates[is_changed]
+        new_budgets = budgets[is_changed]
+
+        leads = np.zeros(len(changed))
+        conversions = np.zeros(len(changed))
+        monthly_revenue = np.zeros(len(changed))
+        funded = new_budgets > 0
+        if funded.any():
+            leads[funded], conversions[funded], monthly_revenue[funded] = self.dashboard.project_channels(
+                changed[funded], new_budgets[funded], 1
+            )
+        self.budget[changed] = new_budgets
+        self.leads[changed] = leads
+        self.conversions[changed] = conversions
+        self.monthly_revenue[changed] = monthly_revenue
+        return changed
+
+    def allocation_rows(self):
+        """Allocated rows in the order the dashboard lists them"""
+        order = self.yield_order if self.strategy == "marginal" else self.efficiency_order
+        return order[self.allocated[order]]
+
+    def budget_allocation(self):
+        """Allocation in the optimize_budget_allocation format"""
+        table = self.table
+        rows = self.allocation_rows()
+        return {
+            f"{segment} - {channel}": {
+                'budget': budget,
+                'efficiency': efficiency,
+                'segment': segment,
+                'channel': channel
+            }
+            for segment, channel, budget, efficiency in zip(
+                table.segment[rows].tolist(), table.channel[rows].tolist(),
+                self.budget[rows].tolist(), self.efficiency[rows].tolist()
+            )
+        }
+
+    def roi_metrics(self):
+        """Metrics in the calculate_roi_metrics format, from the maintained rows"""
+        table = self.table
+        timeline_months = self.timeline_months
+        rows = self.allocation_rows()
+        # Summed like calculate_roi_metrics: cost over every allocated row, the rest over funded ones
+        total_cost = float(self.budget[rows].sum())
+        rows = rows[self.budget[rows] > 0]
+        budgets = self.budget[rows]
+        revenue = self.monthly_revenue[rows] * timeline_months
+        roi = (revenue - budgets) / budgets * 100
+        channel_performance = ChannelPerformance(
+            table.segment[rows], table.channel[rows], budgets, self.leads[rows], self.conversions[rows],
+            revenue, roi, self.efficiency[rows]
+        )
+
+        total_leads = float(self.leads[rows].sum())
+        total_conversions = float(self.conversions[rows].sum())
+        total_revenue = float(revenue.sum())
+        overall_roi = (total_revenue - total_cost) / total_cost * 100 if total_cost > 0 else 0
+        return {
+            'total_leads': total_leads,
+            'total_conversions': total_conversions,
+            'total_revenue': total_revenue,
+            'total_cost': total_cost,
+            'overall_roi': overall_roi,
+            'market_penetration': (total_conversions / table.total_market_size) * 100,
+            'channel_performance': channel_performance
+        }
+
+    def evaluate(self, total_budget, selected_segments, timeline_months=12, strategy="marginal"):
+        """Drop-in for MarketingROIDashboard.evaluate_scenario, computed incrementally"""
+        self.update(total_budget, selected_segments, timeline_months, strategy)
+        return self.budget_allocation(), self.roi_metrics()
@@ -0,0 +1,300 @@
+"""Streaming calibration of the market table from historical campaign logs
+
+CRM exports hold one row per lead with the columns in LOG_COLUMNS. Files are read
+in bounded-memory chunks (CSV or Parquet) and folded into running per-(segment,
+channel) sums that are saved to a JSON state file together with the files already
+ingested, so a new daily export is added without rescanning history. The
+calibrated table is written in the market data CSV format and can be loaded with
+ROI_MARKET_DATA.
+
+    python -m roi_model.ingest crm/leads_*.csv --state ingest_state.json --output calibrated_market.csv
+    ROI_MARKET_DATA=calibrated_market.csv streamlit run app.py
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+
+import numpy as np
+
+from .market_data import CURVE_COLUMNS, MARKET_COLUMNS, load_market_table
+
+LOG_COLUMNS = ("segment", "channel", "spend", "converted", "deal_value")
+# Lead rows held in memory per chunk
+DEFAULT_CHUNK_ROWS = 100000
+# Pairs with fewer leads keep the conversion rate and cost per lead of the base table
+DEFAULT_MIN_LEADS = 30
+STATE_FORMAT = 1
+
+def _encode(values):
+    """Dictionary-encode a sequence of labels into (codes, labels)"""
+    index = {}
+    codes = np.fromiter((index.setdefault(value, len(index)) for value in values), dtype=np.intp, count=len(values))
+    return codes, list(index)
+
+def _label(value):
+    # Missing labels (short CSV rows, Parquet nulls) read as "", like empty CSV cells
+    return value if value is not None else ""
+
+def _number(value):
+    return float(value) if value not in ("", None) else 0.0
+
+def _flag(value):
+    if isinstance(value, str):
+        return 1.0 if value.strip().lower() in ("1", "true", "yes", "y") else 0.0
+    return 1.0 if value else 0.0
+
+def _csv_chunks(path, chunk_rows):
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        while True:
+            rows = [row for _, row in zip(range(chunk_rows), reader)]
+            if not rows:
+                return
+            segment_codes, segments = _encode([_label(row["segment"]) for row in rows])
+            channel_codes, channels = _encode([_label(row["channel"]) for row in rows])
+            yield (
+                segment_codes, segments, channel_codes, channels,
+                np.array([_number(row["spend"]) for row in rows]),
+                np.array([_flag(row["converted"]) for row in rows]),
+                np.array([_number(row["deal_value"]) for row in rows])
+            )
+
+def _arrow_chunks(batches):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    def labels(column):
+        # Null labels read as "", as in the csv module reader
+        encoded = pc.fill_null(column.cast(pa.string()), "").dictionary_encode()
+        return encoded.indices.to_numpy(zero_copy_only=False).astype(np.intp), encoded.dictionary.to_pylist()
+
+    def numbers(column):
+        return pc.fill_null(column.cast(pa.float64()), 0.0).to_numpy(zero_copy_only=False)
+
+    for batch in batches:
+        if not batch.num_rows:
+            continue
+        segment_codes, segments = labels(batch.column("segment"))
+        channel_codes, channels = labels(batch.column("channel"))
+        converted = batch.column("converted")
+        if pa.types.is_string(converted.type) or pa.types.is_large_string(converted.type):
+            converted = pc.is_in(pc.utf8_lower(pc.utf8_trim_whitespace(converted)),
+                                 value_set=pa.array(["1", "true", "yes", "y"]))
+        yield (
+            segment_codes, segments, channel_codes, channels,
+            numbers(batch.column("spend")), numbers(converted), numbers(batch.column("deal_value"))
+        )
+
+def read_log_chunks(path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Yield encoded column chunks of one CSV or Parquet lead log
+
+    Each chunk is (segment_codes, segments, channel_codes, channels, spend,
+    converted, deal_value), labels dictionary-encoded per chunk. Missing
+    segment or channel labels read as "", missing numbers as 0.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".parquet", ".pq"):
+        import pyarrow.parquet as pq
+
+        batches = pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=list(LOG_COLUMNS))
+        return _arrow_chunks(batches)
+    if extension != ".csv":
+        raise ValueError(f"Unsupported campaign log file: {path}")
+    try:
+        import pyarrow.csv as pacsv
+    except ImportError:
+        return _csv_chunks(path, chunk_rows)
+    # Arrow blocks are sized in bytes; ~64 bytes per lead row keeps chunks near chunk_rows.
+    # Every column is typed up front: inferred from the first block, a block of
+    # unconverted leads would type deal_value as null and fail on the first deal
+    reader = pacsv.open_csv(
+        path,
+        read_options=pacsv.ReadOptions(block_size=max(chunk_rows * 64, 1 << 16)),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=list(LOG_COLUMNS),
+            column_types={"segment": "string", "channel": "string", "spend": "float64",
+                          "converted": "string", "deal_value": "float64"}
+        )
+    )
+    return _arrow_chunks(reader)
+
+class CampaignAggregates:
+    """Running lead, spend, conversion and deal-value sums per (segment, channel)"""
+
+    def __init__(self):
+        self.pairs = {}
+        self.leads = np.zeros(0)
+        self.spend = np.zeros(0)
+        self.conversions = np.zeros(0)
+        self.deal_value = np.zeros(0)
+        # Ingested files: absolute path -> {"size", "mtime_ns", "rows"}
+        self.files = {}
+
+    def _pair_ids(self, keys):
+        ids = np.fromiter((self.pairs.setdefault(key, len(self.pairs)) for key in keys), dtype=np.intp, count=len(keys))
+        grow = len(self.pairs) - len(self.leads)
+        if grow > 0:
+            for name in ("leads", "spend", "conversions", "deal_value"):
+                setattr(self, name, np.concatenate([getattr(self, name), np.zeros(grow)]))
+        return ids
+
+    def add_chunk(self, segment_codes, segments, channel_codes, channels, spend, converted, deal_value):
+        """Fold one encoded chunk of lead rows into the running sums"""
+        local_pairs, inverse = np.unique(segment_codes * len(channels) + channel_codes, return_inverse=True)
+        ids = self._pair_ids([(segments[code // len(channels)], channels[code % len(channels)])
+                              for code in local_pairs.tolist()])
+        # ids are distinct within a chunk, so plain fancy-index adds are safe
+        size = len(local_pairs)
+        self.leads[ids] += np.bincount(inverse, minlength=size)
+        self.spend[ids] += np.bincount(inverse, spend, minlength=size)
+        self.conversions[ids] += np.bincount(inverse, converted, minlength=size)
+        self.deal_value[ids] += np.bincount(inverse, deal_value * converted, minlength=size)
+        return len(spend)
+
+    def ingest_file(self, path, chunk_rows=DEFAULT_CHUNK_ROWS):
+        """Add a log file unless it was already ingested; returns the rows added"""
+        key = os.path.abspath(path)
+        stat = os.stat(path)
+        seen = self.files.get(key)
+        if seen is not None:
+            if seen["size"] == stat.st_size and seen["mtime_ns"] == stat.st_mtime_ns:
+                return 0
+            raise ValueError(f"{path} changed since it was ingested; rebuild the state to re-read it")
+        rows = sum(self.add_chunk(*chunk) for chunk in read_log_chunks(path, chunk_rows))
+        self.files[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "rows": rows}
+        return rows
+
+    def calibrated_records(self, base_table, min_leads=DEFAULT_MIN_LEADS):
+        """Market table records with observed rates replacing the base assumptions
+
+        Pairs with at least min_leads leads get the observed conversion rate and
+        cost per lead; segments with conversions get the observed average deal value.
+        Market size and any fitted response curve always come from the base table,
+        so segments it lacks are skipped.
+        """
+        base_rows = base_table.index
+        segment_deal_value, segment_conversions = {}, {}
+        for (segment, _), i in self.pairs.items():
+            segment_deal_value[segment] = segment_deal_value.get(segment, 0.0) + self.deal_value[i]
+            segment_conversions[segment] = segment_conversions.get(segment, 0.0) + self.conversions[i]
+        segment_market_size = {
+            segment: float(base_table.market_size[rows[0]])
+            for segment, rows in base_table.segment_rows.items() if len(rows)
+        }
+
+        pairs = list(base_rows) + [pair for pair in self.pairs if pair not in base_rows]
+        for segment, channel in pairs:
+            if segment not in segment_market_size:
+                continue
+            row = base_rows.get((segment, channel))
+            i = self.pairs.get((segment, channel))
+            observed = i is not None and self.leads[i] >= min_leads
+            if row is None and not observed:
+                continue
+            if segment_conversions.get(segment, 0) > 0:
+                avg_deal_value = segment_deal_value[segment] / segment_conversions[segment]
+            else:
+                avg_deal_value = float(base_table.avg_deal_value[base_table.segment_rows[segment][0]])
+            yield {
+                "segment": segment,
+                "channel": channel,
+                "market_size": segment_market_size[segment],
+                "avg_deal_value": avg_deal_value,
+                "conversion_rate": self.conversions[i] / self.leads[i] if observed else float(base_table.conversion_rate[row]),
+                "cost_per_lead": self.spend[i] / self.leads[i] if observed else float(base_table.cost_per_lead[row]),
+                **({name: float(values[row]) for name, values in base_table.curve_columns.items()} if row is not None else {})
+            }
+
+    def to_state(self):
+        return {
+            "format": STATE_FORMAT,
+            "files": self.files,
+            "pairs": [
+                [segment, channel, self.leads[i], self.spend[i], self.conversions[i], self.deal_value[i]]
+                for (segment, channel), i in self.pairs.items()
+            ]
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        if state.get("format") != STATE_FORMAT:
+            raise ValueError("Unsupported ingestion state format")
+        aggregates = cls()
+        aggregates.files = state["files"]
+        pairs = state["pairs"]
+        aggregates._pair_ids([(segment, channel) for segment, channel, *_ in pairs])
+        for column, name in enumerate(("leads", "spend", "conversions", "deal_value"), start=2):
+            setattr(aggregates, name, np.array([pair[column] for pair in pairs], dtype=float))
+        return aggregates
+
+    @classmethod
+    def load(cls, path):
+        """Aggregates saved at path, or empty ones if it does not exist yet"""
+        if not os.path.exists(path):
+            return cls()
+        with open(path) as f:
+            return cls.from_state(json.load(f))
+
+    def save(self, path):
+        """Write the state atomically so an interrupted run never leaves a torn file"""
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.to_state(), f)
+        os.replace(path + ".tmp", path)
+
+def write_market_csv(records, path):
+    """Write market records in the long CSV format read by load_market_table
+
+    Curve columns that are missing or NaN are left empty, keeping the defaults.
+    """
+    with open(path + ".tmp", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(MARKET_COLUMNS + CURVE_COLUMNS), restval="")
+        writer.writeheader()
+        count = 0
+        for record in records:
+            writer.writerow({
+                name: value for name, value in record.items()
+                if not (name in CURVE_COLUMNS and np.isnan(value))
+            })
+            count += 1
+    os.replace(path + ".tmp", path)
+    return count
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Calibrate market data from CRM lead logs")
+    parser.add_argument('logs', nargs='*', help="CSV or Parquet lead logs to add")
+    parser.add_argument('--state', required=True, help="JSON file holding the running aggregates")
+    parser.add_argument('--output', help="calibrated market data CSV to write")
+    parser.add_argument('--base', help="market data supplying market sizes and fallback rates "
+                                       "(default: the dashboard's market data)")
+    parser.add_argument('--min-leads', type=int, default=DEFAULT_MIN_LEADS)
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--rebuild', action='store_true', help="ignore the saved state and re-read every log")
+    parser.add_argument('--quiet', action='store_true')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    aggregates = CampaignAggregates() if args.rebuild else CampaignAggregates.load(args.state)
+
+    for path in args.logs:
+        try:
+            rows = aggregates.ingest_file(path, args.chunk_rows)
+        except ValueError as error:
+            print(error, file=sys.stderr)
+            return 1
+        # Saved after every file so an interrupted run never counts a file twice
+        aggregates.save(args.state)
+        if not args.quiet:
+            print(f"{path}: {rows:,} lead rows added" if rows else f"{path}: already ingested", file=sys.stderr)
+
+    if args.output:
+        base_table = load_market_table(args.base)
+        count = write_market_csv(aggregates.calibrated_records(base_table, args.min_leads), args.output)
+        if not args.quiet:
+            print(f"{count} (segment, channel) rows written to {args.output}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
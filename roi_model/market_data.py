@@ -0,0 +1,284 @@
+"""Columnar market-data store with CSV, Parquet, SQLite and memory-mapped loaders
+
+Market tables are long-format: one row per (segment, channel) with the columns in
+MARKET_COLUMNS, plus the optional fitted response-curve columns in CURVE_COLUMNS.
+Segment-level values (market_size, avg_deal_value) repeat on every channel row of
+the segment. Text and database sources are converted once into a
+directory of .npy files which later loads memory-map instead of re-parsing.
+"""
+import csv
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+# Share of a segment's market that one channel can reach before saturating
+OPTIMAL_BUDGET_SHARE = 0.05
+# Strength of the conversion decay once a channel is past its optimal budget
+DIMINISHING_DECAY = 0.5
+
+LABEL_COLUMNS = ("segment", "channel")
+NUMERIC_COLUMNS = ("market_size", "avg_deal_value", "conversion_rate", "cost_per_lead")
+MARKET_COLUMNS = LABEL_COLUMNS + NUMERIC_COLUMNS
+# Optional per-pair response curve (see roi_model.fit); empty or NaN keeps the defaults above
+CURVE_COLUMNS = ("saturation_budget", "decay")
+
+DEFAULT_MARKET_DATA = os.path.join(os.path.dirname(__file__), "data", "market_data.csv")
+# Where converted .npy bundles are kept between runs
+BUNDLE_CACHE_DIR = os.environ.get(
+    "ROI_MODEL_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "roi_model")
+)
+BUNDLE_FORMAT = 1
+
+class MarketTable:
+    """Columnar market data with one row per (segment, channel) pair
+
+    Labels are stored as integer codes into `segments` / `channels`; numeric columns
+    are float64 arrays (possibly read-only memory maps). `index` maps every
+    (segment, channel) pair to its row. `optimal_budget` and `decay` are the
+    response curve of every row: the fitted CURVE_COLUMNS where present, otherwise
+    market_size * cost_per_lead * OPTIMAL_BUDGET_SHARE and DIMINISHING_DECAY.
+    """
+
+    def __init__(self, segment_codes, channel_codes, segments, channels, columns, version=None):
+        self.segments = list(segments)
+        self.channels = list(channels)
+        self.segment_codes = np.asarray(segment_codes)
+        self.channel_codes = np.asarray(channel_codes)
+        for name in NUMERIC_COLUMNS:
+            setattr(self, name, columns[name])
+        # Raw curve columns, NaN where a row has no fitted value
+        self.curve_columns = {
+            name: columns[name] if name in columns else np.full(len(self.segment_codes), np.nan)
+            for name in CURVE_COLUMNS
+        }
+
+        self.segment = np.array(self.segments, dtype=object)[self.segment_codes]
+        self.channel = np.array(self.channels, dtype=object)[self.channel_codes]
+        self.index = {pair: row for row, pair in enumerate(zip(self.segment.tolist(), self.channel.tolist()))}
+        if len(self.index) != len(self.segment_codes):
+            raise ValueError("Market table has duplicate (segment, channel) rows")
+
+        order = np.argsort(self.segment_codes, kind='stable')
+        bounds = np.searchsorted(self.segment_codes[order], np.arange(len(self.segments) + 1))
+        self.segment_rows = {
+            segment: order[bounds[code]:bounds[code + 1]] for code, segment in enumerate(self.segments)
+        }
+        # Segment-level market size, counted once per segment
+        first_rows = np.array([rows[0] for rows in self.segment_rows.values() if len(rows)], dtype=np.intp)
+        self.total_market_size = float(np.asarray(self.market_size)[first_rows].sum()) if len(first_rows) else 0.0
+        # A fitted saturation budget is absolute; the default follows market size and cost per lead
+        saturation_budget = self.curve_columns["saturation_budget"]
+        self.saturation_fitted = ~np.isnan(saturation_budget)
+        self.optimal_budget = np.where(
+            self.saturation_fitted, saturation_budget, self.market_size * self.cost_per_lead * OPTIMAL_BUDGET_SHARE
+        )
+        decay = self.curve_columns["decay"]
+        self.decay = np.where(np.isnan(decay), DIMINISHING_DECAY, decay)
+        # Content stamp so caches keyed on it notice any change to the market data
+        self.version = version or self._content_hash()
+
+    @classmethod
+    def from_records(cls, records, version=None):
+        """Build from an iterable of dicts holding the MARKET_COLUMNS"""
+        segments, channels = {}, {}
+        segment_codes, channel_codes = [], []
+        values = {name: [] for name in NUMERIC_COLUMNS + CURVE_COLUMNS}
+        for record in records:
+            segment_codes.append(segments.setdefault(record["segment"], len(segments)))
+            channel_codes.append(channels.setdefault(record["channel"], len(channels)))
+            for name in NUMERIC_COLUMNS:
+                values[name].append(float(record[name]))
+            for name in CURVE_COLUMNS:
+                value = record.get(name)
+                values[name].append(np.nan if value in ("", None) else float(value))
+        columns = {name: np.array(values[name], dtype=float) for name in NUMERIC_COLUMNS + CURVE_COLUMNS}
+        return cls(
+            np.array(segment_codes, dtype=np.int32), np.array(channel_codes, dtype=np.int32),
+            segments, channels, columns, version
+        )
+
+    @classmethod
+    def from_market_data(cls, market_data):
+        """Build from the nested {segment: {"channels": {...}}} dictionary format"""
+        return cls.from_records(
+            {
+                "segment": segment,
+                "channel": channel,
+                "market_size": data["market_size"],
+                "avg_deal_value": data["avg_deal_value"],
+                "conversion_rate": channel_data["conversion_rate"],
+                "cost_per_lead": channel_data["cost_per_lead"],
+                **{name: channel_data[name] for name in CURVE_COLUMNS if name in channel_data}
+            }
+            for segment, data in market_data.items()
+            for channel, channel_data in data["channels"].items()
+        )
+
+    def _content_hash(self):
+        digest = hashlib.sha1(json.dumps([self.segments, self.channels]).encode())
+        for array in (self.segment_codes, self.channel_codes) + tuple(getattr(self, name) for name in NUMERIC_COLUMNS):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        # Tables without fitted curves keep the stamp they had before curves existed
+        if self.saturation_fitted.any() or not np.isnan(self.curve_columns["decay"]).all():
+            for name in CURVE_COLUMNS:
+                digest.update(np.ascontiguousarray(self.curve_columns[name]).tobytes())
+        return digest.hexdigest()[:16]
+
+    def __len__(self):
+        return len(self.index)
+
+    def rows(self, pairs):
+        """Row positions for an iterable of (segment, channel) pairs"""
+        index = self.index
+        return np.fromiter((index[pair] for pair in pairs), dtype=np.intp)
+
+    def rows_for_segments(self, segments):
+        """Row positions of every channel in the given segments"""
+        if not segments:
+            return np.empty(0, dtype=np.intp)
+        return np.concatenate([self.segment_rows[segment] for segment in segments])
+
+    def channels_for(self, segment):
+        """Channel names available in one segment, in table order"""
+        return self.channel[self.segment_rows[segment]].tolist()
+
+    def to_market_data(self):
+        """Nested dictionary view in the original market_data format"""
+        market_data = {}
+        for segment, rows in self.segment_rows.items():
+            if not len(rows):
+                continue
+            first = rows[0]
+            market_data[segment] = {
+                "market_size": float(self.market_size[first]),
+                "avg_deal_value": float(self.avg_deal_value[first]),
+                "channels": {
+                    self.channel[row]: {
+                        "conversion_rate": float(self.conversion_rate[row]),
+                        "cost_per_lead": float(self.cost_per_lead[row]),
+                        **{
+                            name: float(values[row]) for name, values in self.curve_columns.items()
+                            if not np.isnan(values[row])
+                        }
+                    }
+                    for row in rows
+                }
+            }
+        return market_data
+
+    def save_bundle(self, directory):
+        """Write the table as .npy columns plus metadata for memory-mapped loading"""
+        os.makedirs(directory, exist_ok=True)
+        arrays = {"segment_codes": self.segment_codes, "channel_codes": self.channel_codes}
+        arrays.update((name, np.asarray(getattr(self, name))) for name in NUMERIC_COLUMNS)
+        arrays.update((name, np.asarray(values)) for name, values in self.curve_columns.items())
+        for name, array in arrays.items():
+            np.save(os.path.join(directory, f"{name}.npy"), array)
+        meta = {
+            "format": BUNDLE_FORMAT,
+            "version": self.version,
+            "segments": self.segments,
+            "channels": self.channels
+        }
+        # Metadata goes last: its presence marks a complete bundle
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load_bundle(cls, directory, mmap_mode="r"):
+        """Load a bundle written by save_bundle, memory-mapping the columns"""
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("format") != BUNDLE_FORMAT:
+            raise ValueError(f"Unsupported market bundle format in {directory}")
+
+        def load(name):
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+
+        columns = {name: load(name) for name in NUMERIC_COLUMNS}
+        # Bundles written before the curve columns existed simply lack them
+        columns.update(
+            (name, load(name)) for name in CURVE_COLUMNS
+            if os.path.exists(os.path.join(directory, f"{name}.npy"))
+        )
+        return cls(load("segment_codes"), load("channel_codes"), meta["segments"], meta["channels"],
+                   columns, meta["version"])
+
+def read_csv_records(path):
+    with open(path, newline="") as f:
+        yield from csv.DictReader(f)
+
+def read_parquet_records(path):
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    columns = list(MARKET_COLUMNS) + [name for name in CURVE_COLUMNS if name in parquet_file.schema_arrow.names]
+    for batch in parquet_file.iter_batches(columns=columns):
+        yield from batch.to_pylist()
+
+def read_sqlite_records(path, table="market_data"):
+    import sqlite3
+
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        connection.row_factory = sqlite3.Row
+        # Column list is fixed; the table name comes from the caller, not the data
+        present = {row["name"] for row in connection.execute(f'PRAGMA table_info("{table}")')}
+        columns = list(MARKET_COLUMNS) + [name for name in CURVE_COLUMNS if name in present]
+        query = f'SELECT {", ".join(columns)} FROM "{table}"'
+        for row in connection.execute(query):
+            yield dict(row)
+    finally:
+        connection.close()
+
+READERS = {
+    ".csv": read_csv_records,
+    ".parquet": read_parquet_records,
+    ".pq": read_parquet_records,
+    ".sqlite": read_sqlite_records,
+    ".sqlite3": read_sqlite_records,
+    ".db": read_sqlite_records
+}
+
+def _bundle_dir(path, cache_dir):
+    # Keyed on the source's path, size and mtime so a weekly refresh lands in a new bundle
+    stat = os.stat(path)
+    key = hashlib.sha1(f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}".encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f"market-{key}")
+
+def load_market_table(path=None, cache_dir=BUNDLE_CACHE_DIR):
+    """Load a market table from CSV, Parquet, SQLite or a bundle directory
+
+    Non-bundle sources are parsed once and cached as a memory-mapped bundle under
+    cache_dir (pass cache_dir=None to always parse).
+    """
+    path = path or os.environ.get("ROI_MARKET_DATA") or DEFAULT_MARKET_DATA
+    if os.path.isdir(path):
+        return MarketTable.load_bundle(path)
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in READERS:
+        raise ValueError(f"Unsupported market data file: {path}")
+
+    if cache_dir:
+        bundle = _bundle_dir(path, cache_dir)
+        if os.path.exists(os.path.join(bundle, "meta.json")):
+            return MarketTable.load_bundle(bundle)
+
+    table = MarketTable.from_records(READERS[extension](path))
+    if cache_dir:
+        # Build in a private directory and rename it into place, so concurrent
+        # server processes never see a half-written bundle
+        staging = f"{bundle}.tmp-{os.getpid()}"
+        try:
+            table.save_bundle(staging)
+            os.rename(staging, bundle)
+        except OSError:
+            # Another process won the race, or the cache location is read-only
+            shutil.rmtree(staging, ignore_errors=True)
+        if os.path.exists(os.path.join(bundle, "meta.json")):
+            return MarketTable.load_bundle(bundle)
+    return table
@@ -0,0 +1,482 @@
+"""Market data model and ROI math for the Marketing ROI dashboard"""
+from types import MappingProxyType
+
+import numpy as np
+
+from .market_data import DIMINISHING_DECAY, MarketTable, load_market_table
+from .results import ChannelPerformance
+from .timing import timed
+
+# Bump when a change to the model alters computed results; persisted results of
+# other versions are discarded (see roi_model.store)
+MODEL_VERSION = 1
+# Budget allocation modes offered by optimize_budget_allocation
+ALLOCATION_STRATEGIES = {
+    "marginal": "Marginal Return (revenue-optimal)",
+    "heuristic": "Efficiency Ranking (baseline)"
+}
+
+def allocation_events(revenue_yield, saturation_budget, decay):
+    """Marginal-level breakpoints of the water-filling allocation, highest level first
+    
+    Returns (level, pair, is_entry, spend_offset, spend_scale). Each fundable pair
+    has two events: at level `yield` its linear stretch (up to saturation) is funded
+    at once; below `yield * retained` it follows the curved stretch,
+    b(level) = saturation * (sqrt(yield * retained / level) - retained) / decay.
+    Summed over the events processed so far, total spend at any level is
+    offset + scale / sqrt(level).
+    """
+    retained = 1 - decay
+    # Pairs that can never return revenue are left unfunded
+    pairs = np.flatnonzero((revenue_yield > 0) & (saturation_budget > 0))
+    n = len(pairs)
+    level = np.concatenate([revenue_yield[pairs], revenue_yield[pairs] * retained[pairs]])
+    spend_offset = np.concatenate([
+        saturation_budget[pairs],
+        -saturation_budget[pairs] * (1 + retained[pairs] / decay[pairs])
+    ])
+    spend_scale = np.concatenate([
+        np.zeros(n),
+        saturation_budget[pairs] * np.sqrt(revenue_yield[pairs] * retained[pairs]) / decay[pairs]
+    ])
+    is_entry = np.concatenate([np.ones(n, dtype=bool), np.zeros(n, dtype=bool)])
+    
+    order = np.lexsort((~is_entry, -level))
+    return level[order], np.concatenate([pairs, pairs])[order], is_entry[order], spend_offset[order], spend_scale[order]
+
+class MarginalAllocator:
+    """Revenue-maximising budget split under the diminishing-returns response
+    
+    Each pair earns `revenue_yield` per Rupiah up to its saturation budget; past
+    that its marginal yield drops to yield * (1 - decay) and keeps falling. Marginal
+    revenue is therefore non-increasing and the optimum is a water-filling: every
+    pair is funded until its marginal yield equals a common level. The sorted
+    breakpoints of that level are computed once (O(n log n)), after which any total
+    budget is solved with a binary search and closed-form arithmetic.
+    """
+    
+    def __init__(self, revenue_yield, saturation_budget, decay=DIMINISHING_DECAY):
+        revenue_yield = np.asarray(revenue_yield, dtype=float)
+        saturation_budget = np.asarray(saturation_budget, dtype=float)
+        self.size = len(revenue_yield)
+        self.revenue_yield = revenue_yield
+        self.saturation_budget = saturation_budget
+        self.decay = np.broadcast_to(np.asarray(decay, dtype=float), revenue_yield.shape)
+        
+        self.level, self.pair, self.is_entry, spend_offset, spend_scale = allocation_events(
+            revenue_yield, saturation_budget, self.decay
+        )
+        self.offset_after = np.cumsum(spend_offset)
+        self.scale_after = np.cumsum(spend_scale)
+        self.offset_before = self.offset_after - spend_offset
+        self.scale_before = self.scale_after - spend_scale
+        root_level = np.sqrt(self.level)
+        self.spend_after = self.offset_after + self.scale_after / root_level
+        self.spend_before = self.offset_before + self.scale_before / root_level
+        # Monotone by construction; guard against rounding so searchsorted stays valid
+        np.maximum.accumulate(self.spend_after, out=self.spend_after)
+        self._entries_before = None
+        self._spend_prefixes = None
+        self._event_positions = None
+    
+    def _solve(self, total_budget):
+        """Events processed, marginal level and partial top-up for one total budget"""
+        k, level, top_up = self._solve_many(np.array([total_budget], dtype=float))
+        return int(k[0]), float(level[0]), float(top_up[0])
+    
+    def _solve_many(self, total_budgets):
+        """_solve for an array of positive total budgets, with one binary search"""
+        k = np.searchsorted(self.spend_after, total_budgets, side='left')
+        last = len(self.level) - 1
+        event = np.minimum(k, last)
+        past_all = k > last
+        # Budget runs out inside a pair's linear stretch: fund it partially. A curved
+        # event has no stretch; its spend before and after differ only by rounding
+        inside = ~past_all & self.is_entry[event] & (self.spend_before[event] < total_budgets)
+        offset = np.where(past_all, self.offset_after[-1], self.offset_before[event])
+        scale = np.where(past_all, self.scale_after[-1], self.scale_before[event])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            level = np.where(inside, self.level[event], (scale / (total_budgets - offset)) ** 2)
+        top_up = np.where(inside, total_budgets - self.spend_before[event], 0.0)
+        return k, level, top_up
+    
+    def value_prefixes(self, value):
+        """Prefix sums over the events of a per-pair value per Rupiah below saturation
+        
+        At a common marginal level a curved pair earns
+        value * s / decay * (1 - sqrt(retained * level / yield)) and a pair on its
+        linear stretch value * s, so the total over the processed events is
+        offset + scale * sqrt(level). Returns (offset, scale, value per event) for
+        frontier(); the revenue yield gives revenue, conversion_rate / cost_per_lead
+        conversions.
+        """
+        pair = self.pair
+        value = np.asarray(value, dtype=float)[pair]
+        saturation, decay = self.saturation_budget[pair], self.decay[pair]
+        retained = 1 - decay
+        # An entry adds the linear stretch; the curved event replaces it with the curve
+        event_offset = np.where(self.is_entry, value * saturation, value * saturation * retained / decay)
+        event_scale = np.where(
+            self.is_entry, 0.0, -value * saturation / decay * np.sqrt(retained / self.revenue_yield[pair])
+        )
+        return (
+            np.concatenate([[0.0], np.cumsum(event_offset)]),
+            np.concatenate([[0.0], np.cumsum(event_scale)]),
+            value
+        )
+    
+    def frontier(self, total_budgets, prefixes):
+        """Totals at the optimal allocation of every total budget, without allocating
+        
+        prefixes maps names to value_prefixes() results; each total is read at the
+        budget's solved event with one binary search. Returns the totals by name
+        plus 'level' (marginal revenue per Rupiah) and 'funded' (pairs with
+        budget), aligned with total_budgets.
+        """
+        total_budgets = np.asarray(total_budgets, dtype=float)
+        results = {name: np.zeros(total_budgets.shape) for name in prefixes}
+        results['level'] = np.full(total_budgets.shape, np.nan)
+        results['funded'] = np.zeros(total_budgets.shape, dtype=np.intp)
+        positive = total_budgets > 0
+        if len(self.level) == 0 or not positive.any():
+            return results
+        
+        k, level, top_up = self._solve_many(total_budgets[positive])
+        root_level = np.sqrt(level)
+        event = np.minimum(k, len(self.level) - 1)
+        for name, (offset, scale, value) in prefixes.items():
+            results[name][positive] = offset[k] + scale[k] * root_level + top_up * value[event]
+        results['level'][positive] = level
+        if self._entries_before is None:
+            self._entries_before = np.concatenate([[0], np.cumsum(self.is_entry)])
+        results['funded'][positive] = self._entries_before[k] + (top_up > 0)
+        return results
+    
+    def spend_at_levels(self, levels):
+        """Total spend when every pair is funded down to each positive marginal level
+        
+        The inverse of _solve_many: the events above a level are processed and their
+        spend is offset + scale / sqrt(level). At an entry's own level its linear
+        stretch is left out.
+        """
+        levels = np.asarray(levels, dtype=float)
+        if self._spend_prefixes is None:
+            self._spend_prefixes = (
+                np.concatenate([[0.0], self.offset_after]),
+                np.concatenate([[0.0], self.scale_after])
+            )
+        offset, scale = self._spend_prefixes
+        k = np.searchsorted(-self.level, -levels, side='left')
+        return offset[k] + scale[k] / np.sqrt(levels)
+    
+    def allocate(self, total_budget):
+        """Budget per pair (aligned with the constructor inputs) for one total budget"""
+        return self.allocate_many([total_budget])[0]
+    
+    def allocate_many(self, total_budgets):
+        """allocate() for an array of total budgets, as a (len(total_budgets), size) array"""
+        total_budgets = np.asarray(total_budgets, dtype=float)
+        budgets = np.zeros((len(total_budgets), self.size))
+        positive = np.flatnonzero(total_budgets > 0)
+        if len(self.level) == 0 or len(positive) == 0:
+            return budgets
+        k, level, top_up = self._solve_many(total_budgets[positive])
+        
+        if self._event_positions is None:
+            # Position of each pair's entry and curved event; unfundable pairs are never reached
+            entry_position = np.full(self.size, len(self.level))
+            curve_position = np.full(self.size, len(self.level))
+            entry_position[self.pair[self.is_entry]] = np.flatnonzero(self.is_entry)
+            curve_position[self.pair[~self.is_entry]] = np.flatnonzero(~self.is_entry)
+            self._event_positions = (entry_position, curve_position)
+        entry_position, curve_position = self._event_positions
+        entered = entry_position < k[:, None]
+        curved = curve_position < k[:, None]
+        retained = 1 - self.decay
+        with np.errstate(divide='ignore', invalid='ignore'):
+            curve = self.saturation_budget * (
+                np.sqrt(self.revenue_yield * retained / level[:, None]) - retained
+            ) / self.decay
+        budgets[positive] = np.where(curved, curve, np.where(entered, self.saturation_budget, 0.0))
+        # A budget ending inside a linear stretch funds that pair partially
+        partial = top_up > 0
+        budgets[positive[partial], self.pair[k[partial]]] = top_up[partial]
+        return budgets
+
+class BudgetFrontier:
+    """Revenue-optimal totals of one segment selection at any total budget
+    
+    The MarginalAllocator's breakpoints are built once and every budget is read
+    off them (MarginalAllocator.frontier), giving what allocate_by_marginal_return
+    + calculate_roi_metrics would for each budget without allocating.
+    """
+    
+    def __init__(self, market_table, selected_segments):
+        rows = market_table.rows_for_segments(selected_segments)
+        self.total_market_size = market_table.total_market_size
+        self.conversion_yield = market_table.conversion_rate[rows] / market_table.cost_per_lead[rows]
+        self.revenue_yield = self.conversion_yield * market_table.avg_deal_value[rows]
+        self.allocator = MarginalAllocator(self.revenue_yield, market_table.optimal_budget[rows], market_table.decay[rows])
+        self.prefixes = {
+            'revenue': self.allocator.value_prefixes(self.revenue_yield),
+            'conversions': self.allocator.value_prefixes(self.conversion_yield)
+        }
+    
+    def evaluate(self, total_budgets, timeline_months=12):
+        """Arrays aligned with total_budgets: total_revenue, total_conversions,
+        overall_roi, market_penetration, marginal_roi (ROI of the next Rupiah) and
+        channels_funded"""
+        total_budgets = np.asarray(total_budgets, dtype=float)
+        totals = self.allocator.frontier(total_budgets, self.prefixes)
+        total_revenue = totals['revenue'] * timeline_months
+        with np.errstate(divide='ignore', invalid='ignore'):
+            overall_roi = np.where(total_budgets > 0, (total_revenue - total_budgets) / total_budgets * 100, 0.0)
+        return {
+            'total_budget': total_budgets,
+            'total_revenue': total_revenue,
+            'total_conversions': totals['conversions'],
+            'overall_roi': overall_roi,
+            'market_penetration': totals['conversions'] / self.total_market_size * 100,
+            'marginal_roi': (totals['level'] * timeline_months - 1) * 100,
+            'channels_funded': totals['funded']
+        }
+
+def _read_only(value):
+    """Nested dicts wrapped as read-only mappings, so edits raise instead of being lost"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _read_only(item) for key, item in value.items()})
+    return value
+
+class MarketingROIDashboard:
+    def __init__(self, market_data=None):
+        """market_data: a MarketTable, a nested market_data dict, or a path for
+        load_market_table (default: the bundled Indonesian F&B market table)"""
+        if isinstance(market_data, MarketTable):
+            self.market_table = market_data
+        elif isinstance(market_data, dict):
+            self.market_table = MarketTable.from_market_data(market_data)
+        else:
+            self.market_table = load_market_table(market_data)
+        self._market_data_view = None
+    
+    @property
+    def market_data(self):
+        """Read-only nested dictionary view of market_table
+        
+        Editing it raises TypeError; to change the data, edit
+        market_table.to_market_data() and assign the dict back to market_data.
+        """
+        if self._market_data_view is None or self._market_data_view[0] is not self.market_table:
+            self._market_data_view = (self.market_table, _read_only(self.market_table.to_market_data()))
+        return self._market_data_view[1]
+    
+    @market_data.setter
+    def market_data(self, market_data):
+        self.market_table = MarketTable.from_market_data(market_data)
+    
+    def calculate_channel_efficiency(self, segment, channel):
+        """Calculate channel efficiency (conversion rate / cost per lead)"""
+        table = self.market_table
+        row = table.index[(segment, channel)]
+        return float(table.conversion_rate[row] / (table.cost_per_lead[row] / 1000000))
+    
+    def simulate_diminishing_returns(self, base_conversion, budget_allocated, optimal_budget, decay=DIMINISHING_DECAY):
+        """Simulate diminishing returns effect (accepts scalars or aligned arrays)"""
+        excess_factor = np.maximum(budget_allocated - optimal_budget, 0) / optimal_budget
+        diminishing_factor = 1 / (1 + decay * excess_factor)
+        return base_conversion * diminishing_factor
+    
+    def project_channels(self, rows, budgets, timeline_months=12):
+        """Vectorized leads, conversions and revenue for market_table rows at the given budgets
+        
+        rows and budgets are broadcast together, so a (n, 1) rows array against a
+        (n, k) budget grid evaluates k budget levels for every pair in one call.
+        """
+        table = self.market_table
+        cost_per_lead = table.cost_per_lead[rows]
+        leads = budgets / cost_per_lead
+        adjusted_conversion_rate = self.simulate_diminishing_returns(
+            table.conversion_rate[rows], budgets, table.optimal_budget[rows], table.decay[rows]
+        )
+        conversions = leads * adjusted_conversion_rate
+        revenue = conversions * table.avg_deal_value[rows] * timeline_months
+        return leads, conversions, revenue
+    
+    @timed()
+    def diminishing_returns_curves(self, pairs, budget_range, timeline_months=12):
+        """ROI and conversion curves for many (segment, channel) pairs in one batched call
+        
+        budget_range is either a 1-D grid shared by every pair or a (len(pairs), k)
+        grid holding one row of budget levels per pair.
+        """
+        rows = self.market_table.rows(pairs)[:, None]
+        budget_range = np.asarray(budget_range, dtype=float)
+        budgets = np.broadcast_to(budget_range, (len(rows), budget_range.shape[-1]))
+        leads, conversions, revenue = self.project_channels(rows, budgets, timeline_months)
+        return {
+            'budget': budgets,
+            'roi': (revenue - budgets) / budgets * 100,
+            'conversions': conversions,
+            'revenue': revenue
+        }
+    
+    def optimal_channel_budgets(self, pairs, timeline_months=12):
+        """Exact optimal budgets read off the piecewise diminishing-returns curve
+        
+        ROI is flat up to a pair's optimal (saturation) budget and falls after it, so
+        'roi_budget' is the largest spend that still earns 'peak_roi'. 'profit_budget'
+        is where one more Rupiah of spend returns exactly one Rupiah of revenue.
+        """
+        table = self.market_table
+        rows = table.rows(pairs)
+        saturation_budget = table.optimal_budget[rows]
+        # Revenue earned per Rupiah below saturation; just past it only `retained` of that is left
+        revenue_yield = table.conversion_rate[rows] / table.cost_per_lead[rows] * table.avg_deal_value[rows] * timeline_months
+        decay = table.decay[rows]
+        retained = 1 - decay
+        past_saturation = saturation_budget * (np.sqrt(np.maximum(revenue_yield * retained, 1)) - retained) / decay
+        profit_budget = np.where(
+            revenue_yield <= 1, 0.0,
+            np.where(revenue_yield * retained <= 1, saturation_budget, past_saturation)
+        )
+        return {
+            'roi_budget': saturation_budget,
+            'peak_roi': (revenue_yield - 1) * 100,
+            'profit_budget': profit_budget
+        }
+    
+    @timed()
+    def optimize_budget_allocation(self, total_budget, selected_segments, strategy="marginal"):
+        """Allocate the budget across the channels of the selected segments
+        
+        strategy is a key of ALLOCATION_STRATEGIES: "marginal" maximises projected
+        revenue under the diminishing-returns curve, "heuristic" is the original
+        efficiency-ranked split kept as a baseline.
+        """
+        if strategy not in ALLOCATION_STRATEGIES:
+            raise ValueError(f"Unknown allocation strategy: {strategy}")
+        if strategy == "heuristic":
+            return self.allocate_by_efficiency(total_budget, selected_segments)
+        return self.allocate_by_marginal_return(total_budget, selected_segments)
+    
+    @timed()
+    def budget_frontier(self, selected_segments, total_budgets, timeline_months=12):
+        """Revenue-optimal results across many total budgets in one sweep (see BudgetFrontier)"""
+        return BudgetFrontier(self.market_table, selected_segments).evaluate(total_budgets, timeline_months)
+    
+    def allocate_by_marginal_return(self, total_budget, selected_segments):
+        """Revenue-maximising allocation using marginal returns (spends the full budget)"""
+        table = self.market_table
+        rows = table.rows_for_segments(selected_segments)
+        revenue_yield = table.conversion_rate[rows] / table.cost_per_lead[rows] * table.avg_deal_value[rows]
+        allocator = MarginalAllocator(revenue_yield, table.optimal_budget[rows], table.decay[rows])
+        budgets = allocator.allocate(total_budget)
+        efficiency = table.conversion_rate[rows] / (table.cost_per_lead[rows] / 1000000)
+        
+        # Highest marginal value first, like the ranking order of the heuristic output
+        allocations = {}
+        for i in np.argsort(-revenue_yield, kind='stable'):
+            if budgets[i] <= 0:
+                continue
+            segment, channel = table.segment[rows[i]], table.channel[rows[i]]
+            allocations[f"{segment} - {channel}"] = {
+                'budget': float(budgets[i]),
+                'efficiency': float(efficiency[i]),
+                'segment': segment,
+                'channel': channel
+            }
+        return allocations
+    
+    def allocate_by_efficiency(self, total_budget, selected_segments):
+        """Smart budget allocation based on channel efficiency"""
+        allocations = {}
+        
+        # Calculate efficiency scores for all channels in selected segments
+        table = self.market_table
+        rows = table.rows_for_segments(selected_segments)
+        efficiency = table.conversion_rate[rows] / (table.cost_per_lead[rows] / 1000000)
+        
+        # Sort by efficiency and allocate budget
+        ranking = np.argsort(-efficiency, kind='stable')
+        order = rows[ranking]
+        efficiency_scores = zip(
+            table.segment[order].tolist(), table.channel[order].tolist(),
+            efficiency[ranking].tolist(), table.market_size[order].tolist()
+        )
+        
+        remaining_budget = total_budget
+        for segment, channel, channel_efficiency, market_size in efficiency_scores:
+            if remaining_budget <= 0:
+                break
+            
+            # Allocate budget based on efficiency and market potential
+            market_weight = min(market_size / 50000, 1.0)  # Normalize market size
+            suggested_allocation = min(
+                remaining_budget * 0.3,  # Max 30% per channel
+                total_budget * market_weight * 0.15  # Market-weighted allocation
+            )
+            
+            key = f"{segment} - {channel}"
+            allocations[key] = {
+                'budget': suggested_allocation,
+                'efficiency': channel_efficiency,
+                'segment': segment,
+                'channel': channel
+            }
+            remaining_budget -= suggested_allocation
+        
+        return allocations
+    
+    def evaluate_scenario(self, total_budget, selected_segments, timeline_months=12, strategy="marginal"):
+        """Budget allocation and ROI metrics for one sidebar configuration"""
+        budget_allocation = self.optimize_budget_allocation(total_budget, selected_segments, strategy)
+        return budget_allocation, self.calculate_roi_metrics(budget_allocation, timeline_months)
+    
+    def scenario_key(self, total_budget, selected_segments, timeline_months=12, strategy="marginal"):
+        """Cache key for evaluate_scenario, stamped with the market-data version"""
+        return (total_budget, tuple(selected_segments), timeline_months, strategy, self.market_table.version)
+    
+    def allocation_key(self, total_budget, selected_segments, strategy="marginal"):
+        """Cache key for results that depend on the budget allocation but not the timeline"""
+        return (total_budget, tuple(selected_segments), strategy, self.market_table.version)
+    
+    @timed()
+    def calculate_roi_metrics(self, budget_allocation, timeline_months=12):
+        """Calculate comprehensive ROI metrics"""
+        allocations = list(budget_allocation.values())
+        budgets = np.fromiter((allocation['budget'] for allocation in allocations), dtype=float, count=len(allocations))
+        total_cost = float(budgets.sum())
+        
+        # Only funded channels are projected; pack them into aligned arrays
+        active = np.flatnonzero(budgets > 0)
+        funded = [allocations[i] for i in active]
+        rows = self.market_table.rows((allocation['segment'], allocation['channel']) for allocation in funded)
+        budgets = budgets[active]
+        
+        leads, conversions, revenue = self.project_channels(rows, budgets, timeline_months)
+        roi = (revenue - budgets) / budgets * 100
+        
+        total_leads = float(leads.sum())
+        total_conversions = float(conversions.sum())
+        total_revenue = float(revenue.sum())
+        
+        channel_performance = ChannelPerformance(
+            [allocation['segment'] for allocation in funded],
+            [allocation['channel'] for allocation in funded],
+            budgets, leads, conversions, revenue, roi,
+            [allocation['efficiency'] for allocation in funded]
+        )
+        
+        # Calculate overall metrics
+        overall_roi = (total_revenue - total_cost) / total_cost * 100 if total_cost > 0 else 0
+        market_penetration = (total_conversions / self.market_table.total_market_size) * 100
+        
+        return {
+            'total_leads': total_leads,
+            'total_conversions': total_conversions,
+            'total_revenue': total_revenue,
+            'total_cost': total_cost,
+            'overall_roi': overall_roi,
+            'market_penetration': market_penetration,
+            'channel_performance': channel_performance
+        }
@@ -0,0 +1,129 @@
+"""Monte Carlo uncertainty engine for ROI projections"""
+import numpy as np
+
+from .market_data import OPTIMAL_BUDGET_SHARE
+from .timing import timed
+
+# Sampling uncertainty per market parameter; spread is the coefficient of variation
+# (the half-width fraction for "triangular"). Supported: beta, lognormal, normal,
+# triangular and fixed.
+UNCERTAINTY_DEFAULTS = {
+    "conversion_rate": {"distribution": "beta", "spread": 0.2},
+    "cost_per_lead": {"distribution": "lognormal", "spread": 0.15},
+    "avg_deal_value": {"distribution": "lognormal", "spread": 0.2}
+}
+# Upper bound on draws x channels held in memory per Monte Carlo chunk
+MONTE_CARLO_CHUNK_ELEMENTS = 2000000
+
+def _sample_parameter(rng, distribution, mean, spread, draws):
+    """Draw a (draws, len(mean)) matrix around mean with the given relative spread"""
+    shape = (draws, len(mean))
+    if distribution == "fixed":
+        return np.broadcast_to(mean, shape)
+    if distribution == "lognormal":
+        sigma = np.sqrt(np.log1p(spread ** 2))
+        return mean * np.exp(sigma * rng.standard_normal(shape) - sigma ** 2 / 2)
+    if distribution == "normal":
+        return np.maximum(mean * (1 + spread * rng.standard_normal(shape)), 0)
+    if distribution == "triangular":
+        return mean * (1 + spread * (rng.random(shape) - rng.random(shape)))
+    if distribution == "beta":
+        # Variance is capped just below the maximum a beta with this mean can have
+        variance = np.minimum((spread * mean) ** 2, mean * (1 - mean) * 0.999)
+        concentration = np.minimum(mean * (1 - mean) / np.maximum(variance, 1e-300) - 1, 1e12)
+        return rng.beta(mean * concentration, (1 - mean) * concentration, size=shape)
+    raise ValueError(f"Unknown distribution: {distribution}")
+
+def _simulate_chunk(spec, draws, seed):
+    """Total revenue and conversions for one chunk of Monte Carlo draws"""
+    rng = np.random.default_rng(seed)
+    sampled = {}
+    for name, (mean, groups) in spec['parameters'].items():
+        values = np.empty((draws, len(mean)))
+        for distribution, columns, spread in groups:
+            values[:, columns] = _sample_parameter(rng, distribution, mean[columns], spread, draws)
+        sampled[name] = values
+    
+    budgets = spec['budgets']
+    cost_per_lead = sampled['cost_per_lead']
+    # Fitted saturation budgets stay put; default ones move with the sampled cost per lead
+    optimal_budget = np.where(
+        spec['saturation_fitted'], spec['optimal_budget'], spec['market_size'] * cost_per_lead * OPTIMAL_BUDGET_SHARE
+    )
+    excess_factor = np.maximum(budgets - optimal_budget, 0) / optimal_budget
+    conversions = budgets / cost_per_lead * sampled['conversion_rate'] / (1 + spec['decay'] * excess_factor)
+    revenue = conversions * sampled['avg_deal_value'] * spec['timeline_months']
+    return revenue.sum(axis=1), conversions.sum(axis=1)
+
+class MonteCarloSimulator:
+    """ROI uncertainty for a budget allocation by sampling the market parameters
+    
+    Draws are generated and evaluated in memory-bounded chunks; only per-draw totals
+    are kept. Chunks get independent seeds from one SeedSequence, so results are the
+    same whether they run serially or across a process pool.
+    """
+    
+    def __init__(self, dashboard, uncertainty=None, overrides=None):
+        self.dashboard = dashboard
+        self.uncertainty = {**UNCERTAINTY_DEFAULTS, **(uncertainty or {})}
+        # {(segment, channel): {parameter: {"distribution": ..., "spread": ...}}}
+        self.overrides = overrides or {}
+    
+    def _build_spec(self, budget_allocation, timeline_months):
+        funded = [allocation for allocation in budget_allocation.values() if allocation['budget'] > 0]
+        pairs = [(allocation['segment'], allocation['channel']) for allocation in funded]
+        table = self.dashboard.market_table
+        rows = table.rows(pairs)
+        
+        parameters = {}
+        for name, default in self.uncertainty.items():
+            settings = [{**default, **self.overrides.get(pair, {}).get(name, {})} for pair in pairs]
+            groups = []
+            for distribution in sorted({setting['distribution'] for setting in settings}):
+                columns = np.array([i for i, setting in enumerate(settings) if setting['distribution'] == distribution], dtype=np.intp)
+                spread = np.array([settings[i]['spread'] for i in columns], dtype=float)
+                groups.append((distribution, columns, spread))
+            parameters[name] = (getattr(table, name)[rows], groups)
+        
+        return {
+            'budgets': np.array([allocation['budget'] for allocation in funded], dtype=float),
+            'market_size': table.market_size[rows],
+            'optimal_budget': table.optimal_budget[rows],
+            'saturation_fitted': table.saturation_fitted[rows],
+            'decay': table.decay[rows],
+            'timeline_months': timeline_months,
+            'parameters': parameters
+        }
+    
+    @timed("monte_carlo")
+    def run(self, budget_allocation, timeline_months=12, n_draws=100000, n_jobs=1, seed=0, chunk_size=None):
+        """P5/P50/P95 ROI, revenue and conversions plus the break-even probability"""
+        spec = self._build_spec(budget_allocation, timeline_months)
+        total_cost = sum(allocation['budget'] for allocation in budget_allocation.values())
+        if chunk_size is None:
+            chunk_size = max(1, MONTE_CARLO_CHUNK_ELEMENTS // max(len(spec['budgets']), 1))
+        chunk_sizes = [min(chunk_size, n_draws - start) for start in range(0, n_draws, chunk_size)]
+        seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+        
+        if n_jobs > 1 and len(chunk_sizes) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                results = list(executor.map(_simulate_chunk, [spec] * len(chunk_sizes), chunk_sizes, seeds))
+        else:
+            results = [_simulate_chunk(spec, draws, chunk_seed) for draws, chunk_seed in zip(chunk_sizes, seeds)]
+        
+        revenue = np.concatenate([chunk_revenue for chunk_revenue, _ in results])
+        conversions = np.concatenate([chunk_conversions for _, chunk_conversions in results])
+        roi = (revenue - total_cost) / total_cost * 100 if total_cost > 0 else np.zeros_like(revenue)
+        
+        def percentiles(values):
+            p5, p50, p95 = np.percentile(values, [5, 50, 95])
+            return {'p5': float(p5), 'p50': float(p50), 'p95': float(p95), 'mean': float(values.mean())}
+        
+        return {
+            'draws': n_draws,
+            'roi': percentiles(roi),
+            'revenue': percentiles(revenue),
+            'conversions': percentiles(conversions),
+            'break_even_probability': float(np.mean(revenue >= total_cost))
+        }
@@ -0,0 +1,145 @@
+"""Month-by-month budget pacing across the channels of a timeline
+
+optimize_budget_allocation spends the budget as one lump sum: every channel is
+saturated once and its clients pay avg_deal_value for the whole timeline. A
+paced plan spends month by month instead. Each month has its own
+diminishing-returns curve against the channel's saturation budget, and a client
+won in month m pays for the timeline_months - m months that are left. Month m
+therefore has the channel's revenue yields scaled by a single weight. Its
+water-filling is the base MarginalAllocator's at level / weight, so one
+allocator serves every month.
+
+The optimal plan funds every month down to a common marginal level, with months
+held at their cap when a cap binds. That level is found by bisection on the
+total spend, and each month's spend is then split with allocate_many.
+
+    pacer = BudgetPacer(MarketingROIDashboard(), ["Coffee Shops"], timeline_months=24)
+    plan = pacer.plan(50000000, monthly_cap=5000000)
+"""
+import numpy as np
+
+from .model import MarginalAllocator
+from .timing import timed
+
+# Geometric bisection steps for the common marginal level (far below float resolution)
+PACING_BISECTION_STEPS = 100
+
+class BudgetPacer:
+    """Revenue-optimal monthly spend plans for one segment selection and timeline"""
+
+    def __init__(self, dashboard, selected_segments, timeline_months=12):
+        if timeline_months < 1:
+            raise ValueError("The timeline needs at least one month")
+        self.dashboard = dashboard
+        self.selected_segments = list(selected_segments)
+        self.timeline_months = int(timeline_months)
+        table = dashboard.market_table
+        self.rows = table.rows_for_segments(self.selected_segments)
+        self.pairs = list(zip(table.segment[self.rows].tolist(), table.channel[self.rows].tolist()))
+        revenue_yield = table.conversion_rate[self.rows] / table.cost_per_lead[self.rows] * table.avg_deal_value[self.rows]
+        self.allocator = MarginalAllocator(revenue_yield, table.optimal_budget[self.rows], table.decay[self.rows])
+        # Months of revenue left for a client won in each month
+        self.month_weight = (self.timeline_months - np.arange(self.timeline_months)).astype(float)
+
+    def month_caps(self, monthly_cap=None):
+        """Spend cap per month: None for no cap, a scalar, or one value per month"""
+        if monthly_cap is None:
+            return np.full(self.timeline_months, np.inf)
+        caps = np.broadcast_to(np.asarray(monthly_cap, dtype=float), (self.timeline_months,)).copy()
+        if (caps < 0).any() or np.isnan(caps).any():
+            raise ValueError("Monthly caps must be non-negative")
+        return caps
+
+    def month_spend(self, level, caps):
+        """Spend of every month funded down to a common marginal revenue level"""
+        return np.minimum(self.allocator.spend_at_levels(level / self.month_weight), caps)
+
+    def split_budget(self, total_budget, caps):
+        """Optimal spend per month for a total budget (at most the caps in total)
+
+        Also returns the common marginal revenue level of the months below their
+        cap (nan when every month is at its cap or nothing is spent).
+        """
+        budget = min(float(total_budget), float(caps.sum()))
+        if budget <= 0 or len(self.allocator.level) == 0:
+            return np.zeros(self.timeline_months), np.nan
+        if budget >= caps.sum():
+            return caps.copy(), np.nan
+
+        # The first month's best pair is the highest level anything is funded at; its
+        # linear stretch is funded at that level itself, so start just above it
+        high = np.nextafter(self.allocator.level[0] * self.month_weight[0], np.inf)
+        low = high / 2
+        while self.month_spend(low, caps).sum() < budget:
+            high, low = low, low / 2
+        for _ in range(PACING_BISECTION_STEPS):
+            middle = np.sqrt(low * high)
+            if self.month_spend(middle, caps).sum() >= budget:
+                low = middle
+            else:
+                high = middle
+
+        # What is left lies in the linear stretches entered between the two levels
+        spend = self.month_spend(high, caps)
+        gap = self.month_spend(low, caps) - spend
+        if gap.sum() > 0:
+            spend += gap * ((budget - spend.sum()) / gap.sum())
+        return spend, float(np.sqrt(low * high))
+
+    @timed("budget_pacing")
+    def plan(self, total_budget, monthly_cap=None, lump_sum_strategy="marginal"):
+        """Month x channel spend plan and its projection against the lump-sum plan
+
+        Returns pairs, months (1-based), spend / conversions / revenue as months x
+        pairs arrays (revenue over the rest of the timeline), their per-month
+        totals, marginal_roi_by_month (ROI of the next Rupiah in each month), the
+        plan totals (total_cost, total_revenue, total_conversions, overall_roi,
+        market_penetration), unspent budget when the caps bind, and lump_sum:
+        calculate_roi_metrics of the same budget allocated with lump_sum_strategy.
+        """
+        caps = self.month_caps(monthly_cap)
+        month_spend, common_level = self.split_budget(total_budget, caps)
+        spend = self.allocator.allocate_many(month_spend)
+
+        _, conversions, monthly_value = self.dashboard.project_channels(self.rows[None, :], spend, 1)
+        revenue = monthly_value * self.month_weight[:, None]
+        # Months below their cap share the common level; a capped month stops above
+        # it, and an unfunded month would start below it with its best pair
+        level = np.full(self.timeline_months, self.allocator.level[0] if len(self.allocator.level) else 0.0)
+        level *= self.month_weight
+        funded = month_spend > 0
+        capped = funded & (month_spend >= caps)
+        if capped.any():
+            level[capped] = self.allocator._solve_many(month_spend[capped])[1] * self.month_weight[capped]
+        level[funded & ~capped] = common_level
+        marginal_roi = (level - 1) * 100
+
+        total_cost = float(spend.sum())
+        total_revenue = float(revenue.sum())
+        total_conversions = float(conversions.sum())
+        _, lump_sum = self.dashboard.evaluate_scenario(
+            total_budget, self.selected_segments, self.timeline_months, lump_sum_strategy
+        )
+        return {
+            'pairs': self.pairs,
+            'months': np.arange(1, self.timeline_months + 1),
+            'spend': spend,
+            'conversions': conversions,
+            'revenue': revenue,
+            'spend_by_month': spend.sum(axis=1),
+            'conversions_by_month': conversions.sum(axis=1),
+            'revenue_by_month': revenue.sum(axis=1),
+            'marginal_roi_by_month': marginal_roi,
+            'total_cost': total_cost,
+            'total_revenue': total_revenue,
+            'total_conversions': total_conversions,
+            'overall_roi': (total_revenue - total_cost) / total_cost * 100 if total_cost > 0 else 0,
+            'market_penetration': total_conversions / self.dashboard.market_table.total_market_size * 100,
+            'unspent': max(float(total_budget) - total_cost, 0.0),
+            'lump_sum': lump_sum
+        }
+
+def pace_budget(dashboard, total_budget, selected_segments, timeline_months=12, monthly_cap=None,
+                lump_sum_strategy="marginal"):
+    """One-off BudgetPacer(...).plan(total_budget, monthly_cap, lump_sum_strategy)"""
+    return BudgetPacer(dashboard, selected_segments, timeline_months).plan(total_budget, monthly_cap, lump_sum_strategy)
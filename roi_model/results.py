@@ -0,0 +1,64 @@
+"""Columnar per-channel results of calculate_roi_metrics
+
+The funded channels of a scenario are held as aligned column arrays instead of
+one dict per channel, so charts and tables slice columns directly and the
+pandas frame behind every tab is built once per scenario.
+"""
+import numpy as np
+
+CHANNEL_FIELDS = ('segment', 'channel', 'budget', 'leads', 'conversions', 'revenue', 'roi', 'efficiency')
+
+class ChannelPerformance:
+    """Funded channels of one scenario as aligned columns
+
+    performance['roi'] is an array over the channels; records() gives the row
+    dicts and frame() a DataFrame with a 'label' column ("segment - channel")
+    that is built on first use and shared afterwards, so callers must not
+    modify it in place.
+    """
+
+    def __init__(self, segment, channel, budget, leads, conversions, revenue, roi, efficiency):
+        self.columns = {
+            'segment': np.asarray(segment, dtype=object),
+            'channel': np.asarray(channel, dtype=object)
+        }
+        for name, values in zip(CHANNEL_FIELDS[2:], (budget, leads, conversions, revenue, roi, efficiency)):
+            self.columns[name] = np.asarray(values, dtype=float)
+        self._frame = None
+
+    def __len__(self):
+        return len(self.columns['budget'])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __getstate__(self):
+        # The cached frame is rebuilt on demand rather than pickled to workers
+        return {'columns': self.columns, '_frame': None}
+
+    def records(self):
+        """One dict per channel, in the CHANNEL_FIELDS order"""
+        return [
+            dict(zip(CHANNEL_FIELDS, row))
+            for row in zip(*(self.columns[name].tolist() for name in CHANNEL_FIELDS))
+        ]
+
+    def labels(self):
+        return self.columns['segment'] + ' - ' + self.columns['channel']
+
+    def frame(self):
+        if self._frame is None:
+            import pandas as pd
+
+            self._frame = pd.DataFrame({**self.columns, 'label': self.labels()})
+        return self._frame
+
+def json_default(value):
+    """json.dumps default for model results: channel columns and numpy values"""
+    if isinstance(value, ChannelPerformance):
+        return value.records()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
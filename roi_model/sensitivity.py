@@ -0,0 +1,133 @@
+"""Closed-form sensitivity of projected revenue and ROI to the market assumptions
+
+For a fixed budget allocation, revenue per funded pair is
+
+    below saturation (budget <= optimal):  R = budget / cpl * cr * adv * T
+    past saturation:                       R = budget * cr * adv * T * optimal / (cpl * ((1 - decay) * optimal + decay * budget))
+
+with optimal = ms * cpl * share unless the pair has a fitted saturation budget,
+which does not move with the parameters. Both branches are products of the
+parameters, so each partial derivative is R / x times a factor that is 1 or 0
+below saturation.
+Marginal allocations fund many pairs exactly at the kink, where cpl and market
+size have one-sided derivatives: raising either lifts the optimal budget (the
+below-saturation branch), lowering it crosses into the saturated branch. Both
+sides are returned. market_size and avg_deal_value are segment-level values, so
+their derivatives are summed over the segment's channels.
+"""
+import numpy as np
+
+# Market assumptions the sensitivity covers, and whether each is set per segment
+SENSITIVITY_PARAMETERS = {
+    "conversion_rate": "channel",
+    "cost_per_lead": "channel",
+    "avg_deal_value": "segment",
+    "market_size": "segment"
+}
+
+def revenue_gradients(dashboard, rows, budgets, timeline_months=12, decrease=False):
+    """Revenue per pair and its partial derivatives for each SENSITIVITY_PARAMETERS entry
+
+    Vectorized over aligned rows / budgets arrays; returns (revenue, {parameter: dR/dx}).
+    The derivatives are for increasing each parameter, or for decreasing it when
+    decrease is set; the two differ only for pairs funded exactly at the kink.
+    """
+    table = dashboard.market_table
+    cost_per_lead = table.cost_per_lead[rows]
+    market_size = table.market_size[rows]
+    optimal_budget = table.optimal_budget[rows]
+    decay = table.decay[rows]
+    _, _, revenue = dashboard.project_channels(rows, budgets, timeline_months)
+
+    # Past saturation, cpl and market size also move a default optimal budget
+    saturated = budgets >= optimal_budget if decrease else budgets > optimal_budget
+    saturated &= ~table.saturation_fitted[rows]
+    denominator = (1 - decay) * optimal_budget + decay * budgets
+    cost_factor = np.where(saturated, (1 - decay) * optimal_budget / denominator, 1.0)
+    market_factor = np.where(saturated, decay * budgets / denominator, 0.0)
+    return revenue, {
+        "conversion_rate": revenue / table.conversion_rate[rows],
+        "cost_per_lead": -revenue / cost_per_lead * cost_factor,
+        "avg_deal_value": revenue / table.avg_deal_value[rows],
+        "market_size": revenue / market_size * market_factor
+    }
+
+def roi_sensitivity(dashboard, budget_allocation, timeline_months=12):
+    """Derivatives of total revenue and overall ROI (in % points) for every assumption
+
+    Covers each funded pair's conversion_rate and cost_per_lead and each funded
+    segment's avg_deal_value and market_size, with the allocation held fixed.
+    Returns aligned arrays: parameter, segment, channel ("" for segment-level
+    values), value, and revenue / roi derivatives for increases (`*_derivative`)
+    and decreases (`*_derivative_down`) of each value.
+    """
+    table = dashboard.market_table
+    funded = [allocation for allocation in budget_allocation.values() if allocation['budget'] > 0]
+    rows = table.rows((allocation['segment'], allocation['channel']) for allocation in funded)
+    budgets = np.fromiter((allocation['budget'] for allocation in funded), dtype=float, count=len(funded))
+    total_cost = float(sum(allocation['budget'] for allocation in budget_allocation.values()))
+    revenue, gradients = revenue_gradients(dashboard, rows, budgets, timeline_months)
+    _, gradients_down = revenue_gradients(dashboard, rows, budgets, timeline_months, decrease=True)
+
+    # Segment-level parameters: sum the channel contributions per segment
+    segment_codes, segment_index = np.unique(table.segment_codes[rows], return_inverse=True)
+    segment_rows = table.segment_rows
+    first_rows = np.array([segment_rows[table.segments[code]][0] for code in segment_codes], dtype=np.intp)
+
+    parameter, segment, channel, value, revenue_derivative, revenue_derivative_down = [], [], [], [], [], []
+    for name, level in SENSITIVITY_PARAMETERS.items():
+        if level == "channel":
+            parameter.append(np.full(len(rows), name, dtype=object))
+            segment.append(table.segment[rows])
+            channel.append(table.channel[rows])
+            value.append(np.asarray(getattr(table, name)[rows], dtype=float))
+            revenue_derivative.append(gradients[name])
+            revenue_derivative_down.append(gradients_down[name])
+        else:
+            parameter.append(np.full(len(segment_codes), name, dtype=object))
+            segment.append(table.segment[first_rows])
+            channel.append(np.full(len(segment_codes), "", dtype=object))
+            value.append(np.asarray(getattr(table, name)[first_rows], dtype=float))
+            revenue_derivative.append(np.bincount(segment_index, gradients[name], minlength=len(segment_codes)))
+            revenue_derivative_down.append(np.bincount(segment_index, gradients_down[name], minlength=len(segment_codes)))
+
+    revenue_derivative = np.concatenate(revenue_derivative)
+    revenue_derivative_down = np.concatenate(revenue_derivative_down)
+    roi_scale = 100 / total_cost if total_cost > 0 else 0.0
+    total_revenue = float(revenue.sum())
+    return {
+        'parameter': np.concatenate(parameter),
+        'segment': np.concatenate(segment),
+        'channel': np.concatenate(channel),
+        'value': np.concatenate(value),
+        'revenue_derivative': revenue_derivative,
+        'revenue_derivative_down': revenue_derivative_down,
+        'roi_derivative': revenue_derivative * roi_scale,
+        'roi_derivative_down': revenue_derivative_down * roi_scale,
+        'total_revenue': total_revenue,
+        'overall_roi': (total_revenue - total_cost) / total_cost * 100 if total_cost > 0 else 0
+    }
+
+def tornado_rows(sensitivity, relative_change=0.1, top=15):
+    """Largest ROI swings (% points) for a -/+ relative_change in each assumption
+
+    Linearised with the one-sided derivatives. Returns a list of dicts (label,
+    parameter, low, high) sorted by swing size, low being the ROI change when the
+    assumption drops by relative_change.
+    """
+    step = sensitivity['value'] * relative_change
+    low = -sensitivity['roi_derivative_down'] * step
+    high = sensitivity['roi_derivative'] * step
+    order = np.argsort(-np.maximum(np.abs(low), np.abs(high)), kind='stable')[:top]
+    labels = [
+        f"{parameter} · {segment}" + (f" - {channel}" if channel else "")
+        for parameter, segment, channel in zip(
+            sensitivity['parameter'][order], sensitivity['segment'][order], sensitivity['channel'][order]
+        )
+    ]
+    return [
+        {'label': label, 'parameter': parameter, 'low': low_change, 'high': high_change}
+        for label, parameter, low_change, high_change in zip(
+            labels, sensitivity['parameter'][order].tolist(), low[order].tolist(), high[order].tolist()
+        )
+    ]
@@ -0,0 +1,448 @@
+"""Asyncio JSON API for the ROI model
+
+    python -m roi_model.server --port 8600 --workers 4
+
+Endpoints (request and response bodies are JSON):
+
+    GET  /health      market version, cache, result store and coalescing counters
+    GET  /metrics     request stage durations in Prometheus text format
+    POST /allocation  {"total_budget", "segments", "strategy"} -> budget_allocation
+    POST /roi         {"total_budget", "segments", "timeline_months", "strategy"}
+                      -> budget_allocation and roi_metrics
+    POST /curves      {"pairs": [[segment, channel], ...], "budgets": [...], "timeline_months"}
+                      -> roi / conversions / revenue per pair and budget
+    POST /scenarios   {"scenarios": [{"total_budget", "segments", "timeline_months", "strategy"}, ...]}
+                      -> one summary row (roi_model.sweep.COLUMNS) per scenario
+    POST /goalseek    {"metric", "target", "segments", "timeline_months", "strategy"}
+                      -> total_budget meeting the target (roi_model.goalseek), its allocation and metrics
+
+"segments" defaults to every segment, "strategy" to "marginal" and
+"timeline_months" to 12. Identical requests that arrive while one is being
+computed share its result, and responses are kept in an LRU cache keyed on the
+normalised request and the market-data version. Scenarios behind /roi and
+/scenarios are also read from and saved to the persistent result store
+(roi_model.store), shared with the dashboard and other server processes. Single
+scenarios are computed on a thread pool and /scenarios batches on a process
+pool, so the event loop itself only parses, routes and writes.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from .cache import ScenarioCache
+from .goalseek import GOAL_METRICS, GOAL_SEEK_CACHE_SIZE, goal_seek
+from .model import ALLOCATION_STRATEGIES, MarketingROIDashboard
+from .results import json_default
+from .store import ResultStore, store_path_from_environment
+from .sweep import _init_worker, run_batch, scenario_id
+from .timing import METRICS, StageTimer
+
+DEFAULT_PORT = 8600
+RESPONSE_CACHE_SIZE = 4096
+MAX_BODY_BYTES = 1 << 20
+# Upper bounds per request: scenarios in one batch, pairs x budget points in one curve call
+MAX_BATCH_SCENARIOS = 10000
+MAX_CURVE_VALUES = 200000
+# Scenario allocations per process-pool task
+BATCH_SIZE = 50
+# Idle keep-alive connections are closed after this many seconds
+KEEPALIVE_TIMEOUT = 15
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+class RequestError(ValueError):
+    """Invalid request, answered with the given HTTP status"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+def encode_json(value):
+    return json.dumps(value, separators=(",", ":"), default=json_default).encode()
+
+class ROIService:
+    """Request handling for one dashboard: validation, coalescing, caching and pools"""
+
+    def __init__(self, dashboard, threads=4, workers=None, cache_entries=RESPONSE_CACHE_SIZE, store_path=None):
+        self.dashboard = dashboard
+        self.cache = ScenarioCache(max_entries=cache_entries)
+        self.store = ResultStore(store_path, market_version=dashboard.market_table.version) if store_path else None
+        # Scenario evaluations shared by goal seek searches
+        self.goal_cache = ScenarioCache(max_entries=GOAL_SEEK_CACHE_SIZE)
+        self.threads = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="roi-api")
+        # Spawned workers: forking a process that already runs threads is unsafe
+        self.processes = ProcessPoolExecutor(
+            max_workers=workers or os.cpu_count() or 1,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(store_path,)
+        )
+        self.requests = 0
+        self.coalesced = 0
+        self._inflight = {}
+        self.routes = {
+            "/health": ("GET", self.health),
+            "/metrics": ("GET", self.metrics),
+            "/allocation": ("POST", self.allocation),
+            "/roi": ("POST", self.roi),
+            "/curves": ("POST", self.curves),
+            "/scenarios": ("POST", self.scenarios),
+            "/goalseek": ("POST", self.goalseek)
+        }
+
+    def warm_up(self):
+        """Start the batch workers now rather than on the first /scenarios request"""
+        self.processes.submit(os.getpid)
+
+    def close(self):
+        self.threads.shutdown(wait=False, cancel_futures=True)
+        self.processes.shutdown(wait=True, cancel_futures=True)
+        if self.store is not None:
+            self.store.close()
+
+    async def handle(self, method, path, body):
+        """(status, content type, payload bytes) for one request"""
+        self.requests += 1
+        route = self.routes.get(path)
+        if route is None:
+            return 404, "application/json", encode_json({"error": f"Unknown endpoint: {path}"})
+        if method != route[0]:
+            return 405, "application/json", encode_json({"error": f"{path} expects {route[0]}"})
+        try:
+            params = json.loads(body) if body else {}
+            if not isinstance(params, dict):
+                raise RequestError("Request body must be a JSON object")
+            return await route[1](params)
+        except json.JSONDecodeError as error:
+            return 400, "application/json", encode_json({"error": f"Invalid JSON: {error}"})
+        except RequestError as error:
+            return error.status, "application/json", encode_json({"error": str(error)})
+        except Exception as error:
+            return 500, "application/json", encode_json({"error": f"{type(error).__name__}: {error}"})
+
+    async def _cached(self, endpoint, params, compute):
+        """Response for a normalised request: cached, shared with an identical request
+        in flight, or produced by awaiting compute(), which returns the payload bytes"""
+        key = (endpoint, json.dumps(params, sort_keys=True), self.dashboard.market_table.version)
+        found, payload = self.cache.lookup(key)
+        if found:
+            return 200, "application/json", payload
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return 200, "application/json", await asyncio.shield(pending)
+
+        loop = asyncio.get_running_loop()
+        pending = self._inflight[key] = loop.create_future()
+        try:
+            payload = await compute()
+        except BaseException as error:
+            pending.set_exception(error)
+            # Marks the exception as retrieved when no other request was waiting
+            pending.exception()
+            raise
+        finally:
+            del self._inflight[key]
+        self.cache.store(key, payload)
+        pending.set_result(payload)
+        return 200, "application/json", payload
+
+    def _on_threads(self, endpoint, compute):
+        """Awaitable factory running compute() on the thread pool and encoding its result"""
+        loop = asyncio.get_running_loop()
+        return lambda: loop.run_in_executor(self.threads, self._timed, endpoint, compute)
+
+    def _timed(self, endpoint, compute):
+        timer = StageTimer(f"api.{endpoint}")
+        with timer.activate(), timer.stage("compute"):
+            result = compute()
+        with timer.stage("encode"):
+            payload = encode_json(result)
+        METRICS.record(timer)
+        return payload
+
+    def _scenario_params(self, params, timeline=True, budget=True):
+        table = self.dashboard.market_table
+        normalised = {}
+        if budget:
+            try:
+                total_budget = float(params["total_budget"])
+            except (KeyError, TypeError, ValueError):
+                raise RequestError("total_budget must be a number")
+            if not np.isfinite(total_budget) or total_budget < 0:
+                raise RequestError("total_budget must be a non-negative number")
+            normalised["total_budget"] = total_budget
+        segments = params.get("segments", table.segments)
+        if not isinstance(segments, list) or not segments or not all(isinstance(s, str) for s in segments):
+            raise RequestError("segments must be a non-empty list of segment names")
+        unknown = set(segments) - set(table.segment_rows)
+        if unknown:
+            raise RequestError(f"Unknown segments: {', '.join(sorted(unknown))}")
+        strategy = params.get("strategy", "marginal")
+        if strategy not in ALLOCATION_STRATEGIES:
+            raise RequestError(f"strategy must be one of: {', '.join(ALLOCATION_STRATEGIES)}")
+        normalised.update(segments=list(dict.fromkeys(segments)), strategy=strategy)
+        if timeline:
+            normalised["timeline_months"] = self._timeline(params)
+        return normalised
+
+    @staticmethod
+    def _timeline(params):
+        timeline = params.get("timeline_months", 12)
+        if not isinstance(timeline, int) or isinstance(timeline, bool) or not 1 <= timeline <= 600:
+            raise RequestError("timeline_months must be an integer between 1 and 600")
+        return timeline
+
+    async def health(self, params):
+        return 200, "application/json", encode_json({
+            "status": "ok",
+            "market_version": self.dashboard.market_table.version,
+            "pairs": len(self.dashboard.market_table),
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+            "cache": self.cache.stats(),
+            "store": self.store.stats() if self.store is not None else None
+        })
+
+    async def metrics(self, params):
+        return 200, "text/plain; version=0.0.4", METRICS.render_prometheus().encode()
+
+    async def allocation(self, params):
+        params = self._scenario_params(params, timeline=False)
+        dashboard = self.dashboard
+        return await self._cached("allocation", params, self._on_threads("allocation", lambda: {
+            "budget_allocation": dashboard.optimize_budget_allocation(
+                params["total_budget"], params["segments"], params["strategy"]
+            ),
+            "market_version": dashboard.market_table.version
+        }))
+
+    async def roi(self, params):
+        params = self._scenario_params(params)
+        dashboard = self.dashboard
+
+        def compute():
+            scenario = (params["total_budget"], params["segments"], params["timeline_months"], params["strategy"])
+            if self.store is None:
+                budget_allocation, roi_metrics = dashboard.evaluate_scenario(*scenario)
+            else:
+                budget_allocation, roi_metrics = self.store.get_or_compute(
+                    dashboard.scenario_key(*scenario), lambda: dashboard.evaluate_scenario(*scenario)
+                )
+            return {
+                "budget_allocation": budget_allocation,
+                "roi_metrics": roi_metrics,
+                "market_version": dashboard.market_table.version
+            }
+        return await self._cached("roi", params, self._on_threads("roi", compute))
+
+    async def curves(self, params):
+        table = self.dashboard.market_table
+        pairs = params.get("pairs")
+        if not isinstance(pairs, list) or not pairs:
+            raise RequestError("pairs must be a non-empty list of [segment, channel]")
+        try:
+            pairs = [(str(segment), str(channel)) for segment, channel in pairs]
+        except (TypeError, ValueError):
+            raise RequestError("pairs must be a non-empty list of [segment, channel]")
+        unknown = [pair for pair in pairs if pair not in table.index]
+        if unknown:
+            raise RequestError(f"Unknown (segment, channel) pairs: {unknown[:5]}")
+        try:
+            budgets = np.asarray(params.get("budgets"), dtype=float)
+        except (TypeError, ValueError):
+            raise RequestError("budgets must be a list of positive numbers")
+        if budgets.ndim != 1 or not len(budgets) or not np.all(np.isfinite(budgets) & (budgets > 0)):
+            raise RequestError("budgets must be a list of positive numbers")
+        if len(pairs) * len(budgets) > MAX_CURVE_VALUES:
+            raise RequestError(f"At most {MAX_CURVE_VALUES} pairs x budgets values per request")
+        normalised = {"pairs": pairs, "budgets": budgets.tolist(), "timeline_months": self._timeline(params)}
+        dashboard = self.dashboard
+
+        def compute():
+            curves = dashboard.diminishing_returns_curves(pairs, budgets, normalised["timeline_months"])
+            return {
+                "pairs": pairs,
+                "budgets": budgets,
+                "roi": curves["roi"],
+                "conversions": curves["conversions"],
+                "revenue": curves["revenue"],
+                "market_version": dashboard.market_table.version
+            }
+        return await self._cached("curves", normalised, self._on_threads("curves", compute))
+
+    async def goalseek(self, params):
+        metric = params.get("metric")
+        if metric not in GOAL_METRICS:
+            raise RequestError(f"metric must be one of: {', '.join(GOAL_METRICS)}")
+        try:
+            target = float(params["target"])
+        except (KeyError, TypeError, ValueError):
+            raise RequestError("target must be a number")
+        if not np.isfinite(target):
+            raise RequestError("target must be a finite number")
+        normalised = {"metric": metric, "target": target, **self._scenario_params(params, budget=False)}
+        dashboard = self.dashboard
+
+        def compute():
+            result = goal_seek(
+                dashboard, metric, target, normalised["segments"], normalised["timeline_months"],
+                normalised["strategy"], cache=self.goal_cache
+            )
+            return {**result, "market_version": dashboard.market_table.version}
+        return await self._cached("goalseek", normalised, self._on_threads("goalseek", compute))
+
+    async def scenarios(self, params):
+        scenarios = params.get("scenarios")
+        if not isinstance(scenarios, list) or not scenarios:
+            raise RequestError("scenarios must be a non-empty list")
+        if len(scenarios) > MAX_BATCH_SCENARIOS:
+            raise RequestError(f"At most {MAX_BATCH_SCENARIOS} scenarios per batch", 413)
+        normalised = []
+        for scenario in scenarios:
+            if not isinstance(scenario, dict):
+                raise RequestError("Each scenario must be a JSON object")
+            normalised.append(self._scenario_params(scenario))
+        return await self._cached("scenarios", normalised, lambda: self._run_batch(normalised))
+
+    async def _run_batch(self, scenarios):
+        """Encoded summary rows in request order, with each allocation computed once"""
+        timelines = {}
+        for scenario in scenarios:
+            task = (scenario["strategy"], scenario["total_budget"], tuple(scenario["segments"]))
+            timelines.setdefault(task, set()).add(scenario["timeline_months"])
+        tasks = [task + (sorted(months),) for task, months in timelines.items()]
+
+        timer = StageTimer("api.scenarios")
+        with timer.stage("process_pool"):
+            loop = asyncio.get_running_loop()
+            batches = await asyncio.gather(*(
+                loop.run_in_executor(self.processes, run_batch, tasks[i:i + BATCH_SIZE])
+                for i in range(0, len(tasks), BATCH_SIZE)
+            ))
+        rows = {row["scenario_id"]: row for batch in batches for row in batch}
+        result = {
+            "results": [
+                rows[scenario_id(scenario["strategy"], scenario["total_budget"], scenario["segments"],
+                                 scenario["timeline_months"], self.dashboard.market_table.version)]
+                for scenario in scenarios
+            ],
+            "market_version": self.dashboard.market_table.version
+        }
+        with timer.stage("encode"):
+            payload = await loop.run_in_executor(self.threads, encode_json, result)
+        METRICS.record(timer)
+        return payload
+
+async def _read_request(reader):
+    """(method, path, version, headers, body) of the next request, or None at EOF"""
+    request_line = await asyncio.wait_for(reader.readline(), KEEPALIVE_TIMEOUT)
+    if not request_line:
+        return None
+    try:
+        method, target, version = request_line.decode("latin-1").split()
+    except ValueError:
+        raise RequestError("Malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise RequestError("Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise RequestError(f"Request body over {MAX_BODY_BYTES} bytes", 413)
+    body = await reader.readexactly(length) if length > 0 else b""
+    return method, target.split("?", 1)[0], version, headers, body
+
+def _response(status, content_type, payload, keep_alive):
+    head = (
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(payload)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode("latin-1") + payload
+
+async def serve(service, host="127.0.0.1", port=DEFAULT_PORT, ready=None):
+    """Run the HTTP server until SIGINT or SIGTERM; ready(server) is called once listening"""
+
+    async def handle_connection(reader, writer):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except RequestError as error:
+                    writer.write(_response(error.status, "application/json", encode_json({"error": str(error)}), False))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, version, headers, body = request
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+                status, content_type, payload = await service.handle(method, path, body)
+                writer.write(_response(status, content_type, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle_connection, host, port, backlog=1024)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    if ready is not None:
+        ready(server)
+    async with server:
+        await stop.wait()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the ROI model as a JSON API")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--threads', type=int, default=4, help="threads for single-scenario requests")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="processes for /scenarios batches")
+    parser.add_argument('--cache-size', type=int, default=RESPONSE_CACHE_SIZE, help="cached responses")
+    parser.add_argument('--market-data', help="market data file (default: ROI_MARKET_DATA or the bundled table)")
+    parser.add_argument('--store', help="result store database (default: ROI_RESULT_STORE or the user cache)")
+    parser.add_argument('--no-store', action='store_true', help="compute every scenario without the result store")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.market_data:
+        # Inherited by the batch worker processes, which load their own dashboard
+        os.environ["ROI_MARKET_DATA"] = args.market_data
+    store_path = None if args.no_store else args.store or store_path_from_environment()
+    service = ROIService(MarketingROIDashboard(), args.threads, args.workers, args.cache_size, store_path)
+    service.warm_up()
+
+    def ready(server):
+        address = server.sockets[0].getsockname()
+        print(f"Serving the ROI API on http://{address[0]}:{address[1]}", file=sys.stderr, flush=True)
+
+    try:
+        asyncio.run(serve(service, args.host, args.port, ready))
+    finally:
+        service.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+"""Persistent result store shared by dashboard, API and batch processes across restarts
+
+Computed results (scenario allocations and metrics, Monte Carlo summaries, sweep
+rows) are pickled into one SQLite database in WAL mode. Any number of processes
+can read while one writes, so Streamlit servers, the JSON API and sweep workers
+share the same file. Entries are keyed by a hash of the caller's key together
+with MODEL_VERSION. Callers' keys carry the market-data version (see
+MarketingROIDashboard.scenario_key), so results never outlive the data they were
+computed from. Every row also records the market-data version it was computed
+from. Results of other market data stay in the store, since processes working on
+different data share the default file; they are never read again and leave once
+they are the least recently used entries past max_bytes, or at once with
+--prune-market-version. Results of other model versions are dropped when the
+store is opened.
+
+    store = ResultStore(market_version=dashboard.market_table.version)
+    budget_allocation, roi_metrics = store.get_or_compute(key, compute)
+
+    python -m roi_model.store            # path, entries and size
+    python -m roi_model.store --clear
+    python -m roi_model.store --prune-market-version   # keep only the current market data
+"""
+import argparse
+import contextlib
+import hashlib
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+
+import numpy as np
+
+from .market_data import BUNDLE_CACHE_DIR, load_market_table
+from .model import MODEL_VERSION
+
+# Database used when no path is given; ROI_RESULT_STORE="" (or "off") disables the store
+DEFAULT_STORE_PATH = os.path.join(BUNDLE_CACHE_DIR, "results.sqlite")
+DEFAULT_STORE_BYTES = 512 << 20
+# Eviction trims the store to this share of max_bytes so it does not run on every write
+EVICTION_TARGET = 0.8
+# Seconds a writer waits for another process's write to finish
+BUSY_TIMEOUT = 30
+# Reads mark entries as recently used in memory; the marks are written in batches
+TOUCH_BATCH = 64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    market_version TEXT,
+    model_version INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL,
+    value BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_accessed_size ON results (accessed, size);
+"""
+
+def store_path_from_environment():
+    """ROI_RESULT_STORE, DEFAULT_STORE_PATH when unset, or None when disabled"""
+    path = os.environ.get("ROI_RESULT_STORE", DEFAULT_STORE_PATH)
+    return None if path.strip().lower() in ("", "off", "none") else path
+
+def _canonical(key):
+    # Equal keys must hash alike: 10000000 and 10000000.0 are the same budget
+    if isinstance(key, (tuple, list)):
+        return tuple(_canonical(part) for part in key)
+    if isinstance(key, np.generic):
+        key = key.item()
+    if isinstance(key, float) and key.is_integer():
+        return int(key)
+    return key
+
+def store_key(key):
+    """Hex digest under which key is stored for the current MODEL_VERSION"""
+    return hashlib.sha256(repr((MODEL_VERSION, _canonical(key))).encode()).hexdigest()
+
+class ResultStore:
+    """Size-bounded, multi-process on-disk cache of picklable results
+
+    One SQLite connection is shared by the threads of a process behind a lock;
+    values are pickled and unpickled outside it.
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH, max_bytes=DEFAULT_STORE_BYTES, market_version=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.market_version = market_version
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+        self._touched = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None,
+                                           check_same_thread=False)
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript(SCHEMA)
+            self._connection.execute("DELETE FROM results WHERE model_version != ?", (MODEL_VERSION,))
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def lookup(self, key):
+        """(True, value) if key is stored, else (False, None); counts a hit or miss"""
+        digest = store_key(key)
+        with self._lock:
+            row = self._connection.execute("SELECT value FROM results WHERE key = ?", (digest,)).fetchone()
+        if row is not None:
+            try:
+                value = pickle.loads(row[0])
+            except Exception:
+                # Written by code whose classes have since changed: recompute it
+                row = None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            self._touched[digest] = time.time()
+            if len(self._touched) >= TOUCH_BATCH:
+                try:
+                    self._write(self._flush_touched)
+                except sqlite3.Error:
+                    # Recency marks are best effort; never fail a read over them
+                    self.errors += 1
+        return True, value
+
+    def store(self, key, value, market_version=None):
+        """Save value under key (for market_version, default the store's)"""
+        self.store_many([(key, value)], market_version)
+
+    def store_many(self, items, market_version=None):
+        """Save (key, value) pairs in one transaction, then evict past max_bytes"""
+        now = time.time()
+        version = market_version if market_version is not None else self.market_version
+        rows = []
+        for key, value in items:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            rows.append((store_key(key), version, MODEL_VERSION, now, now, len(blob), blob))
+        pending = getattr(self._local, 'pending', None)
+        if pending is not None:
+            pending.extend(rows)
+        else:
+            self._insert(rows)
+
+    @contextlib.contextmanager
+    def deferred(self):
+        """Hold this thread's writes inside the block and save them in one transaction at its end
+
+        Batch jobs wrap many get_or_compute calls in it, since a commit costs far
+        more than a lookup. A failed final write counts in `errors`.
+        """
+        pending = self._local.pending = []
+        try:
+            yield self
+        finally:
+            self._local.pending = None
+            if pending:
+                try:
+                    self._insert(pending)
+                except sqlite3.Error:
+                    self.errors += 1
+
+    def _insert(self, rows):
+        def write():
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO results (key, market_version, model_version, created, accessed, size, value) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._flush_touched()
+            self._evict()
+
+        with self._lock:
+            self._write(write)
+
+    def get_or_compute(self, key, compute, market_version=None):
+        """Return the stored value for key, computing and storing it on a miss
+
+        The store only ever saves work: database errors count in `errors` and
+        fall back to computing (or to not saving) the value.
+        """
+        try:
+            found, value = self.lookup(key)
+        except sqlite3.Error:
+            self.errors += 1
+            found = False
+        if found:
+            return value
+        value = compute()
+        try:
+            self.store(key, value, market_version)
+        except sqlite3.Error:
+            self.errors += 1
+        return value
+
+    def _write(self, write):
+        """Run write() in one write transaction; the caller holds the lock"""
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            write()
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+
+    def _flush_touched(self):
+        touched, self._touched = self._touched, {}
+        self._connection.executemany(
+            "UPDATE results SET accessed = ? WHERE key = ?", [(accessed, key) for key, accessed in touched.items()]
+        )
+
+    def _evict(self):
+        total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Keep the most recently used entries that fit in the eviction target
+        evicted = self._connection.execute(
+            "DELETE FROM results WHERE key IN (SELECT key FROM ("
+            "SELECT key, SUM(size) OVER (ORDER BY accessed DESC, key) AS kept FROM results"
+            ") WHERE kept > ?)",
+            (self.max_bytes * EVICTION_TARGET,)
+        ).rowcount
+        self.evictions += evicted
+
+    def prune_market_versions(self, keep):
+        """Delete results of every market-data version but keep; returns how many were deleted"""
+        deleted = []
+
+        def prune():
+            deleted.append(self._connection.execute(
+                "DELETE FROM results WHERE market_version IS NOT ?", (keep,)
+            ).rowcount)
+
+        with self._lock:
+            self._touched.clear()
+            self._write(prune)
+        return deleted[0]
+
+    def clear(self):
+        """Delete every stored result (counters are kept)"""
+        with self._lock:
+            self._touched.clear()
+            self._connection.execute("DELETE FROM results")
+            self._connection.execute("VACUUM")
+
+    def stats(self):
+        """Counters and size for monitoring the store"""
+        with self._lock:
+            entries, size, market_versions = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COUNT(DISTINCT market_version) FROM results"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'path': self.path,
+            'entries': entries,
+            'bytes': size,
+            'max_bytes': self.max_bytes,
+            'market_versions': market_versions,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'errors': self.errors,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+    def close(self):
+        with self._lock:
+            if self._touched:
+                self._write(self._flush_touched)
+            self._connection.close()
+
+def open_store(path=None, market_version=None, max_bytes=DEFAULT_STORE_BYTES):
+    """ResultStore at path (default: store_path_from_environment()), or None when disabled"""
+    path = path or store_path_from_environment()
+    if path is None:
+        return None
+    return ResultStore(path, max_bytes, market_version)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or clear the persistent result store")
+    parser.add_argument('--path', help="store database (default: ROI_RESULT_STORE or DEFAULT_STORE_PATH)")
+    parser.add_argument('--clear', action='store_true', help="delete every stored result")
+    parser.add_argument('--prune-market-version', nargs='?', const='', metavar='VERSION',
+                        help="delete results of every market-data version but VERSION "
+                             "(default: the market data ROI_MARKET_DATA loads)")
+    args = parser.parse_args(argv)
+    store = open_store(args.path)
+    if store is None:
+        print("The result store is disabled (ROI_RESULT_STORE)", file=sys.stderr)
+        return 1
+    if args.clear:
+        store.clear()
+    elif args.prune_market_version is not None:
+        keep = args.prune_market_version or load_market_table().version
+        print(f"Deleted {store.prune_market_versions(keep):,} results of market data other than {keep}")
+    stats = store.stats()
+    print(f"{stats['path']}: {stats['entries']:,} results of {stats['market_versions']} market data "
+          f"version(s), {stats['bytes'] / (1 << 20):.1f} of {stats['max_bytes'] / (1 << 20):.0f} MB")
+    store.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
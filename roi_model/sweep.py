@@ -0,0 +1,263 @@
+"""Headless scenario sweep for the Marketing ROI model
+
+Runs optimize_budget_allocation + calculate_roi_metrics over a grid of budgets,
+segment subsets and timelines across a process pool, streaming rows to disk as
+they finish. Re-running with the same output resumes where it stopped; scenario
+ids include the market-data version, so after the data changes every scenario is
+run again (rows of both versions are kept, told apart by market_version). Scenarios
+are read from the persistent result store (roi_model.store) before computing and
+saved to it, so a sweep also warms the dashboard and API.
+
+    python -m roi_model.sweep --output sweep.csv --jobs 8
+    python -m roi_model.sweep --output sweep_parquet --format parquet --strategy marginal heuristic
+"""
+import argparse
+import contextlib
+import csv
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from .model import ALLOCATION_STRATEGIES, MarketingROIDashboard
+from .store import ResultStore, store_path_from_environment
+
+COLUMNS = [
+    'scenario_id', 'strategy', 'total_budget', 'segments', 'segment_count', 'timeline_months',
+    'channels_funded', 'total_leads', 'total_conversions', 'total_revenue', 'total_cost',
+    'overall_roi', 'market_penetration', 'market_version'
+]
+
+# Sidebar slider range and the timeline selectbox options
+DEFAULT_BUDGET_RANGE = (100000, 100000000, 500000)
+DEFAULT_TIMELINES = [3, 6, 12, 24]
+
+_dashboard = None
+_store = None
+
+def scenario_id(strategy, total_budget, segments, timeline_months, market_version):
+    """Stable identifier used to skip finished scenarios on resume"""
+    return f"{strategy}|{total_budget}|{'+'.join(segments)}|{timeline_months}|{market_version}"
+
+def build_tasks(segments, budgets, timelines, strategies, market_version, done=frozenset()):
+    """One task per allocation; the timelines sharing it are evaluated together
+
+    Scenarios whose id for market_version is in done are left out.
+    """
+    tasks = []
+    for strategy in strategies:
+        for size in range(1, len(segments) + 1):
+            for subset in itertools.combinations(segments, size):
+                for total_budget in budgets:
+                    pending = [
+                        timeline for timeline in timelines
+                        if scenario_id(strategy, total_budget, subset, timeline, market_version) not in done
+                    ]
+                    if pending:
+                        tasks.append((strategy, total_budget, subset, pending))
+    return tasks
+
+def _init_worker(store_path=None):
+    global _dashboard, _store
+    _dashboard = MarketingROIDashboard()
+    _store = ResultStore(store_path, market_version=_dashboard.market_table.version) if store_path else None
+
+def evaluate_task(dashboard, task, store=None):
+    """(timeline, budget_allocation, roi_metrics) for each timeline of a sweep task
+
+    Scenarios found in store are read from it; the allocation is computed at most
+    once for the rest, which are then saved to store.
+    """
+    strategy, total_budget, segments, timelines = task
+    allocation = None
+
+    def compute(timeline):
+        nonlocal allocation
+        if allocation is None:
+            allocation = dashboard.optimize_budget_allocation(total_budget, list(segments), strategy)
+        return allocation, dashboard.calculate_roi_metrics(allocation, timeline)
+
+    results = []
+    for timeline in timelines:
+        if store is None:
+            budget_allocation, roi_metrics = compute(timeline)
+        else:
+            key = dashboard.scenario_key(total_budget, segments, timeline, strategy)
+            budget_allocation, roi_metrics = store.get_or_compute(key, lambda: compute(timeline))
+        results.append((timeline, budget_allocation, roi_metrics))
+    return results
+
+def summary_row(strategy, total_budget, segments, timeline_months, metrics, market_version):
+    """One COLUMNS row summarising a scenario's ROI metrics"""
+    return {
+        'scenario_id': scenario_id(strategy, total_budget, segments, timeline_months, market_version),
+        'strategy': strategy,
+        'total_budget': total_budget,
+        'segments': '+'.join(segments),
+        'segment_count': len(segments),
+        'timeline_months': timeline_months,
+        'channels_funded': len(metrics['channel_performance']),
+        'total_leads': metrics['total_leads'],
+        'total_conversions': metrics['total_conversions'],
+        'total_revenue': metrics['total_revenue'],
+        'total_cost': metrics['total_cost'],
+        'overall_roi': metrics['overall_roi'],
+        'market_penetration': metrics['market_penetration'],
+        'market_version': market_version
+    }
+
+def run_batch(tasks):
+    """Evaluate a batch of tasks in a worker process and return result rows"""
+    rows = []
+    version = _dashboard.market_table.version
+    with _store.deferred() if _store is not None else contextlib.nullcontext():
+        for task in tasks:
+            strategy, total_budget, segments, _ = task
+            for timeline, _, metrics in evaluate_task(_dashboard, task, _store):
+                rows.append(summary_row(strategy, total_budget, segments, timeline, metrics, version))
+    return rows
+
+class CSVResultWriter:
+    """Append-only CSV output that can be resumed after an interruption"""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            self._drop_partial_line()
+            with open(path, newline='') as f:
+                self.done = {row['scenario_id'] for row in csv.DictReader(f)}
+        self._file = open(path, 'a', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=COLUMNS)
+        if not exists:
+            self._writer.writeheader()
+
+    def _drop_partial_line(self):
+        # A run killed mid-write can leave half a row at the end of the file
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            if not data.endswith(b'\n'):
+                f.truncate(data.rfind(b'\n') + 1)
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+class ParquetResultWriter:
+    """Directory of Parquet part files; each part is written atomically"""
+
+    def __init__(self, path, rows_per_part=50000):
+        import pyarrow.parquet as pq
+
+        self.path = path
+        self.rows_per_part = rows_per_part
+        self._pq = pq
+        self._buffer = []
+        os.makedirs(path, exist_ok=True)
+        parts = sorted(name for name in os.listdir(path) if name.endswith('.parquet'))
+        self._next_part = len(parts)
+        self.done = set()
+        for name in parts:
+            table = pq.read_table(os.path.join(path, name), columns=['scenario_id'])
+            self.done.update(table.column('scenario_id').to_pylist())
+
+    def write(self, rows):
+        self._buffer.extend(rows)
+        if len(self._buffer) >= self.rows_per_part:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        import pyarrow as pa
+
+        table = pa.Table.from_pylist(self._buffer)
+        final_path = os.path.join(self.path, f"part-{self._next_part:05d}.parquet")
+        self._pq.write_table(table, final_path + '.tmp')
+        os.replace(final_path + '.tmp', final_path)
+        self._next_part += 1
+        self._buffer = []
+
+    def close(self):
+        self._flush()
+
+def run_sweep(writer, tasks, jobs, batch_size, progress=True, store_path=None):
+    """Run tasks across a process pool, handing finished rows to writer as they arrive
+
+    With store_path, workers read and save scenarios in that result store.
+    """
+    batches = [tasks[i:i + batch_size] for i in range(0, len(tasks), batch_size)]
+    completed = 0
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(store_path,)) as executor:
+        pending = set()
+        queued = iter(batches)
+        try:
+            while True:
+                # Keep a bounded number of batches in flight so results never pile up
+                for batch in itertools.islice(queued, jobs * 2 - len(pending)):
+                    pending.add(executor.submit(run_batch, batch))
+                if not pending:
+                    break
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    rows = future.result()
+                    writer.write(rows)
+                    completed += len(rows)
+                if progress:
+                    elapsed = time.perf_counter() - started
+                    print(f"\r{completed:,} scenarios written ({completed / elapsed:,.0f}/s)",
+                          end='', file=sys.stderr)
+        except KeyboardInterrupt:
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            writer.close()
+            if progress:
+                print(file=sys.stderr)
+    return completed
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep budget/segment/timeline scenarios headlessly")
+    parser.add_argument('--output', required=True, help="CSV file, or directory for --format parquet")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--batch-size', type=int, default=50, help="allocations per worker task")
+    parser.add_argument('--min-budget', type=int, default=DEFAULT_BUDGET_RANGE[0])
+    parser.add_argument('--max-budget', type=int, default=DEFAULT_BUDGET_RANGE[1])
+    parser.add_argument('--budget-step', type=int, default=DEFAULT_BUDGET_RANGE[2])
+    parser.add_argument('--timelines', type=int, nargs='+', default=DEFAULT_TIMELINES)
+    parser.add_argument('--strategy', nargs='+', choices=list(ALLOCATION_STRATEGIES), default=['marginal'])
+    parser.add_argument('--store', help="result store database (default: ROI_RESULT_STORE or the user cache)")
+    parser.add_argument('--no-store', action='store_true', help="compute every scenario without the result store")
+    parser.add_argument('--quiet', action='store_true')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    writer = CSVResultWriter(args.output) if args.format == 'csv' else ParquetResultWriter(args.output)
+
+    table = MarketingROIDashboard().market_table
+    segments = table.segments
+    store_path = None if args.no_store else args.store or store_path_from_environment()
+    budgets = range(args.min_budget, args.max_budget + 1, args.budget_step)
+    tasks = build_tasks(segments, budgets, args.timelines, args.strategy, table.version, writer.done)
+    if not args.quiet:
+        print(f"{len(writer.done):,} scenarios already done, {len(tasks):,} allocations to run",
+              file=sys.stderr)
+
+    try:
+        run_sweep(writer, tasks, max(args.jobs, 1), args.batch_size, progress=not args.quiet, store_path=store_path)
+    except KeyboardInterrupt:
+        print("Interrupted; re-run the same command to resume", file=sys.stderr)
+        return 130
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""Lightweight per-stage timing for dashboard reruns and model calls
+
+A StageTimer collects the stages of one rerun. While it is active on a thread,
+model methods wrapped with @timed record into it as nested stages. Finished
+timers feed a process-wide MetricsRegistry that can be logged as structured
+JSON or served in Prometheus text format.
+"""
+import functools
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("roi_model.timing")
+
+# Histogram bucket upper bounds in seconds for the metrics endpoint
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_local = threading.local()
+
+def current_timer():
+    """The StageTimer active on this thread, if any"""
+    return getattr(_local, "timer", None)
+
+class StageTimer:
+    """Wall-clock durations for the named stages of one run"""
+
+    def __init__(self, run_name="rerun"):
+        self.run_name = run_name
+        self.records = []
+        self._stack = []
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def activate(self):
+        """Make this the thread's timer so @timed model calls record into it"""
+        previous = current_timer()
+        _local.timer = self
+        try:
+            yield self
+        finally:
+            _local.timer = previous
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block; stages opened inside it are recorded as parent/child"""
+        path = "/".join(self._stack + [name])
+        # Reserve the slot on entry so parents are listed before their children
+        slot = len(self.records)
+        self.records.append((path, 0.0))
+        self._stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            self.records[slot] = (path, (time.perf_counter() - start) * 1000)
+
+    @property
+    def total_ms(self):
+        return (time.perf_counter() - self._started) * 1000
+
+    def summary(self):
+        """Stage durations in ms, summed per stage path, in first-seen order"""
+        totals = {}
+        for path, elapsed in self.records:
+            totals[path] = totals.get(path, 0.0) + elapsed
+        return totals
+
+    def as_dict(self):
+        return {
+            "run": self.run_name,
+            "total_ms": round(self.total_ms, 3),
+            "stages": {path: round(elapsed, 3) for path, elapsed in self.summary().items()}
+        }
+
+def timed(name=None):
+    """Decorator recording a function as a stage of the thread's active timer"""
+    def decorator(function):
+        stage_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            timer = current_timer()
+            if timer is None:
+                return function(*args, **kwargs)
+            with timer.stage(stage_name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+class MetricsRegistry:
+    """Process-wide duration histograms per stage, safe to update from many sessions"""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            entry = self._stages.setdefault(stage, {"count": 0, "sum": 0.0, "max": 0.0,
+                                                    "buckets": [0] * len(self.buckets)})
+            entry["count"] += 1
+            entry["sum"] += seconds
+            entry["max"] = max(entry["max"], seconds)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    entry["buckets"][i] += 1
+
+    def record(self, timer):
+        """Add every stage of a finished timer, plus the run total"""
+        for path, elapsed in timer.records:
+            self.observe(path, elapsed / 1000)
+        self.observe(timer.run_name, timer.total_ms / 1000)
+
+    def snapshot(self):
+        with self._lock:
+            return {stage: {**entry, "buckets": list(entry["buckets"])} for stage, entry in self._stages.items()}
+
+    def render_prometheus(self):
+        """Histogram of stage durations in Prometheus text exposition format"""
+        lines = [
+            "# HELP roi_stage_duration_seconds Duration of dashboard and model stages",
+            "# TYPE roi_stage_duration_seconds histogram"
+        ]
+        for stage, entry in sorted(self.snapshot().items()):
+            label = stage.replace("\\", "\\\\").replace('"', '\\"')
+            for bound, count in zip(self.buckets, entry["buckets"]):
+                lines.append(f'roi_stage_duration_seconds_bucket{{stage="{label}",le="{bound}"}} {count}')
+            lines.append(f'roi_stage_duration_seconds_bucket{{stage="{label}",le="+Inf"}} {entry["count"]}')
+            lines.append(f'roi_stage_duration_seconds_sum{{stage="{label}"}} {entry["sum"]}')
+            lines.append(f'roi_stage_duration_seconds_count{{stage="{label}"}} {entry["count"]}')
+        return "\n".join(lines) + "\n"
+
+METRICS = MetricsRegistry()
+
+def log_timings(timer, **fields):
+    """Emit one structured JSON log line for a finished run"""
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({**timer.as_dict(), **fields}, default=str))
+
+def start_metrics_server(port, host="127.0.0.1", registry=METRICS):
+    """Serve registry at http://host:port/metrics from a daemon thread"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="roi-metrics", daemon=True).start()
+    return server
@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+
+from roi_model import MarketingROIDashboard
+
+SEGMENT_SELECTIONS = [
+    ["Coffee Shops"],
+    ["Coffee Shops", "Casual Dining"],
+    ["Warung/Street Food", "Food Courts", "Cloud Kitchen"],
+    None
+]
+
+def baseline_allocation(market_data, total_budget, selected_segments):
+    """optimize_budget_allocation of the original single-file app"""
+    scores = []
+    for segment in selected_segments:
+        for channel, data in market_data[segment]["channels"].items():
+            scores.append({
+                'segment': segment,
+                'channel': channel,
+                'efficiency': data["conversion_rate"] / (data["cost_per_lead"] / 1000000),
+                'market_size': market_data[segment]["market_size"]
+            })
+    scores.sort(key=lambda item: item['efficiency'], reverse=True)
+
+    allocations = {}
+    remaining_budget = total_budget
+    for item in scores:
+        if remaining_budget <= 0:
+            break
+        market_weight = min(item['market_size'] / 50000, 1.0)
+        budget = min(remaining_budget * 0.3, total_budget * market_weight * 0.15)
+        allocations[f"{item['segment']} - {item['channel']}"] = {
+            'budget': budget,
+            'efficiency': item['efficiency'],
+            'segment': item['segment'],
+            'channel': item['channel']
+        }
+        remaining_budget -= budget
+    return allocations
+
+def baseline_metrics(market_data, budget_allocation, timeline_months):
+    """calculate_roi_metrics totals of the original single-file app"""
+    totals = {'total_leads': 0, 'total_conversions': 0, 'total_revenue': 0,
+              'total_cost': sum(allocation['budget'] for allocation in budget_allocation.values())}
+    for allocation in budget_allocation.values():
+        budget = allocation['budget']
+        if budget <= 0:
+            continue
+        segment = market_data[allocation['segment']]
+        channel = segment["channels"][allocation['channel']]
+        leads = budget / channel["cost_per_lead"]
+        optimal_budget = segment["market_size"] * channel["cost_per_lead"] * 0.05
+        conversion_rate = channel["conversion_rate"]
+        if budget > optimal_budget:
+            conversion_rate /= 1 + 0.5 * (budget - optimal_budget) / optimal_budget
+        totals['total_leads'] += leads
+        totals['total_conversions'] += leads * conversion_rate
+        totals['total_revenue'] += leads * conversion_rate * segment["avg_deal_value"] * timeline_months
+    total_cost = totals['total_cost']
+    totals['overall_roi'] = (totals['total_revenue'] - total_cost) / total_cost * 100 if total_cost > 0 else 0
+    market_size = sum(segment["market_size"] for segment in market_data.values())
+    totals['market_penetration'] = totals['total_conversions'] / market_size * 100
+    return totals
+
+@pytest.fixture(scope="module")
+def dashboard():
+    return MarketingROIDashboard()
+
+@pytest.mark.parametrize("segments", SEGMENT_SELECTIONS)
+@pytest.mark.parametrize("total_budget", [100000, 10000000, 25000000, 100000000])
+@pytest.mark.parametrize("timeline", [3, 12, 24])
+def test_heuristic_reproduces_baseline(dashboard, segments, total_budget, timeline):
+    market_data = dashboard.market_table.to_market_data()
+    segments = segments or list(market_data)
+    expected = baseline_allocation(market_data, total_budget, segments)
+
+    allocation, metrics = dashboard.evaluate_scenario(total_budget, segments, timeline, "heuristic")
+    assert list(allocation) == list(expected)
+    for key, item in expected.items():
+        assert allocation[key]['budget'] == pytest.approx(item['budget'], rel=1e-12)
+        assert allocation[key]['efficiency'] == pytest.approx(item['efficiency'], rel=1e-12)
+    for name, value in baseline_metrics(market_data, expected, timeline).items():
+        assert metrics[name] == pytest.approx(value, rel=1e-12), name
+
+def revenue(dashboard, allocation, timeline=12):
+    return dashboard.calculate_roi_metrics(allocation, timeline)['total_revenue']
+
+@pytest.mark.parametrize("total_budget", [1000000, 25000000, 100000000, 1000000000])
+def test_marginal_allocation_beats_perturbations(dashboard, total_budget):
+    segments = dashboard.market_table.segments
+    allocation = dashboard.optimize_budget_allocation(total_budget, segments, "marginal")
+    assert sum(item['budget'] for item in allocation.values()) == pytest.approx(total_budget, rel=1e-12)
+
+    # Moving budget between any two pairs (funded or not) never raises revenue
+    pairs = [(segment, channel) for segment in segments for channel in dashboard.market_table.channels_for(segment)]
+    full = {
+        f"{segment} - {channel}": {
+            'budget': allocation.get(f"{segment} - {channel}", {}).get('budget', 0.0),
+            'efficiency': 0.0, 'segment': segment, 'channel': channel
+        }
+        for segment, channel in pairs
+    }
+    best = revenue(dashboard, full)
+    funded = [key for key, item in full.items() if item['budget'] > 0]
+    rng = np.random.default_rng(0)
+    for _ in range(300):
+        source = funded[rng.integers(len(funded))]
+        target = list(full)[rng.integers(len(full))]
+        if source == target:
+            continue
+        shift = full[source]['budget'] * rng.choice([1e-3, 0.05, 0.5, 1.0])
+        perturbed = {key: dict(item) for key, item in full.items()}
+        perturbed[source]['budget'] -= shift
+        perturbed[target]['budget'] += shift
+        assert revenue(dashboard, perturbed) <= best * (1 + 1e-12)
+
+def test_marginal_beats_heuristic(dashboard):
+    segments = dashboard.market_table.segments
+    for total_budget in [1000000, 10000000, 100000000]:
+        marginal = dashboard.optimize_budget_allocation(total_budget, segments, "marginal")
+        heuristic = dashboard.optimize_budget_allocation(total_budget, segments, "heuristic")
+        assert revenue(dashboard, marginal) >= revenue(dashboard, heuristic)
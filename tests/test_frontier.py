@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from roi_model import MarketingROIDashboard
+from roi_model.model import BudgetFrontier
+
+@pytest.mark.parametrize("segments", [["Coffee Shops"], ["Coffee Shops", "Casual Dining"], None])
+@pytest.mark.parametrize("timeline", [3, 12])
+def test_frontier_matches_per_budget_evaluation(segments, timeline):
+    dashboard = MarketingROIDashboard()
+    segments = segments or dashboard.market_table.segments
+    budgets = np.concatenate([[0.0], np.geomspace(1e5, 1e10, 60)])
+    frontier = dashboard.budget_frontier(segments, budgets, timeline)
+
+    for i, total_budget in enumerate(budgets.tolist()):
+        allocation, metrics = dashboard.evaluate_scenario(total_budget, segments, timeline, "marginal")
+        for name in ('total_revenue', 'total_conversions', 'overall_roi', 'market_penetration'):
+            assert frontier[name][i] == pytest.approx(metrics[name], rel=1e-14, abs=1e-9), (name, total_budget)
+        assert frontier['channels_funded'][i] == len(metrics['channel_performance'])
+
+def test_allocation_spends_budgets_on_event_boundaries():
+    # Budgets equal to the spend at a breakpoint (as bisection and the frontier produce) are spent in full
+    dashboard = MarketingROIDashboard()
+    for segments in (["Coffee Shops"], dashboard.market_table.segments):
+        frontier = BudgetFrontier(dashboard.market_table, segments)
+        allocator = frontier.allocator
+        budgets = np.concatenate([allocator.spend_before, allocator.spend_after,
+                                  np.nextafter(allocator.spend_after, np.inf)])
+        budgets = budgets[budgets > 0]
+        np.testing.assert_allclose(allocator.allocate_many(budgets).sum(axis=1), budgets, rtol=1e-12)
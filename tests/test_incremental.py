@@ -0,0 +1,24 @@
+import numpy as np
+
+from roi_model import IncrementalROIModel, MarketingROIDashboard
+
+METRICS = ('total_leads', 'total_conversions', 'total_revenue', 'total_cost', 'overall_roi', 'market_penetration')
+
+def test_random_steps_match_evaluate_scenario():
+    # Results are shared with evaluate_scenario under one cache key, so they must be identical
+    dashboard = MarketingROIDashboard()
+    model = IncrementalROIModel(dashboard)
+    segments = dashboard.market_table.segments
+    rng = np.random.default_rng(0)
+    for _ in range(400):
+        selected = [segment for segment in segments if rng.random() < 0.6] or segments[:1]
+        total_budget = int(rng.integers(1, 200)) * 500000
+        timeline = int(rng.choice([3, 6, 12, 24]))
+        strategy = str(rng.choice(["marginal", "heuristic"]))
+
+        allocation, metrics = model.evaluate(total_budget, selected, timeline, strategy)
+        expected_allocation, expected = dashboard.evaluate_scenario(total_budget, selected, timeline, strategy)
+        assert allocation == expected_allocation
+        assert {name: metrics[name] for name in METRICS} == {name: expected[name] for name in METRICS}
+        np.testing.assert_array_equal(metrics['channel_performance']['revenue'],
+                                      expected['channel_performance']['revenue'])
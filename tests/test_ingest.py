@@ -0,0 +1,76 @@
+import csv
+import sys
+
+import numpy as np
+import pytest
+
+from roi_model.ingest import read_log_chunks
+
+HEADER = ["segment", "channel", "spend", "converted", "deal_value"]
+
+def read_rows(path, chunk_rows):
+    """Decoded (segment, channel, spend, converted, deal_value) rows of every chunk"""
+    rows = []
+    for segment_codes, segments, channel_codes, channels, spend, converted, deal_value in read_log_chunks(path, chunk_rows):
+        rows += zip([segments[code] for code in segment_codes.tolist()],
+                    [channels[code] for code in channel_codes.tolist()],
+                    spend.tolist(), converted.tolist(), deal_value.tolist())
+    return rows
+
+@pytest.fixture(params=["arrow", "csv_module"])
+def csv_backend(request, monkeypatch):
+    if request.param == "arrow":
+        pytest.importorskip("pyarrow.csv")
+    else:
+        # read_log_chunks falls back to the csv module without pyarrow
+        monkeypatch.setitem(sys.modules, "pyarrow.csv", None)
+    return request.param
+
+def write_csv(path, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+    return str(path)
+
+def test_csv_with_unconverted_first_block(tmp_path, csv_backend):
+    # A first block with no deals must not type deal_value as null
+    path = write_csv(tmp_path / "leads.csv",
+                     [["Coffee Shops", "Instagram Ads", "1000", "0", ""]] * 5000
+                     + [["Coffee Shops", "Instagram Ads", "1000", "yes", "15000000"]] * 100)
+
+    rows = read_rows(path, 1000)
+    assert rows == ([("Coffee Shops", "Instagram Ads", 1000.0, 0.0, 0.0)] * 5000
+                    + [("Coffee Shops", "Instagram Ads", 1000.0, 1.0, 15000000.0)] * 100)
+
+def test_csv_empty_labels(tmp_path, csv_backend):
+    path = write_csv(tmp_path / "leads.csv", [
+        ["", "Google Ads", "500", "TRUE", "2000000"],
+        ["Casual Dining", "", "", " y ", "3000000"],
+        ["Casual Dining", "Google Ads", "250", "no", ""],
+    ])
+
+    assert read_rows(path, 2) == [
+        ("", "Google Ads", 500.0, 1.0, 2000000.0),
+        ("Casual Dining", "", 0.0, 1.0, 3000000.0),
+        ("Casual Dining", "Google Ads", 250.0, 0.0, 0.0),
+    ]
+
+def test_parquet_null_labels_read_like_empty_csv_cells(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    table = pa.table({
+        "segment": pa.array([None, "Casual Dining", "Casual Dining"]).dictionary_encode(),
+        "channel": ["Google Ads", None, "Google Ads"],
+        "spend": [500.0, None, 250.0],
+        "converted": [True, True, False],
+        "deal_value": [2000000.0, 3000000.0, None],
+    })
+    path = str(tmp_path / "leads.parquet")
+    pq.write_table(table, path)
+
+    assert read_rows(path, 2) == [
+        ("", "Google Ads", 500.0, 1.0, 2000000.0),
+        ("Casual Dining", "", 0.0, 1.0, 3000000.0),
+        ("Casual Dining", "Google Ads", 250.0, 0.0, 0.0),
+    ]
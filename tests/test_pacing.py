@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from roi_model import BudgetPacer, MarketingROIDashboard
+from roi_model.model import MarginalAllocator
+
+@pytest.fixture(scope="module")
+def pacer():
+    return BudgetPacer(MarketingROIDashboard(), ["Coffee Shops", "Casual Dining"], timeline_months=12)
+
+@pytest.mark.parametrize("segments, timeline", [
+    (["Coffee Shops", "Casual Dining"], 12), (None, 24), (["Warung/Street Food"], 3)
+])
+def test_uncapped_plan_matches_exact_water_filling(segments, timeline):
+    # Every month x pair as one allocation problem, yields scaled by the months of revenue left
+    dashboard = MarketingROIDashboard()
+    pacer = BudgetPacer(dashboard, segments or dashboard.market_table.segments, timeline)
+    allocator = pacer.allocator
+    combined = MarginalAllocator(
+        (pacer.month_weight[:, None] * allocator.revenue_yield).ravel(),
+        np.tile(allocator.saturation_budget, timeline),
+        np.tile(allocator.decay, timeline)
+    )
+    for total_budget in np.geomspace(1e4, 1e11, 120).tolist():
+        plan = pacer.plan(total_budget)
+        assert plan['total_cost'] == pytest.approx(total_budget, rel=1e-12)
+        assert plan['unspent'] == pytest.approx(0, abs=total_budget * 1e-12)
+
+        # Pairs tied on marginal level may split their spend differently, so compare revenue
+        expected = combined.allocate(total_budget).reshape(timeline, -1)
+        _, _, monthly_value = dashboard.project_channels(pacer.rows[None, :], expected, 1)
+        expected_revenue = (monthly_value * pacer.month_weight[:, None]).sum()
+        assert plan['total_revenue'] == pytest.approx(expected_revenue, rel=1e-12), total_budget
+
+def test_capped_plan_respects_caps_and_equalizes_marginal_roi(pacer):
+    total_budget, cap = 100000000, 5000000
+    plan = pacer.plan(total_budget, monthly_cap=cap)
+    spend = plan['spend_by_month']
+    assert (spend <= cap * (1 + 1e-12)).all()
+    assert plan['total_cost'] + plan['unspent'] == pytest.approx(total_budget)
+
+    # Months below their cap share one marginal ROI; capped months stop at or above it
+    uncapped = spend < cap * (1 - 1e-9)
+    funded_uncapped = uncapped & (spend > 0)
+    if funded_uncapped.any():
+        level = plan['marginal_roi_by_month'][funded_uncapped]
+        np.testing.assert_allclose(level, level[0], rtol=1e-6)
+        assert (plan['marginal_roi_by_month'][~uncapped] >= level[0] - 1e-6).all()
+
+def test_more_budget_never_earns_less(pacer):
+    revenue = [pacer.plan(budget)['total_revenue'] for budget in np.geomspace(1e5, 1e9, 25)]
+    assert all(np.diff(revenue) >= 0)
@@ -0,0 +1,79 @@
+import sqlite3
+
+import numpy as np
+
+from roi_model import store as store_module
+from roi_model.store import ResultStore, main, store_key
+
+def test_integral_floats_and_numpy_scalars_share_a_key():
+    key = ("marginal", 10_000_000, ("Coffee Shops", "Casual Dining"), 12, "v1")
+    assert store_key(("marginal", 10_000_000.0, ["Coffee Shops", "Casual Dining"], np.int64(12), "v1")) == store_key(key)
+    assert store_key(("marginal", np.float64(1e7), ("Coffee Shops", "Casual Dining"), 12.0, "v1")) == store_key(key)
+    assert store_key(("marginal", 10_000_000.5, ("Coffee Shops", "Casual Dining"), 12, "v1")) != store_key(key)
+
+def test_round_trip_and_compute_once(tmp_path):
+    store = ResultStore(str(tmp_path / "results.sqlite"))
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {'total_revenue': 1.5e9}, np.arange(3.0)
+
+    first = store.get_or_compute(("marginal", 1e7), compute)
+    second = store.get_or_compute(("marginal", 10_000_000), compute)
+    assert len(calls) == 1
+    assert second[0] == first[0]
+    np.testing.assert_array_equal(second[1], first[1])
+    store.close()
+
+    reopened = ResultStore(str(tmp_path / "results.sqlite"))
+    assert reopened.lookup(("marginal", 10_000_000))[0]
+    assert reopened.stats()['hits'] == 1
+    reopened.close()
+
+def test_eviction_keeps_recently_used_entries_within_max_bytes(tmp_path):
+    blob = b"x" * 1000
+    store = ResultStore(str(tmp_path / "results.sqlite"), max_bytes=20_000)
+    with store.deferred():
+        for key in range(15):
+            store.store(key, blob)
+    for key in range(5):
+        assert store.lookup(key)[0]
+    # Makes the reads above more recent than every other entry
+    store._write(store._flush_touched)
+    for key in range(15, 21):
+        store.store(key, blob)
+
+    stats = store.stats()
+    assert stats['bytes'] <= store.max_bytes
+    assert stats['evictions'] > 0
+    assert all(store.lookup(key)[0] for key in range(5))
+    assert not store.lookup(5)[0]
+    assert store.lookup(20)[0]
+    store.close()
+
+def test_results_of_other_model_versions_are_dropped_on_open(tmp_path, monkeypatch):
+    path = str(tmp_path / "results.sqlite")
+    store = ResultStore(path)
+    store.store("scenario", 1.0)
+    store.close()
+
+    monkeypatch.setattr(store_module, "MODEL_VERSION", store_module.MODEL_VERSION + 1)
+    reopened = ResultStore(path)
+    assert len(reopened) == 0
+    reopened.close()
+
+def test_prune_market_versions_keeps_only_the_given_version(tmp_path, capsys):
+    path = str(tmp_path / "results.sqlite")
+    store = ResultStore(path, market_version="old")
+    store.store("a", 1.0)
+    store.store("b", 2.0, market_version="new")
+    store.store("c", 3.0, market_version="new")
+    assert store.stats()['market_versions'] == 2
+    store.close()
+
+    assert main(["--path", path, "--prune-market-version", "new"]) == 0
+    assert "Deleted 1 results" in capsys.readouterr().out
+    with sqlite3.connect(path) as connection:
+        versions = connection.execute("SELECT DISTINCT market_version FROM results").fetchall()
+    assert versions == [("new",)]